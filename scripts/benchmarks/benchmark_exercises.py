@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la correction des exercices du Coding Lab : une promotion
+soumet en même temps (app/exercise_runner.py)
+
+Compare les latences par soumission selon le nombre de cas exécutés en
+parallèle par soumission (EXERCISE_MAX_PARALLEL_CASES), puis le temps d'une
+soumission déjà corrigée (cache des rapports).
+
+Usage : python scripts/benchmarks/benchmark_exercises.py [--students 20] [--workers 4] [--jobs-per-worker 100]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from app.coding_lab_exercises import EXERCISES
+from app.execution_pool import ExecutionPool
+from app.exercise_runner import ExerciseRunner
+from app.grading_executor import _percentiles
+
+EXERCISE_ID = 4
+SOLUTION = '''
+def factorielle(n):
+    if n < 0:
+        raise ValueError("n négatif")
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    return result
+
+def est_premier(n):
+    if n < 2:
+        return False
+    for i in range(2, int(n ** 0.5) + 1):
+        if n % i == 0:
+            return False
+    return True
+
+def fibonacci(n):
+    suite = [0, 1][:max(n, 0)]
+    while len(suite) < n:
+        suite.append(suite[-1] + suite[-2])
+    return suite
+'''
+
+
+async def cohort(runner: ExerciseRunner, students: int) -> dict:
+    async def submit(student: int) -> float:
+        started = time.perf_counter()
+        # Code différent par étudiant, sans cache : chaque cas est exécuté
+        report = await runner.run(EXERCISE_ID, f"{SOLUTION}\n# étudiant {student}\n", use_cache=False)
+        assert report["passed"], report
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(submit(student) for student in range(students)))
+    return {"total": time.perf_counter() - started, **_percentiles(latencies)}
+
+
+async def run(args):
+    cases = len(EXERCISES[EXERCISE_ID]["cases"])
+    print(f"📊 BENCHMARK: {args.students} soumissions simultanées, exercice {EXERCISE_ID} ({cases} cas), "
+          f"{args.workers} processus, {args.jobs_per_worker} cas par processus")
+    print("=" * 72)
+    print(f"{'cas // par soumission':>22} {'total (s)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10}")
+
+    for parallel in sorted({1, 2, 4, cases}):
+        pool = ExecutionPool(workers=args.workers, queue_size=args.students * cases,
+                             max_jobs_per_worker=args.jobs_per_worker)
+        await pool.start()
+        try:
+            runner = ExerciseRunner(pool, max_parallel_cases=parallel)
+            stats = await cohort(runner, args.students)
+        finally:
+            await pool.stop()
+        print(f"{parallel:>22} {stats['total']:>10.2f} {stats['p50']:>10.0f} {stats['p95']:>10.0f} {stats['max']:>10.0f}")
+
+    pool = ExecutionPool(workers=args.workers)
+    await pool.start()
+    try:
+        runner = ExerciseRunner(pool)
+        await runner.run(EXERCISE_ID, SOLUTION)
+        started = time.perf_counter()
+        report = await runner.run(EXERCISE_ID, SOLUTION)
+        cached_ms = (time.perf_counter() - started) * 1000
+    finally:
+        await pool.stop()
+    print("-" * 72)
+    print(f"Soumission déjà corrigée : {cached_ms:.2f} ms (cache : {report['cached']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--jobs-per-worker", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
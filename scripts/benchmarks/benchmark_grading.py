@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la correction PLD : chemin historique (normalisation + difflib
+à chaque appel) contre les profils de correction précompilés (app/grading.py)
+
+Usage : python scripts/benchmarks/benchmark_grading.py [--rounds 200]
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from app.grading import AIQuizCorrector, get_grading_profile, normalize_text, LONG_ANSWER_CHARS
+
+QUESTION = {
+    "question_id": 1,
+    "question_text": "Que fait la commande chmod ?",
+    "expected_answer": (
+        "La commande chmod modifie les permissions d'un fichier pour le propriétaire, "
+        "le groupe et les autres, en notation symbolique (u+x) ou octale (755)."
+    ),
+    "technical_terms": ["chmod", "permissions", "propriétaire", "groupe", "octale", "u+x", "755"],
+    "explanation": "chmod = change mode",
+    "max_score": 100,
+}
+
+VOCABULARY = (
+    QUESTION["expected_answer"].split()
+    + ["lecture", "écriture", "exécution", "bits", "umask", "fichier", "dossier", "utilisateur", "root"]
+)
+
+
+def make_answer(words: int) -> str:
+    return " ".join(random.choice(VOCABULARY) for _ in range(words))
+
+
+def legacy_grade(corrector: AIQuizCorrector, answer: str):
+    similarity = corrector.calculate_similarity(answer, QUESTION["expected_answer"])
+    terms = corrector.find_technical_terms(answer, QUESTION["technical_terms"])
+    return similarity, terms
+
+
+def profile_grade(answer: str):
+    profile = get_grading_profile(QUESTION)
+    user_norm = normalize_text(answer)
+    return profile.similarity(user_norm), profile.find_terms(user_norm)
+
+
+def timed(func, answers, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for answer in answers:
+            func(answer)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(42)
+    corrector = AIQuizCorrector()
+
+    print("📊 BENCHMARK: correction des réponses PLD")
+    print("=" * 72)
+    print(f"{'mots':>6} {'caractères':>11} {'historique/s':>14} {'profil/s':>12} {'gain':>7}  identique")
+
+    for words in (20, 60, 200, 500, 2000):
+        answers = [make_answer(words) for _ in range(10)]
+        rounds = max(1, args.rounds * 20 // words)
+
+        legacy_time = timed(lambda a: legacy_grade(corrector, a), answers, rounds)
+        profile_time = timed(profile_grade, answers, rounds)
+
+        graded = len(answers) * rounds
+        identical = all(legacy_grade(corrector, a) == profile_grade(a) for a in answers)
+        chars = sum(len(a) for a in answers) // len(answers)
+        print(
+            f"{words:>6} {chars:>11} {graded / legacy_time:>14.0f} {graded / profile_time:>12.0f} "
+            f"{legacy_time / profile_time:>6.1f}x  {'oui' if identical else 'non (mode mots)'}"
+        )
+
+    print("-" * 72)
+    print(f"Au-delà de {LONG_ANSWER_CHARS} caractères normalisés, la similarité est calculée sur les mots.")
+
+
+if __name__ == "__main__":
+    main()
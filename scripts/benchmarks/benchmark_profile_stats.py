@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark des statistiques de la page profil : chemin historique (comptages
+puis chargement de toutes les sessions terminées en objets ORM) contre la
+requête unique à agrégation conditionnelle (app/profile_stats.py)
+
+Un utilisateur synthétique reçoit --sessions sessions terminées (moitié quiz,
+moitié quiz IA) dans une transaction annulée à la fin.
+
+Usage : python scripts/benchmarks/benchmark_profile_stats.py [--sessions 10000] [--rounds 20]
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from sqlalchemy import event, insert
+
+from app.database import SessionLocal, engine
+from app.models import User, QuizSession, AIQuizSession
+from app.profile_stats import compute_profile_stats
+
+
+def legacy_profile_stats(db, user_id: int):
+    """Calcul d'origine de main.profile_page (6 requêtes, sessions chargées en Python)"""
+    completed_quiz = db.query(QuizSession).filter(
+        QuizSession.user_id == user_id, QuizSession.completed == True
+    ).count()
+    completed_ai = db.query(AIQuizSession).filter(
+        AIQuizSession.user_id == user_id, AIQuizSession.completed == True
+    ).count()
+    quiz_sessions = db.query(QuizSession).filter(
+        QuizSession.user_id == user_id, QuizSession.completed == True, QuizSession.total_questions > 0
+    ).all()
+    ai_sessions = db.query(AIQuizSession).filter(
+        AIQuizSession.user_id == user_id, AIQuizSession.completed == True, AIQuizSession.total_questions > 0
+    ).all()
+    scores = [s.score / s.total_questions * 100 for s in quiz_sessions]
+    scores += [s.total_score / s.total_questions * 100 for s in ai_sessions]
+
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    this_week = db.query(QuizSession).filter(
+        QuizSession.user_id == user_id, QuizSession.completed == True, QuizSession.completed_at >= week_ago
+    ).count()
+    this_week += db.query(AIQuizSession).filter(
+        AIQuizSession.user_id == user_id, AIQuizSession.completed == True, AIQuizSession.completed_at >= week_ago
+    ).count()
+    return {
+        "total_quiz_completed": completed_quiz + completed_ai,
+        "average_score": round(sum(scores) / len(scores)) if scores else 0,
+        "quizzes_this_week": this_week
+    }
+
+
+def seed_user(db, sessions: int) -> int:
+    user = User(
+        email=f"bench-{uuid.uuid4().hex[:8]}@example.com",
+        username=f"bench_{uuid.uuid4().hex[:8]}",
+        hashed_password="x"
+    )
+    db.add(user)
+    db.flush()
+
+    now = datetime.utcnow()
+    quiz_rows, ai_rows = [], []
+    for index in range(sessions):
+        completed_at = now - timedelta(days=random.randint(0, 365), minutes=random.randint(0, 1440))
+        started_at = completed_at - timedelta(minutes=15)
+        if index % 2 == 0:
+            quiz_rows.append({
+                "user_id": user.id, "score": random.randint(0, 10), "total_questions": 10,
+                "completed": True, "started_at": started_at, "completed_at": completed_at
+            })
+        else:
+            ai_rows.append({
+                "user_id": user.id, "total_score": random.uniform(0, 10), "total_questions": 10,
+                "completed": True, "started_at": started_at, "completed_at": completed_at
+            })
+    db.execute(insert(QuizSession), quiz_rows)
+    db.execute(insert(AIQuizSession), ai_rows)
+    db.flush()
+    return user.id
+
+
+def timed(func, rounds: int):
+    """(ms par appel, requêtes par appel, résultat)"""
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            result = func()
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return elapsed * 1000 / rounds, len(statements) / rounds, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    db = SessionLocal()
+    try:
+        user_id = seed_user(db, args.sessions)
+
+        def legacy():
+            result = legacy_profile_stats(db, user_id)
+            db.expunge_all()  # Pas de cache d'identité entre deux pages
+            return result
+
+        legacy_ms, legacy_queries, legacy_result = timed(legacy, args.rounds)
+        single_ms, single_queries, single_result = timed(lambda: compute_profile_stats(db, user_id), args.rounds)
+
+        print(f"📊 BENCHMARK: statistiques profil ({args.sessions} sessions, {engine.dialect.name})")
+        print("=" * 72)
+        print(f"{'chemin':<22} {'ms/page':>10} {'requêtes':>10}  résultat")
+        print(f"{'historique':<22} {legacy_ms:>10.2f} {legacy_queries:>10.0f}  {legacy_result}")
+        print(f"{'requête unique':<22} {single_ms:>10.2f} {single_queries:>10.0f}  {single_result}")
+        print(f"\n⚡ Gain: x{legacy_ms / single_ms:.1f} — identique: {legacy_result == single_result}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
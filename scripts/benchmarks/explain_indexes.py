@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark EXPLAIN ANALYZE des requêtes chaudes, avant / après les index de la
+révision Alembic 0002 et la réécriture des filtres DATE(col) = jour en plages
+
+Tout s'exécute dans une transaction annulée à la fin (PostgreSQL uniquement) :
+- "avant" : index de la révision supprimés (DROP INDEX transactionnel) et
+  filtres d'origine
+- "après" : index présents et filtres par plage
+
+Les DROP INDEX verrouillent les tables le temps du script : à lancer sur une
+base de test ou une copie, pas sur la production.
+
+Usage : python scripts/benchmarks/explain_indexes.py [--seed 200000]
+"""
+
+import sys
+import os
+import argparse
+import importlib.util
+import json
+import re
+from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from sqlalchemy import text
+from app.database import engine
+
+REVISION = os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'migrations', 'versions',
+                        '0002_hot_filter_indexes.py')
+
+
+def load_revision_indexes():
+    spec = importlib.util.spec_from_file_location("hot_filter_indexes", REVISION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.INDEXES
+
+
+# (nom, requête d'origine, requête réécrite)
+QUERIES = [
+    ("session active d'un utilisateur",
+     "SELECT id FROM quiz_sessions WHERE user_id = :user_id AND completed = false LIMIT 1",
+     None),
+    ("agrégats des sessions terminées",
+     "SELECT COUNT(*), SUM(score), MAX(score) FROM quiz_sessions WHERE user_id = :user_id AND completed = true",
+     None),
+    ("sessions démarrées aujourd'hui",
+     "SELECT COUNT(*) FROM quiz_sessions WHERE DATE(started_at) = :today",
+     "SELECT COUNT(*) FROM quiz_sessions WHERE started_at >= :day_start AND started_at < :day_end"),
+    ("utilisateurs actifs aujourd'hui",
+     "SELECT COUNT(DISTINCT user_id) FROM user_activities WHERE DATE(timestamp) = :today",
+     "SELECT COUNT(DISTINCT user_id) FROM user_activities WHERE timestamp >= :day_start AND timestamp < :day_end"),
+    ("jours d'activité (streak)",
+     "SELECT DISTINCT DATE(timestamp) FROM user_activities WHERE user_id = :user_id AND timestamp >= :since",
+     None),
+    ("moyenne des sessions terminées sur 30 jours",
+     "SELECT AVG(score) FROM quiz_sessions WHERE completed = true AND completed_at >= :since",
+     None),
+    ("réponse déjà soumise",
+     "SELECT id FROM quiz_answers WHERE session_id = :session_id AND question_id = :question_id",
+     None),
+    ("questions PLD d'un thème",
+     "SELECT id FROM pld_questions WHERE theme_id = :theme_id",
+     None),
+]
+
+SEED_SQL = [
+    """
+    INSERT INTO quiz_sessions (user_id, score, total_questions, completed, started_at, completed_at)
+    SELECT u.ids[1 + (g % array_length(u.ids, 1))], g % 11, 10, g % 20 <> 0,
+           now() - (g % 365) * interval '1 day', now() - (g % 365) * interval '1 day' + interval '10 minutes'
+    FROM generate_series(1, :rows) g, (SELECT array_agg(id) AS ids FROM users) u
+    """,
+    """
+    INSERT INTO user_activities (user_id, activity_type, timestamp)
+    SELECT u.ids[1 + (g % array_length(u.ids, 1))], 'page_view', now() - (g % 8760) * interval '1 hour'
+    FROM generate_series(1, :rows) g, (SELECT array_agg(id) AS ids FROM users) u
+    """,
+]
+
+
+def explain(conn, sql: str, params: dict):
+    """Temps d'exécution (ms) et nœud principal du plan"""
+    plan = conn.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + sql), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]
+    node = root["Plan"]
+    # Descendre jusqu'au premier accès à une table
+    while "Plans" in node and not re.search(r"Scan", node["Node Type"]):
+        node = node["Plans"][0]
+    label = node["Node Type"] + (f" ({node['Index Name']})" if "Index Name" in node else "")
+    return root["Execution Time"], label
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0, help="Lignes synthétiques ajoutées (annulées à la fin)")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("❌ Benchmark prévu pour PostgreSQL (DATABASE_URL)")
+        sys.exit(1)
+
+    now = datetime.now()
+    day_start = datetime(now.year, now.month, now.day)
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            if args.seed:
+                for sql in SEED_SQL:
+                    conn.execute(text(sql), {"rows": args.seed})
+                conn.execute(text("ANALYZE quiz_sessions; ANALYZE user_activities"))
+
+            user_id = args.user_id or conn.execute(text(
+                "SELECT user_id FROM quiz_sessions GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"
+            )).scalar() or 1
+            params = {
+                "user_id": user_id,
+                "today": day_start.date(),
+                "day_start": day_start,
+                "day_end": day_start + timedelta(days=1),
+                "since": now - timedelta(days=30),
+                "session_id": conn.execute(text("SELECT MAX(id) FROM quiz_sessions")).scalar() or 1,
+                "question_id": 1,
+                "theme_id": 1,
+            }
+
+            # Avant : sans les index de la révision, filtres d'origine
+            before = {}
+            savepoint = conn.begin_nested()
+            for name, table, _, _ in load_revision_indexes():
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            for name, original, _ in QUERIES:
+                before[name] = explain(conn, original, params)
+            savepoint.rollback()
+
+            print("📊 EXPLAIN ANALYZE : avant / après index et réécriture en plages")
+            print("=" * 100)
+            print(f"{'requête':<44} {'avant (ms)':>11} {'après (ms)':>11}  plan après")
+            for name, original, rewritten in QUERIES:
+                after_ms, after_plan = explain(conn, rewritten or original, params)
+                before_ms, before_plan = before[name]
+                print(f"{name:<44} {before_ms:>11.2f} {after_ms:>11.2f}  {after_plan}  (avant: {before_plan})")
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
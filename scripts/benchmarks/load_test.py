@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test de charge HTTP des routers quiz, PLD et performance
+
+Permet de comparer les modes DB_MODE=sync et DB_MODE=async sur une base
+Postgres locale :
+
+    DB_MODE=sync  python src/main.py   # puis lancer ce script
+    DB_MODE=async python src/main.py   # puis le relancer
+
+    python scripts/benchmarks/load_test.py --username admin --password secret \\
+        --concurrency 50 --duration 30
+
+Nécessite httpx (pip install httpx).
+"""
+
+import sys
+import argparse
+import asyncio
+import random
+import time
+
+try:
+    import httpx
+except ImportError:
+    print("❌ httpx requis pour le test de charge : pip install httpx")
+    sys.exit(1)
+
+ENDPOINTS = [
+    "/api/quiz/questions?limit=10",
+    "/api/quiz/user/stats",
+    "/api/pld/categories",
+    "/api/pld/questions/{category}",
+    "/api/performance/stats/performance",
+    "/api/performance/stats/leaderboard",
+]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/api/auth/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client: httpx.AsyncClient, headers: dict, category: str, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        path = random.choice(ENDPOINTS).format(category=category)
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code >= 500:
+                errors.append(path)
+        except httpx.HTTPError:
+            errors.append(path)
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        token = await login(client, args.username, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.duration
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, headers, args.category, deadline, latencies, errors)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    print("📊 TEST DE CHARGE")
+    print("=" * 50)
+    print(f"URL            : {args.url}")
+    print(f"Concurrence    : {args.concurrency}")
+    print(f"Durée          : {elapsed:.1f}s")
+    print(f"Requêtes       : {len(latencies)} ({len(errors)} erreurs)")
+    print(f"Débit          : {len(latencies) / elapsed:.1f} req/s")
+    print(f"Latence p50    : {percentile(ordered, 0.50):.1f} ms")
+    print(f"Latence p95    : {percentile(ordered, 0.95):.1f} ms")
+    print(f"Latence p99    : {percentile(ordered, 0.99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge des endpoints quiz/PLD/performance")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--category", default="shell", help="Catégorie PLD utilisée pour /api/pld/questions")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
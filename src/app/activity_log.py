@@ -0,0 +1,164 @@
+"""
+Journal d'activité utilisateur en écriture différée
+
+Les requêtes déposent les événements dans une file bornée (aucun accès à la
+base) ; une tâche asyncio les insère par lots (executemany) dès que
+ACTIVITY_BATCH_SIZE événements attendent ou au plus tard après
+ACTIVITY_FLUSH_MS millisecondes. File pleine : l'événement est abandonné et
+compté (`dropped`). La file est vidée à l'arrêt de l'application.
+Chaque lot met aussi à jour les séries de jours d'activité des utilisateurs
+concernés (une ligne d'agrégats par utilisateur).
+
+Configuration (variables d'environnement) :
+- ACTIVITY_QUEUE_SIZE : capacité de la file
+- ACTIVITY_BATCH_SIZE : taille d'un lot d'insertion
+- ACTIVITY_FLUSH_MS : délai maximum avant écriture
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models import UserActivity
+from app.performance_rollups import record_activity_days
+
+ACTIVITY_QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+ACTIVITY_FLUSH_MS = int(os.getenv("ACTIVITY_FLUSH_MS", "500"))
+
+
+class ActivityLogger:
+    """File bornée d'événements et tâche d'insertion par lots"""
+
+    def __init__(self, max_size: int = ACTIVITY_QUEUE_SIZE, batch_size: int = ACTIVITY_BATCH_SIZE,
+                 flush_ms: int = ACTIVITY_FLUSH_MS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._enqueued = 0
+        self._dropped = 0
+        self._written = 0
+        self._failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def log(self, user_id: int, activity_type: str, activity_data: Dict = None) -> bool:
+        """
+        Dépose un événement sans attendre (appelable depuis tout thread) ;
+        False si la tâche d'écriture ne tourne pas ou si la file est pleine
+        """
+        if self._task is None:
+            return False
+        row = {
+            "user_id": user_id,
+            "activity_type": activity_type,
+            "activity_data": json.dumps(activity_data) if activity_data else None,
+            # Horodatage de l'événement, pas de l'écriture du lot
+            "timestamp": datetime.now(timezone.utc)
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+        with self._lock:
+            self._enqueued += 1
+        if self._queue.qsize() >= self.batch_size:
+            try:
+                self._loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                pass  # Boucle fermée : l'événement sera écrit par `stop`
+        return True
+
+    def _drain(self) -> List[Dict]:
+        rows = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: List[Dict]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(UserActivity), rows)
+            days_by_user: Dict[int, set] = {}
+            for row in rows:
+                days_by_user.setdefault(row["user_id"], set()).add(row["timestamp"].date())
+            record_activity_days(db, days_by_user)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _flush(self):
+        """Écrit tous les événements en attente, par lots"""
+        rows = self._drain()
+        while rows:
+            try:
+                await self._loop.run_in_executor(None, self._write, rows)
+                with self._lock:
+                    self._written += len(rows)
+            except Exception as e:
+                # Lot perdu : on ne bloque pas la file sur une base indisponible
+                with self._lock:
+                    self._failed += len(rows)
+                print(f"Erreur écriture des activités: {e}")
+            rows = self._drain()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush()
+
+    async def stop(self):
+        """Arrête la tâche puis écrit les derniers événements"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._flush()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "queued": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed
+            }
+
+
+# Instance globale du journal d'activité
+activity_logger = ActivityLogger()
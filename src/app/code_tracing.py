@@ -0,0 +1,451 @@
+"""
+Exécution tracée du code utilisateur (visualiseur, tuteur Python et tests
+des exercices du Coding Lab)
+
+Ces fonctions tournent uniquement dans les processus du pool d'exécution
+(app/execution_worker.py), jamais dans le worker web. Chaque étape est
+convertie en types JSON au moment où elle est capturée puis ajoutée à une
+trace delta (app/trace_format.py) : seules les différences avec l'étape
+précédente sont conservées.
+
+Les dépassements de limites (nombre d'étapes, temps CPU) lèvent des
+exceptions dérivées de BaseException : un `except Exception` du code
+utilisateur ne les intercepte pas, et le traceur les relève à la ligne
+suivante sinon.
+
+Le code utilisateur n'a que des builtins restreints : pas d'open, d'exec
+ni de __import__ (imports limités à SAFE_MODULES), et les attributs
+privés (`_x`, `__class__`...) sont refusés à la compilation. Ce n'est pas
+la frontière de sécurité (voir app/execution_worker.py) mais cela ferme
+les accès directs au système.
+"""
+import ast
+import builtins
+import io
+import sys
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+from typing import Any, Dict, List, Optional
+
+from app.trace_format import TraceEncoder
+
+USER_CODE_FILENAME = "<user_code>"
+TEST_CASE_FILENAME = "<test_case>"
+
+# Version des traceurs : à incrémenter quand leur résultat change pour un
+# même code (clé du cache des résultats, app/execution_cache.py)
+EXECUTOR_VERSION = 2
+
+# Profondeur et taille maximales des valeurs copiées dans la trace
+MAX_VALUE_DEPTH = 4
+MAX_VALUE_ITEMS = 100
+
+# Sortie gardée par cas de test (une boucle de print ne remplit pas la mémoire)
+MAX_TEST_OUTPUT_CHARS = 4000
+
+
+class ExecutionLimitExceeded(BaseException):
+    """Limite de ressources atteinte pendant l'exécution du code utilisateur"""
+
+
+class StepLimitExceeded(ExecutionLimitExceeded):
+    limit = "steps"
+
+
+class CPULimitExceeded(ExecutionLimitExceeded):
+    limit = "cpu"
+
+
+def to_jsonable(value: Any, max_depth: int = MAX_VALUE_DEPTH) -> Any:
+    """Copie une valeur Python en types JSON (repr pour le reste)"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if max_depth <= 0:
+        return _safe_repr(value)
+    if isinstance(value, dict):
+        return {
+            str(key): to_jsonable(item, max_depth - 1)
+            for key, item in list(value.items())[:MAX_VALUE_ITEMS]
+        }
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [to_jsonable(item, max_depth - 1) for item in list(value)[:MAX_VALUE_ITEMS]]
+    return _safe_repr(value)
+
+
+def _safe_repr(value: Any) -> str:
+    try:
+        return repr(value)
+    except Exception:
+        return f"<{type(value).__name__}>"
+
+
+def _user_variables(namespace: Dict) -> Dict:
+    return {name: value for name, value in namespace.items() if not name.startswith("__")}
+
+
+def _jsonable_variables(namespace: Dict) -> Dict:
+    return {name: to_jsonable(value) for name, value in _user_variables(namespace).items()}
+
+
+def _limit_error(error: BaseException) -> str:
+    if isinstance(error, MemoryError):
+        return "Limite mémoire dépassée"
+    return str(error)
+
+
+def _limit_name(error: BaseException) -> str:
+    return "memory" if isinstance(error, MemoryError) else error.limit
+
+
+# ================================
+# BUILTINS ET IMPORTS DU CODE UTILISATEUR
+# ================================
+
+# Modules importables : aucun n'expose sys/os par un attribut public
+SAFE_MODULES = frozenset({
+    "math", "cmath", "string", "itertools", "functools", "operator", "collections",
+    "heapq", "bisect", "decimal", "copy"
+})
+
+# Attributs spéciaux autorisés (classes des débutants) ; les autres `_x` sont refusés
+ALLOWED_PRIVATE_ATTRIBUTES = frozenset({"__init__", "__name__", "__doc__", "__str__", "__repr__"})
+
+
+def _safe_import(name: str, globals=None, locals=None, fromlist=(), level: int = 0):
+    if level != 0 or name.split(".")[0] not in SAFE_MODULES:
+        raise ImportError(f"Module non autorisé: {name}")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def preload_safe_modules():
+    """Importe les modules autorisés avant le fork des tâches (aucun fichier ouvert ensuite)"""
+    for module in SAFE_MODULES:
+        __import__(module)
+
+
+SANDBOX_BUILTINS = {
+    **{name: value for name, value in vars(builtins).items()
+       if isinstance(value, type) and issubclass(value, Exception)},
+    'len': len, 'range': range, 'int': int, 'float': float, 'str': str, 'complex': complex,
+    'bool': bool, 'list': list, 'dict': dict, 'tuple': tuple, 'set': set, 'frozenset': frozenset,
+    'bytes': bytes, 'bytearray': bytearray, 'object': object, 'type': type, 'super': super,
+    'property': property, 'staticmethod': staticmethod, 'classmethod': classmethod,
+    'sum': sum, 'max': max, 'min': min, 'abs': abs, 'round': round, 'pow': pow, 'divmod': divmod,
+    'sorted': sorted, 'reversed': reversed, 'enumerate': enumerate, 'zip': zip, 'map': map,
+    'filter': filter, 'all': all, 'any': any, 'iter': iter, 'next': next, 'slice': slice,
+    'isinstance': isinstance, 'issubclass': issubclass, 'callable': callable, 'hasattr': hasattr,
+    'repr': repr, 'format': format, 'chr': chr, 'ord': ord, 'bin': bin, 'oct': oct, 'hex': hex,
+    'hash': hash, 'id': id, 'print': print,
+    '__build_class__': builtins.__build_class__, '__import__': _safe_import,
+}
+
+
+def _forbidden_access(tree: ast.AST) -> Optional[ast.AST]:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr.startswith("_") \
+                and node.attr not in ALLOWED_PRIVATE_ATTRIBUTES:
+            return node
+        if isinstance(node, ast.Name) and node.id.startswith("__") and node.id != "__name__":
+            return node
+    return None
+
+
+def compile_user_code(code: str):
+    """Compile le code utilisateur ; SyntaxError si un attribut ou nom privé est utilisé"""
+    tree = ast.parse(code, USER_CODE_FILENAME)
+    node = _forbidden_access(tree)
+    if node is not None:
+        name = node.attr if isinstance(node, ast.Attribute) else node.id
+        lines = code.splitlines()
+        line = lines[node.lineno - 1] if 0 < node.lineno <= len(lines) else ""
+        raise SyntaxError(f"Accès non autorisé: {name}", (USER_CODE_FILENAME, node.lineno, node.col_offset + 1, line))
+    return compile(tree, USER_CODE_FILENAME, "exec")
+
+
+# ================================
+# VISUALISEUR (/api/visualize)
+# ================================
+
+def trace_lines(code: str, max_steps: int) -> Dict:
+    """Numéro de ligne et variables locales à chaque ligne exécutée (trace delta)"""
+    encoder = TraceEncoder()
+    output = io.StringIO()
+
+    def tracer(frame, event, arg):
+        if frame.f_code.co_filename != USER_CODE_FILENAME:
+            return None
+        if event == "line":
+            if encoder.step_count >= max_steps:
+                raise StepLimitExceeded(f"Nombre maximal d'étapes atteint ({max_steps})")
+            encoder.add_line_step(frame.f_lineno, _jsonable_variables(frame.f_locals))
+        return tracer
+
+    error = None
+    limit = None
+    try:
+        compiled = compile_user_code(code)
+        with redirect_stdout(output):
+            sys.settrace(tracer)
+            try:
+                exec(compiled, {"__name__": "__main__", "__builtins__": SANDBOX_BUILTINS})
+            finally:
+                sys.settrace(None)
+    except (ExecutionLimitExceeded, MemoryError) as e:
+        error, limit = _limit_error(e), _limit_name(e)
+    except Exception:
+        error = traceback.format_exc()
+    return {"trace": encoder.finish(), "error": error, "output": output.getvalue(), "limit": limit}
+
+
+# ================================
+# TUTEUR PYTHON (/run-python-code)
+# ================================
+
+SAFE_BUILTINS = {
+    'len': len, 'range': range, 'int': int, 'float': float, 'str': str,
+    'bool': bool, 'list': list, 'dict': dict, 'tuple': tuple, 'set': set,
+    'sum': sum, 'max': max, 'min': min, 'abs': abs, 'round': round,
+    'sorted': sorted, 'reversed': reversed, 'enumerate': enumerate, 'zip': zip,
+}
+
+
+def _extract_heap(vars_dict: Dict, seen_ids: set = None):
+    """Objets référencés par les variables (façon Python Tutor) : heap et références"""
+    if seen_ids is None:
+        seen_ids = set()
+    heap = {}
+    refs = {}
+
+    def extract(obj):
+        if isinstance(obj, (int, float, bool, type(None), str)):
+            return None  # Valeur simple, stockée directement
+        obj_id = f"id{id(obj)}"
+        if obj_id in seen_ids:
+            return obj_id
+        seen_ids.add(obj_id)
+        obj_refs = []
+
+        def member(item):
+            item_id = extract(item)
+            if item_id:
+                obj_refs.append(item_id)
+                return {'ref': item_id}
+            return item
+
+        if isinstance(obj, (list, tuple, set)):
+            value = [member(item) for item in obj]
+        elif isinstance(obj, dict):
+            value = {k: member(v) for k, v in obj.items()}
+        elif hasattr(obj, '__dict__'):
+            try:
+                value = {k: member(v) for k, v in vars(obj).items()}
+            except Exception:
+                value = _safe_repr(obj)
+        else:
+            value = _safe_repr(obj)
+
+        heap[obj_id] = {'type': type(obj).__name__, 'value': value, 'refs': obj_refs}
+        return obj_id
+
+    for name, var in vars_dict.items():
+        refs[name] = extract(var) or var
+    return heap, refs
+
+
+def trace_detailed(code: str, max_steps: int) -> Dict:
+    """Pile d'appels, heap, références et sortie à chaque ligne exécutée (trace delta)"""
+    encoder = TraceEncoder()
+    output_progress: List[str] = []
+    output_length = 0
+    lines = code.splitlines()
+
+    def traced_print(*args, **kwargs):
+        nonlocal output_length
+        s = ' '.join(str(a) for a in args)
+        output_progress.append(s + '\n')
+        output_length += len(s) + 1
+        return s
+
+    safe_globals = {'__builtins__': {**SAFE_BUILTINS, 'print': traced_print}}
+
+    def tracer(frame, event, arg):
+        if frame.f_code.co_filename != USER_CODE_FILENAME:
+            return None
+        if event == 'line':
+            if encoder.step_count >= max_steps:
+                raise StepLimitExceeded(f"Nombre maximal d'étapes atteint ({max_steps})")
+            lineno = frame.f_lineno
+            stack = []
+            f = frame
+            while f is not None and f.f_code.co_filename == USER_CODE_FILENAME:
+                stack.append((f.f_code.co_name, f.f_lineno, _jsonable_variables(f.f_locals)))
+                f = f.f_back
+            stack.reverse()
+            # Un seul parcours du heap pour les locales et les globales
+            heap, refs = _extract_heap({**_user_variables(frame.f_locals), **_user_variables(frame.f_globals)})
+            encoder.add_detailed_step(
+                lineno,
+                lines[lineno - 1].rstrip() if 0 < lineno <= len(lines) else '',
+                output_length,
+                stack,
+                {obj_id: to_jsonable(entry, MAX_VALUE_DEPTH + 2) for obj_id, entry in heap.items()},
+                _jsonable_variables(refs)
+            )
+        return tracer
+
+    stdout_capture = io.StringIO()
+    stderr_capture = io.StringIO()
+    try:
+        compiled = compile_user_code(code)
+        with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
+            sys.settrace(tracer)
+            try:
+                exec(compiled, safe_globals)
+            finally:
+                sys.settrace(None)
+    except (ExecutionLimitExceeded, MemoryError) as e:
+        return {"output": None, "error": _limit_error(e), "trace": encoder.finish(''.join(output_progress)),
+                "limit": _limit_name(e)}
+    except Exception as e:
+        return {"output": None, "error": f"Erreur d'exécution: {str(e)}", "trace": encoder.finish(''.join(output_progress)),
+                "limit": None}
+
+    progress = ''.join(output_progress)
+    output = stdout_capture.getvalue() or progress
+    error = stderr_capture.getvalue()
+    return {"output": output or None, "error": error or None, "trace": encoder.finish(progress), "limit": None}
+
+
+# ================================
+# EXERCICES DU CODING LAB (/api/coding-lab/run-code)
+# ================================
+
+class _BoundedOutput(io.StringIO):
+    """Sortie standard tronquée à max_chars caractères"""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+        self.truncated = False
+
+    def write(self, text: str) -> int:
+        remaining = self.max_chars - self.tell()
+        if len(text) > remaining:
+            self.truncated = True
+            if remaining > 0:
+                super().write(text[:remaining])
+            return len(text)
+        return super().write(text)
+
+
+def _input_from(lines: List[str]):
+    """input() alimenté par les entrées du cas de test (écho comme dans un terminal)"""
+    pending = [str(line) for line in lines]
+
+    def fake_input(prompt: Any = "") -> str:
+        print(prompt, end="")
+        if not pending:
+            raise EOFError("Aucune entrée disponible pour input()")
+        line = pending.pop(0)
+        print(line)
+        return line
+
+    return fake_input
+
+
+def _same_value(actual: Any, expected: Any, compare: str) -> bool:
+    if compare == "unordered" and isinstance(actual, list) and isinstance(expected, list):
+        return sorted(actual, key=repr) == sorted(expected, key=repr)
+    return actual == expected
+
+
+def _user_traceback(error: BaseException) -> str:
+    """Traceback limité aux frames de la soumission et du cas (sans le processus d'exécution)"""
+    frames = [
+        frame for frame in traceback.extract_tb(error.__traceback__)
+        if frame.filename in (USER_CODE_FILENAME, TEST_CASE_FILENAME)
+    ]
+    header = "Traceback (most recent call last):\n" + "".join(traceback.format_list(frames)) if frames else ""
+    return header + "".join(traceback.format_exception_only(type(error), error))
+
+
+def _check_case(case: Dict, namespace: Dict, output: _BoundedOutput) -> Dict:
+    """Vérifie un cas après l'exécution de la soumission : (réussi, valeur obtenue, message)"""
+    namespace["_sortie"] = output.getvalue()
+    expected_error = case.get("raises")
+    try:
+        if case.get("setup"):
+            exec(compile(case["setup"], TEST_CASE_FILENAME, "exec"), namespace)
+        actual = eval(compile(case["expr"], TEST_CASE_FILENAME, "eval"), namespace) if case.get("expr") else None
+    except Exception as e:
+        if expected_error and expected_error in [cls.__name__ for cls in type(e).__mro__]:
+            return {"passed": True, "actual": f"{type(e).__name__}: {e}", "error": None}
+        raise
+
+    if expected_error:
+        return {"passed": False, "actual": to_jsonable(actual), "error": f"{expected_error} attendue"}
+
+    if case.get("expr"):
+        actual = to_jsonable(actual)
+        if not _same_value(actual, case.get("expected"), case.get("compare", "equal")):
+            return {"passed": False, "actual": actual, "error": "Résultat incorrect"}
+    else:
+        actual = None
+
+    missing = [text for text in case.get("output_contains", ()) if text not in output.getvalue()]
+    if missing:
+        return {"passed": False, "actual": actual, "error": f"Sortie attendue absente: {missing[0]!r}"}
+    return {"passed": True, "actual": actual, "error": None}
+
+
+def run_test_case(code: str, max_steps: int, case: Dict) -> Dict:
+    """
+    Exécute la soumission puis vérifie un cas de test (app/coding_lab_exercises.py).
+    Les lignes du code utilisateur sont comptées (limite d'étapes, y compris
+    dans les fonctions appelées par le cas) ; la durée est mesurée dans le
+    processus, attente du pool exclue.
+    """
+    steps = 0
+
+    def tracer(frame, event, arg):
+        nonlocal steps
+        if frame.f_code.co_filename != USER_CODE_FILENAME:
+            return None
+        if event == "line":
+            steps += 1
+            if steps > max_steps:
+                raise StepLimitExceeded(f"Nombre maximal d'étapes atteint ({max_steps})")
+        return tracer
+
+    output = _BoundedOutput(MAX_TEST_OUTPUT_CHARS)
+    namespace = {
+        "__name__": "__main__",
+        "__builtins__": {**SANDBOX_BUILTINS, "input": _input_from(case.get("stdin", ()))}
+    }
+    result = {
+        "name": case["name"],
+        "passed": False,
+        "expected": case.get("raises") or (case.get("expected") if case.get("expr") else case.get("output_contains")),
+        "actual": None,
+        "error": None,
+        "limit": None
+    }
+    started = time.perf_counter()
+    try:
+        compiled = compile_user_code(code)
+        with redirect_stdout(output):
+            sys.settrace(tracer)
+            try:
+                exec(compiled, namespace)
+                result.update(_check_case(case, namespace, output))
+            finally:
+                sys.settrace(None)
+    except (ExecutionLimitExceeded, MemoryError) as e:
+        result["error"], result["limit"] = _limit_error(e), _limit_name(e)
+    except Exception as e:
+        result["error"] = _user_traceback(e)
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    result["steps"] = steps
+    result["output"] = output.getvalue() + ("\n[sortie tronquée]" if output.truncated else "")
+    return result
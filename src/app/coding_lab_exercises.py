@@ -0,0 +1,100 @@
+"""
+Cas de test des exercices du Coding Lab (exécutés côté serveur)
+
+Les énoncés restent dans static/js/coding-lab.js et coding-lab-config.js ;
+ce module ne décrit que ce que la correction vérifie, avec les mêmes
+identifiants. Chaque cas exécute la soumission dans un processus neuf
+(app.code_tracing.run_test_case) puis applique ses vérifications :
+
+- "stdin" : lignes renvoyées par input() ;
+- "setup" : instructions exécutées après la soumission ;
+- "expr" / "expected" : expression évaluée dans l'espace de noms de la
+  soumission et valeur attendue (JSON ; "compare": "unordered" pour une
+  liste dont l'ordre est libre). `_sortie` contient la sortie standard ;
+- "raises" : nom de l'exception que doit lever setup/expr ;
+- "output_contains" : textes attendus dans la sortie standard.
+
+Les cas doivent rester sérialisables en JSON : ils font partie de la clé du
+cache des résultats (modifier un cas invalide les résultats gardés).
+"""
+from typing import Dict, Optional
+
+# Carnet indépendant de celui de la soumission (exercice 5)
+_TEST_CARNET = """test_carnet = {
+    'a': {'nom': 'A', 'ville': 'Paris', 'competences': ['Python']},
+    'b': {'nom': 'B', 'ville': 'Lyon', 'competences': ['SQL']},
+    'c': {'nom': 'C', 'ville': 'Paris', 'competences': ['Python', 'SQL']},
+}"""
+
+EXERCISES: Dict[int, Dict] = {
+    1: {
+        "title": "Variables et Types",
+        "cases": [
+            {"name": "Variable nom (texte non vide)", "expr": "isinstance(nom, str) and len(nom.strip()) > 0",
+             "expected": True},
+            {"name": "Variable age (entier positif)", "expr": "type(age) is int and age > 0", "expected": True},
+            {"name": "Variable ville (texte non vide)", "expr": "isinstance(ville, str) and len(ville.strip()) > 0",
+             "expected": True},
+            {"name": "Informations affichées", "expr": "nom in _sortie and str(age) in _sortie and ville in _sortie",
+             "expected": True},
+        ]
+    },
+    2: {
+        "title": "Conditions et Logique",
+        "cases": [
+            {"name": "Âge négatif refusé", "stdin": ["-5"], "output_contains": ["négatif"]},
+            {"name": "Enfant (10 ans)", "stdin": ["10"], "output_contains": ["enfant"]},
+            {"name": "Adolescent (15 ans)", "stdin": ["15"], "output_contains": ["adolescent"]},
+            {"name": "Adulte (30 ans)", "stdin": ["30"], "output_contains": ["adulte"]},
+            {"name": "Senior (70 ans)", "stdin": ["70"], "output_contains": ["senior"]},
+        ]
+    },
+    3: {
+        "title": "Boucles et Répétitions",
+        "cases": [
+            {"name": "Nombres de 1 à 10 affichés",
+             "expr": "all(str(i) in _sortie.split() for i in range(1, 11))", "expected": True},
+            {"name": "Somme des nombres pairs de 1 à 20", "expr": "somme_pairs", "expected": 110},
+            {"name": "Somme affichée", "output_contains": ["110"]},
+        ]
+    },
+    4: {
+        "title": "Fonctions et Modules",
+        "cases": [
+            {"name": "factorielle(0)", "expr": "factorielle(0)", "expected": 1},
+            {"name": "factorielle(5)", "expr": "factorielle(5)", "expected": 120},
+            {"name": "factorielle(10)", "expr": "factorielle(10)", "expected": 3628800},
+            {"name": "factorielle(-1) lève ValueError", "expr": "factorielle(-1)", "raises": "ValueError"},
+            {"name": "Nombres premiers",
+             "expr": "[n for n in range(30) if est_premier(n)]", "expected": [2, 3, 5, 7, 11, 13, 17, 19, 23, 29]},
+            {"name": "97 est premier, 91 ne l'est pas", "expr": "[est_premier(97), est_premier(91)]",
+             "expected": [True, False]},
+            {"name": "fibonacci(10)", "expr": "fibonacci(10)", "expected": [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]},
+            {"name": "fibonacci(0) et fibonacci(1)", "expr": "[fibonacci(0), fibonacci(1)]", "expected": [[], [0]]},
+        ]
+    },
+    5: {
+        "title": "Structures de Données",
+        "cases": [
+            {"name": "ajouter_contact",
+             "setup": "test_carnet = {}\n"
+                      "ajouter_contact(test_carnet, 'zoe', 'Zoé Petit', 'zoe@email.com', '0600000000', 'Nice', ['Go'])",
+             "expr": "test_carnet['zoe']",
+             "expected": {"nom": "Zoé Petit", "email": "zoe@email.com", "telephone": "0600000000",
+                          "ville": "Nice", "competences": ["Go"]}},
+            {"name": "rechercher_par_ville",
+             "setup": _TEST_CARNET,
+             "expr": "rechercher_par_ville(test_carnet, 'Paris')", "expected": ["A", "C"], "compare": "unordered"},
+            {"name": "competences_uniques sans doublon",
+             "setup": _TEST_CARNET,
+             "expr": "list(competences_uniques(test_carnet))", "expected": ["Python", "SQL"], "compare": "unordered"},
+            {"name": "contacts_par_competence",
+             "setup": _TEST_CARNET,
+             "expr": "contacts_par_competence(test_carnet, 'SQL')", "expected": ["B", "C"], "compare": "unordered"},
+        ]
+    },
+}
+
+
+def get_exercise(exercise_id: int) -> Optional[Dict]:
+    return EXERCISES.get(exercise_id)
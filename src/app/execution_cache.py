@@ -0,0 +1,162 @@
+"""
+Cache des résultats d'exécution du code utilisateur
+
+Une promotion du Coding Lab exécute les mêmes extraits et exemples des
+dizaines de fois. Le résultat d'une exécution (trace delta, sortie, erreur)
+ne dépend que du code, du traceur et des limites : il est gardé sous la clé
+(empreinte du code, version des traceurs, limites) et renvoyé sans passer
+par le pool d'exécution.
+
+Ne sont pas mis en cache :
+- le code qui utilise des modules ou fonctions non déterministes (hasard,
+  heure, entrée, adresses mémoire, introspection), détecté par analyse
+  syntaxique, et les exécutions demandées avec `cache: false` ;
+- les résultats qui dépendent de la charge de la machine (temps CPU ou
+  durée maximale atteints, processus interrompu).
+
+Éviction LRU bornée en nombre d'entrées et en taille totale (JSON).
+
+Configuration (variables d'environnement) :
+- EXEC_CACHE_MAX_ENTRIES : nombre de résultats gardés (0 = pas de cache)
+- EXEC_CACHE_MAX_MB : taille totale maximale des résultats
+"""
+import ast
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from app.code_tracing import EXECUTOR_VERSION
+from app.trace_format import TRACE_FORMAT_VERSION
+
+EXEC_CACHE_MAX_ENTRIES = int(os.getenv("EXEC_CACHE_MAX_ENTRIES", "1000"))
+EXEC_CACHE_MAX_MB = int(os.getenv("EXEC_CACHE_MAX_MB", "64"))
+
+# Limites atteintes selon la charge de la machine : résultat non reproductible
+UNCACHEABLE_LIMITS = frozenset({"cpu", "wall", "crash"})
+
+# Modules importables sans rendre le résultat dépendant de l'exécution
+DETERMINISTIC_MODULES = frozenset({
+    "math", "cmath", "string", "itertools", "functools", "operator", "collections",
+    "heapq", "bisect", "re", "fractions", "decimal", "statistics", "copy", "dataclasses",
+    "enum", "typing", "abc", "textwrap", "json"
+})
+
+# Fonctions dont le résultat change d'une exécution à l'autre (ou y donnent accès)
+NONDETERMINISTIC_NAMES = frozenset({
+    "id", "hash", "input", "open", "globals", "locals", "vars", "getattr",
+    "__import__", "__builtins__", "exec", "eval", "compile", "breakpoint"
+})
+
+
+def is_deterministic(code: str, allow: frozenset = frozenset()) -> bool:
+    """
+    Vrai si le code n'importe que des modules déterministes et n'appelle rien
+    d'aléatoire. `allow` : noms rendus déterministes par l'appelant (`input`
+    alimenté par les entrées d'un cas de test).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True  # L'erreur de syntaxe est elle-même reproductible
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""] if node.level == 0 else [""]
+        else:
+            modules = ()
+        if any(module.split(".")[0] not in DETERMINISTIC_MODULES for module in modules):
+            return False
+        if isinstance(node, ast.Name) and node.id in NONDETERMINISTIC_NAMES and node.id not in allow:
+            return False
+        if isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            return False  # Introspection (__class__, __globals__...)
+    return True
+
+
+class ExecutionCache:
+    """LRU des résultats d'exécution, borné en entrées et en octets"""
+
+    def __init__(self, max_entries: int = EXEC_CACHE_MAX_ENTRIES, max_bytes: int = EXEC_CACHE_MAX_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Métriques
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._stored = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(func: Callable, code: str, limits: Dict, args: tuple = ()) -> str:
+        """Empreinte (traceur, versions, limites, arguments, code)"""
+        header = json.dumps([
+            f"{func.__module__}.{func.__qualname__}", EXECUTOR_VERSION, TRACE_FORMAT_VERSION, limits, list(args)
+        ], sort_keys=True)
+        return hashlib.sha256(f"{header}\n{code}".encode("utf-8")).hexdigest()
+
+    def bypass(self):
+        self._bypassed += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return dict(entry[1])
+
+    def put(self, key: str, result: Dict):
+        if result.get("limit") in UNCACHEABLE_LIMITS:
+            return
+        size = len(json.dumps(result, ensure_ascii=False))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._entries[key] = (size, result)
+            self._bytes += size
+            self._stored += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted_size, _ = self._entries.popitem(last=False)[1]
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self) -> Dict:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "bypassed": self._bypassed,
+            "stored": self._stored,
+            "evictions": self._evictions
+        }
+
+
+# Instance globale du cache des résultats
+execution_cache = ExecutionCache()
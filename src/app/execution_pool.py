@@ -0,0 +1,352 @@
+"""
+Pool d'exécution du code utilisateur : processus pré-lancés et bornés
+
+Le visualiseur (/api/visualize) et le tuteur Python exécutent du code
+arbitraire sous `sys.settrace`. Dans le worker web, une boucle infinie
+bloque tout le serveur et le traçage ralentit les autres requêtes. Ici le
+code tourne dans des processus séparés (app/execution_worker.py), lancés à
+l'avance dans leur propre session avec un environnement minimal et tenus
+prêts dans une file. Chaque tâche y est exécutée dans un processus fils
+isolé (descripteurs fermés, utilisateur sans privilèges, rlimits).
+
+Les échanges se font en JSON préfixé par sa longueur sur un socketpair :
+aucun résultat n'est désérialisé avec pickle, et un résultat dont la forme
+ne correspond pas à la tâche est remplacé par une erreur.
+
+Limites par tâche :
+- temps CPU (RLIMIT_CPU souple et dure du processus fils, SIGXCPU) ;
+- durée totale : le groupe de processus est tué au-delà de EXEC_WALL_SECONDS ;
+- mémoire (RLIMIT_AS), aucun fichier écrit, aucun nouveau processus ;
+- nombre de lignes tracées (EXEC_MAX_STEPS).
+
+Les tâches attendent un processus libre dans la limite de EXEC_QUEUE_SIZE
+(au-delà : ExecutionQueueFull). Une tâche annulée (client déconnecté) ou
+hors délai tue son groupe de processus ; un remplaçant est lancé aussitôt.
+Un processus est recyclé après EXEC_MAX_JOBS_PER_WORKER tâches (le code
+utilisateur tourne déjà dans un fils neuf à chaque tâche).
+
+Configuration (variables d'environnement) :
+- EXEC_WORKERS : nombre de processus prêts
+- EXEC_QUEUE_SIZE : tâches en attente d'un processus
+- EXEC_CPU_SECONDS, EXEC_WALL_SECONDS, EXEC_MEMORY_MB, EXEC_MAX_STEPS
+- EXEC_MAX_JOBS_PER_WORKER
+- EXEC_SANDBOX_USER : utilisateur des tâches quand le serveur tourne en root
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from app.execution_cache import execution_cache, is_deterministic
+from app.execution_worker import (
+    HEADER_SIZE, TASKS, encode_message, error_result, message_size, recv_message, validate_result
+)
+from app.grading_executor import _percentiles
+
+EXEC_WORKERS = int(os.getenv("EXEC_WORKERS", "2"))
+EXEC_QUEUE_SIZE = int(os.getenv("EXEC_QUEUE_SIZE", "50"))
+EXEC_CPU_SECONDS = int(os.getenv("EXEC_CPU_SECONDS", "2"))
+EXEC_WALL_SECONDS = float(os.getenv("EXEC_WALL_SECONDS", "5"))
+EXEC_MEMORY_MB = int(os.getenv("EXEC_MEMORY_MB", "256"))
+EXEC_MAX_STEPS = int(os.getenv("EXEC_MAX_STEPS", "10000"))
+EXEC_MAX_JOBS_PER_WORKER = int(os.getenv("EXEC_MAX_JOBS_PER_WORKER", "100"))
+EXEC_SANDBOX_USER = os.getenv("EXEC_SANDBOX_USER", "nobody")
+EXEC_METRICS_WINDOW = 1000
+
+# Répertoire contenant le paquet `app` (racine des imports des processus)
+_SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Délai maximal de démarrage d'un processus (imports compris)
+_STARTUP_TIMEOUT = 10
+
+
+class ExecutionQueueFull(Exception):
+    """Trop de tâches en attente d'un processus d'exécution"""
+
+
+def _limits() -> Dict:
+    return {
+        "cpu_seconds": EXEC_CPU_SECONDS,
+        "memory_mb": EXEC_MEMORY_MB,
+        "max_steps": EXEC_MAX_STEPS,
+        "sandbox_user": EXEC_SANDBOX_USER,
+    }
+
+
+class _Worker:
+    """Processus d'exécution prêt (imports faits, limites appliquées)"""
+
+    def __init__(self, limits: Dict):
+        self.sock, child_sock = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, "-s", "-m", "app.execution_worker", str(child_sock.fileno()), json.dumps(limits)],
+            pass_fds=(child_sock.fileno(),),
+            cwd=_SOURCE_ROOT,
+            # Hash des chaînes fixe : ordre des ensembles reproductible (résultats mis en cache)
+            env={"PATH": os.environ.get("PATH", ""), "PYTHONDONTWRITEBYTECODE": "1", "PYTHONHASHSEED": "0"},
+            stdin=subprocess.DEVNULL,
+            start_new_session=True,  # Groupe de processus propre : tué en entier
+        )
+        child_sock.close()
+        self.jobs = 0
+        try:
+            self.sock.settimeout(_STARTUP_TIMEOUT)
+            ready = recv_message(self.sock)
+        except (EOFError, OSError, ValueError):
+            ready = None
+        if ready != "ready":
+            self.kill()
+            raise RuntimeError("Processus d'exécution non démarré")
+        self.sock.setblocking(False)
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+        self.sock.close()
+
+
+# ================================
+# POOL (CÔTÉ WEB)
+# ================================
+
+class ExecutionPool:
+    """Processus prêts à exécuter du code, file d'attente bornée"""
+
+    def __init__(self, workers: int = EXEC_WORKERS, queue_size: int = EXEC_QUEUE_SIZE,
+                 wall_seconds: float = EXEC_WALL_SECONDS, max_jobs_per_worker: int = EXEC_MAX_JOBS_PER_WORKER):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.wall_seconds = wall_seconds
+        self.max_jobs_per_worker = max(1, max_jobs_per_worker)
+        self.limits = _limits()
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._live: set = set()
+        self._spawning: set = set()
+        self._stopping = False
+
+        # Métriques
+        self._waiting = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._timeouts = 0
+        self._cancelled = 0
+        self._crashed = 0
+        self._rejected = 0
+        self._recycled = 0
+        self._wait_times = deque(maxlen=EXEC_METRICS_WINDOW)
+        self._latencies = deque(maxlen=EXEC_METRICS_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return self._idle is not None
+
+    async def start(self):
+        """Lance les processus (démarrage de l'application ou première tâche)"""
+        if self._idle is not None:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        await asyncio.gather(*(self._spawn() for _ in range(self.workers)))
+
+    async def _spawn(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                worker = await loop.run_in_executor(None, _Worker, self.limits)
+                break
+            except Exception as e:
+                print(f"Erreur démarrage d'un processus d'exécution: {e}")
+                if self._stopping:
+                    return
+                await asyncio.sleep(1)
+        if self._stopping:
+            await loop.run_in_executor(None, worker.kill)
+            return
+        self._live.add(worker)
+        self._idle.put_nowait(worker)
+
+    def _replace(self, worker: _Worker):
+        """Tue le processus et en lance un nouveau en arrière-plan"""
+        self._live.discard(worker)
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, worker.kill)
+        if not self._stopping:
+            task = loop.create_task(self._spawn())
+            self._spawning.add(task)
+            task.add_done_callback(self._spawning.discard)
+
+    async def _receive(self, worker: _Worker) -> bytes:
+        """Attend un message complet sans bloquer la boucle (lecture quand le socket est prêt)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        fd = worker.sock.fileno()
+        buffer = bytearray()
+
+        def on_readable():
+            if future.done():
+                return
+            try:
+                chunk = worker.sock.recv(1024 * 1024)
+                if not chunk:
+                    raise EOFError("Processus d'exécution terminé")
+                buffer.extend(chunk)
+                if len(buffer) >= HEADER_SIZE:
+                    size = message_size(buffer)
+                    if len(buffer) >= HEADER_SIZE + size:
+                        future.set_result(bytes(buffer[HEADER_SIZE:HEADER_SIZE + size]))
+            except BlockingIOError:
+                return
+            except Exception as e:
+                future.set_exception(e)
+
+        loop.add_reader(fd, on_readable)
+        try:
+            return await future
+        finally:
+            loop.remove_reader(fd)
+
+    async def run(self, func: Callable, code: str, *args, use_cache: bool = True,
+                  cache_allow: frozenset = frozenset()) -> Dict:
+        """
+        Exécute `func(code, max_steps, *args)` (fonction de app.code_tracing
+        enregistrée dans execution_worker.TASKS) dans un processus du pool ;
+        `args` doivent être sérialisables en JSON.
+        Les dépassements de limites sont renvoyés dans "error" ; seule une
+        file pleine lève ExecutionQueueFull.
+        Un code déterministe déjà exécuté est servi par le cache des résultats
+        (`cache_allow` : voir is_deterministic).
+        """
+        cache_key = None
+        if use_cache and execution_cache.enabled and is_deterministic(code, cache_allow):
+            cache_key = execution_cache.key(func, code, {**self.limits, "wall_seconds": self.wall_seconds}, args)
+            cached = execution_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        else:
+            execution_cache.bypass()
+
+        result = await self._execute(func, code, args)
+        if cache_key is not None:
+            execution_cache.put(cache_key, result)
+        return result
+
+    async def _execute(self, func: Callable, code: str, args: tuple = ()) -> Dict:
+        if TASKS.get(func.__name__) is not func:
+            raise ValueError(f"Tâche d'exécution inconnue: {func.__name__}")
+        if self._idle is not None and self._loop is not asyncio.get_running_loop():
+            self._detach()
+        if self._idle is None:
+            await self.start()
+        if self._waiting >= self.queue_size:
+            self._rejected += 1
+            raise ExecutionQueueFull("File d'exécution pleine, réessayez plus tard")
+
+        submitted_at = time.time()
+        self._submitted += 1
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        self._wait_times.append(time.time() - submitted_at)
+
+        self._running += 1
+        keep = False
+        try:
+            loop = asyncio.get_running_loop()
+            job = encode_message({"task": func.__name__, "code": code, "args": list(args)})
+            payload = await asyncio.wait_for(
+                self._exchange(loop, worker, job), timeout=self.wall_seconds
+            )
+            try:
+                result = json.loads(payload.decode("utf-8"))
+            except (UnicodeDecodeError, ValueError):
+                result = None
+            if not validate_result(func.__name__, result):
+                self._crashed += 1
+                return error_result("Résultat d'exécution invalide", "crash")
+            worker.jobs += 1
+            keep = worker.jobs < self.max_jobs_per_worker
+            self._completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            return error_result(f"Temps d'exécution maximal dépassé ({self.wall_seconds:g}s)", "wall")
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            raise
+        except (EOFError, OSError, ValueError):
+            # Processus mort en cours de tâche (OOM killer...) ou message invalide
+            self._crashed += 1
+            return error_result("Exécution interrompue : limite de ressources atteinte", "crash")
+        finally:
+            self._running -= 1
+            self._latencies.append(time.time() - submitted_at)
+            if keep and not self._stopping:
+                self._idle.put_nowait(worker)
+            else:
+                self._recycled += 1
+                self._replace(worker)
+
+    async def _exchange(self, loop: asyncio.AbstractEventLoop, worker: _Worker, job: bytes) -> bytes:
+        await loop.sock_sendall(worker.sock, job)
+        return await self._receive(worker)
+
+    def _detach(self):
+        """Abandonne l'état lié à une autre boucle d'événements (scripts, tests)"""
+        for worker in self._live:
+            worker.kill()
+        self._live = set()
+        self._spawning = set()
+        self._idle = None
+
+    async def stop(self):
+        """Arrête tous les processus (arrêt de l'application)"""
+        if self._idle is None:
+            return
+        self._stopping = True
+        for task in list(self._spawning):
+            task.cancel()
+        loop = asyncio.get_running_loop()
+        workers, self._live = list(self._live), set()
+        await asyncio.gather(*(loop.run_in_executor(None, worker.kill) for worker in workers))
+        self._idle = None
+
+    def metrics(self) -> Dict:
+        """Processus, file d'attente, issues des tâches, latences (ms) et cache des résultats"""
+        return {
+            "workers": self.workers,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "queue_depth": self._waiting,
+            "in_flight": self._running,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "timeouts": self._timeouts,
+            "cancelled": self._cancelled,
+            "crashed": self._crashed,
+            "rejected": self._rejected,
+            "recycled": self._recycled,
+            "limits": {**self.limits, "wall_seconds": self.wall_seconds},
+            "wait_ms": _percentiles(self._wait_times),
+            "latency_ms": _percentiles(self._latencies),
+            "cache": execution_cache.metrics()
+        }
+
+
+# Instance globale du pool d'exécution
+execution_pool = ExecutionPool()
@@ -0,0 +1,280 @@
+"""
+Processus d'exécution du pool (app/execution_pool.py)
+
+Lancé par `python -m app.execution_worker FD LIMITES_JSON` dans une session
+à part (le pool tue tout le groupe de processus) avec un environnement
+minimal (aucun secret de l'application).
+
+Sur le socket FD ne circulent que des messages JSON préfixés par leur
+longueur, dans les deux sens : {"task", "code", "args"} -> résultat. Rien
+n'est jamais désérialisé avec pickle, et le pool vérifie la forme de chaque
+résultat (validate_result).
+
+Ce processus n'exécute pas lui-même le code utilisateur : chaque tâche
+tourne dans un processus fils (fork) qui, avant toute exécution, ferme
+tous ses descripteurs sauf le pipe de son résultat, redirige ses sorties
+vers /dev/null, prend un utilisateur sans privilèges si le pool tourne en
+root (EXEC_SANDBOX_USER) et applique ses limites : CPU (souple + dure, non
+relevables), mémoire, aucun fichier écrit, aucun nouveau processus. Le
+résultat du fils est relu comme JSON et vérifié ici avant d'être transmis.
+"""
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import traceback
+from typing import Any, Dict
+
+try:
+    import pwd
+    import resource  # Unix uniquement : pas de limites ni de fork ailleurs
+except ImportError:
+    pwd = resource = None
+
+from app.code_tracing import (
+    CPULimitExceeded, preload_safe_modules, run_test_case, trace_detailed, trace_lines
+)
+from app.trace_format import TRACE_FORMAT, empty_trace
+
+# Fonctions exécutables, désignées par leur nom dans les messages
+TASKS = {func.__name__: func for func in (trace_lines, trace_detailed, run_test_case)}
+
+# Limites que peut signaler un résultat
+KNOWN_LIMITS = frozenset({"steps", "cpu", "memory", "wall", "crash"})
+
+# Taille maximale d'un message (tâche ou résultat)
+MAX_MESSAGE_BYTES = 32 * 1024 * 1024
+
+_HEADER = struct.Struct("!I")
+
+# Utilisateur de repli quand EXEC_SANDBOX_USER est introuvable (nobody)
+_NOBODY_ID = 65534
+
+# Descripteur du pipe de résultat dans le processus fils
+_RESULT_FD = 3
+
+
+def error_result(message: str, limit: str = None) -> Dict:
+    """Résultat sans trace ; `limit` : limite atteinte (cpu, memory, wall, crash)"""
+    return {"trace": empty_trace(), "output": None, "error": message, "limit": limit}
+
+
+# ================================
+# PROTOCOLE (JSON PRÉFIXÉ PAR SA LONGUEUR)
+# ================================
+
+def encode_message(payload: Any) -> bytes:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    if len(data) > MAX_MESSAGE_BYTES:
+        raise ValueError("Message trop volumineux")
+    return _HEADER.pack(len(data)) + data
+
+
+def message_size(buffer: bytes) -> int:
+    """Taille annoncée par l'en-tête ; ValueError au-delà de MAX_MESSAGE_BYTES"""
+    size = _HEADER.unpack_from(buffer)[0]
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError("Message trop volumineux")
+    return size
+
+
+HEADER_SIZE = _HEADER.size
+
+
+def _read_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise EOFError("Socket fermé")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Any:
+    """Lecture bloquante d'un message complet"""
+    size = message_size(_read_exactly(sock, HEADER_SIZE))
+    return json.loads(_read_exactly(sock, size).decode("utf-8"))
+
+
+def _is_text(value: Any) -> bool:
+    return value is None or isinstance(value, str)
+
+
+def _valid_trace(trace: Any) -> bool:
+    return (
+        isinstance(trace, dict)
+        and trace.get("format") == TRACE_FORMAT
+        and isinstance(trace.get("strings"), list)
+        and all(isinstance(text, str) for text in trace["strings"])
+        and isinstance(trace.get("output"), str)
+        and isinstance(trace.get("steps"), list)
+        and all(isinstance(step, dict) for step in trace["steps"])
+    )
+
+
+def validate_result(task: str, result: Any) -> bool:
+    """Vrai si le résultat a la forme attendue pour la tâche (rien d'autre n'est transmis)"""
+    if not isinstance(result, dict):
+        return False
+    if result.get("limit") is not None and result["limit"] not in KNOWN_LIMITS:
+        return False
+    if not _is_text(result.get("error")) or not _is_text(result.get("output")):
+        return False
+    if task == run_test_case.__name__ and "passed" in result:
+        return (
+            isinstance(result["passed"], bool)
+            and isinstance(result.get("name"), str)
+            and isinstance(result.get("duration_ms"), (int, float))
+            and isinstance(result.get("steps"), int)
+        )
+    return _valid_trace(result.get("trace"))
+
+
+# ================================
+# PROCESSUS FILS (UNE TÂCHE)
+# ================================
+
+def _sandbox_ids(user: str):
+    try:
+        entry = pwd.getpwnam(user)
+        return entry.pw_uid, entry.pw_gid
+    except KeyError:
+        return _NOBODY_ID, _NOBODY_ID
+
+
+def _enter_sandbox(result_fd: int, limits: Dict) -> int:
+    """
+    Dans le fils, avant le code utilisateur : seul le pipe du résultat reste
+    ouvert (fd 3, aucun autre descripteur possible), puis utilisateur et limites.
+    """
+    if result_fd != _RESULT_FD:
+        os.dup2(result_fd, _RESULT_FD)
+    os.closerange(_RESULT_FD + 1, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    os.chdir("/")
+
+    if os.geteuid() == 0:
+        uid, gid = _sandbox_ids(limits.get("sandbox_user") or "nobody")
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+
+    if limits["memory_mb"] > 0:
+        memory = limits["memory_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    cpu_seconds = max(1, limits["cpu_seconds"])
+    # Limite souple : SIGXCPU -> CPULimitExceeded ; limite dure une seconde après : SIGKILL
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (_RESULT_FD + 1, _RESULT_FD + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    return _RESULT_FD
+
+
+def _call(task: str, code: str, args: list, limits: Dict) -> Dict:
+    try:
+        return TASKS[task](code, limits["max_steps"], *args)
+    except CPULimitExceeded as e:
+        return error_result(str(e), e.limit)
+    except MemoryError:
+        return error_result("Limite mémoire dépassée", "memory")
+    except BaseException:
+        return error_result(traceback.format_exc())
+
+
+def _child(result_fd: int, task: str, code: str, args: list, limits: Dict):
+    """Corps du processus fils ; ne revient jamais (os._exit)"""
+    try:
+        result_fd = _enter_sandbox(result_fd, limits)
+        result = _call(task, code, args, limits)
+        try:
+            data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        except (TypeError, ValueError, MemoryError):
+            data = json.dumps(error_result("Résultat non sérialisable")).encode("utf-8")
+        with os.fdopen(result_fd, "wb") as out:
+            out.write(data)
+    finally:
+        os._exit(0)
+
+
+def run_job(job: Any, limits: Dict) -> Dict:
+    """Exécute une tâche dans un processus fils et renvoie son résultat vérifié"""
+    if not (isinstance(job, dict) and job.get("task") in TASKS
+            and isinstance(job.get("code"), str) and isinstance(job.get("args"), list)):
+        return error_result("Tâche invalide")
+    task, code, args = job["task"], job["code"], job["args"]
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _child(write_fd, task, code, args, limits)
+    os.close(write_fd)
+
+    chunks, size = [], 0
+    with os.fdopen(read_fd, "rb") as pipe:
+        while True:
+            chunk = pipe.read(1024 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_MESSAGE_BYTES:
+                os.kill(pid, signal.SIGKILL)
+                break
+            chunks.append(chunk)
+    _, status, usage = os.wait4(pid, 0)
+
+    if size > MAX_MESSAGE_BYTES:
+        return error_result("Résultat trop volumineux", "crash")
+    if os.WIFSIGNALED(status):
+        if usage.ru_utime + usage.ru_stime >= limits["cpu_seconds"]:
+            return error_result("Temps CPU maximal dépassé", "cpu")
+        return error_result("Exécution interrompue : limite de ressources atteinte", "crash")
+    try:
+        result = json.loads(b"".join(chunks).decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        result = None
+    if not validate_result(task, result):
+        return error_result("Résultat d'exécution invalide", "crash")
+    return result
+
+
+# ================================
+# BOUCLE DU PROCESSUS
+# ================================
+
+def _on_cpu_limit(signum, frame):
+    raise CPULimitExceeded("Temps CPU maximal dépassé")
+
+
+def serve(sock: socket.socket, limits: Dict):
+    """Boucle du processus : reçoit une tâche, renvoie le résultat"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Arrêt piloté par le processus web
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)  # Hérité par les processus fils
+    preload_safe_modules()
+    sock.sendall(encode_message("ready"))
+    while True:
+        try:
+            job = recv_message(sock)
+        except (EOFError, OSError, ValueError):
+            return
+        try:
+            sock.sendall(encode_message(run_job(job, limits)))
+        except ValueError:
+            sock.sendall(encode_message(error_result("Résultat trop volumineux", "crash")))
+        except OSError:
+            return
+
+
+if __name__ == "__main__":
+    if resource is None:
+        sys.exit("Le pool d'exécution nécessite un système Unix (fork, rlimits)")
+    serve(socket.socket(fileno=int(sys.argv[1])), json.loads(sys.argv[2]))
@@ -0,0 +1,185 @@
+"""
+Correction des exercices du Coding Lab : cas de test en parallèle
+
+Une soumission est exécutée une fois par cas de test
+(app/coding_lab_exercises.py), chaque cas dans un processus du pool
+d'exercices (app/execution_pool.py, instance séparée de celle du
+visualiseur). Les cas d'une même soumission tournent en parallèle, mais au
+plus EXERCISE_MAX_PARALLEL_CASES à la fois : une promotion qui soumet en
+même temps se partage les processus à tour de rôle au lieu qu'une
+soumission occupe toute la file. Au-delà de EXERCISE_QUEUE_SIZE cas en
+attente, la soumission est refusée (ExecutionQueueFull -> 503) plutôt que
+d'attendre sans limite.
+
+Avec `stop_on_failure`, le premier cas en échec arrête la correction : les
+cas en cours sont annulés (leur processus est tué) et les suivants marqués
+"skipped".
+
+Deux niveaux de cache, pour un code déterministe (`input` compris : il est
+alimenté par le cas) :
+- chaque cas, dans le cache des résultats d'exécution (app/execution_cache.py) ;
+- le rapport complet, par (exercice, cas, empreinte du code). Un rapport
+  arrêté au premier échec n'est pas gardé (l'ordre d'arrivée des cas varie).
+
+Configuration (variables d'environnement) :
+- EXERCISE_WORKERS : processus du pool d'exercices
+- EXERCISE_QUEUE_SIZE : cas en attente d'un processus
+- EXERCISE_MAX_PARALLEL_CASES : cas exécutés en même temps par soumission
+- EXERCISE_CACHE_MAX_ENTRIES : rapports gardés (0 = pas de cache)
+- EXERCISE_MAX_JOBS_PER_WORKER : cas par processus avant recyclage (chaque
+  cas tourne de toute façon dans un processus fils neuf et isolé)
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.code_tracing import run_test_case
+from app.coding_lab_exercises import get_exercise
+from app.execution_cache import ExecutionCache, is_deterministic, UNCACHEABLE_LIMITS
+from app.execution_pool import ExecutionPool
+
+EXERCISE_WORKERS = int(os.getenv("EXERCISE_WORKERS", "4"))
+EXERCISE_QUEUE_SIZE = int(os.getenv("EXERCISE_QUEUE_SIZE", "200"))
+EXERCISE_MAX_PARALLEL_CASES = int(os.getenv("EXERCISE_MAX_PARALLEL_CASES", "2"))
+EXERCISE_CACHE_MAX_ENTRIES = int(os.getenv("EXERCISE_CACHE_MAX_ENTRIES", "2000"))
+EXERCISE_MAX_JOBS_PER_WORKER = int(os.getenv("EXERCISE_MAX_JOBS_PER_WORKER", "100"))
+
+# `input()` est alimenté par les entrées du cas : résultat reproductible
+_CACHE_ALLOW = frozenset({"input"})
+
+# Exécution libre (sans exercice) : un seul cas sans vérification
+_FREE_RUN_CASE = {"name": "Exécution"}
+
+
+def _case_result(case: Dict, result: Dict) -> Dict:
+    """Résultat d'un cas ; une erreur du pool (durée, processus tué) devient un échec"""
+    if "passed" in result:
+        return {**result, "skipped": False}
+    return {
+        "name": case["name"],
+        "passed": False,
+        "skipped": False,
+        "expected": None,
+        "actual": None,
+        "error": result["error"],
+        "limit": result["limit"],
+        "duration_ms": None,
+        "steps": None,
+        "output": ""
+    }
+
+
+def _skipped(case: Dict) -> Dict:
+    return {"name": case["name"], "passed": False, "skipped": True}
+
+
+class ExerciseRunner:
+    """Exécute une soumission sur les cas de test d'un exercice"""
+
+    def __init__(self, pool: ExecutionPool, max_parallel_cases: int = EXERCISE_MAX_PARALLEL_CASES,
+                 cache_max_entries: int = EXERCISE_CACHE_MAX_ENTRIES):
+        self.pool = pool
+        self.max_parallel_cases = max(1, max_parallel_cases)
+        self.cache = ExecutionCache(max_entries=cache_max_entries)
+
+        # Métriques
+        self._submissions = 0
+        self._stopped_early = 0
+
+    async def _run_cases(self, code: str, cases: List[Dict], stop_on_failure: bool,
+                         use_cache: bool) -> Tuple[List[Optional[Dict]], bool]:
+        """Résultats dans l'ordre des cas (None : non exécuté) et arrêt anticipé"""
+        semaphore = asyncio.Semaphore(self.max_parallel_cases)
+
+        async def run_case(case: Dict) -> Dict:
+            async with semaphore:
+                result = await self.pool.run(run_test_case, code, case, use_cache=use_cache, cache_allow=_CACHE_ALLOW)
+            return _case_result(case, result)
+
+        tasks = [asyncio.ensure_future(run_case(case)) for case in cases]
+        index = {task: position for position, task in enumerate(tasks)}
+        results: List[Optional[Dict]] = [None] * len(cases)
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[index[task]] = task.result()  # ExecutionQueueFull remonte à l'appelant
+                if stop_on_failure and pending and any(result and not result["passed"] for result in results):
+                    return results, True
+            return results, False
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run(self, exercise_id: int, code: str, stop_on_failure: bool = False,
+                  use_cache: bool = True) -> Optional[Dict]:
+        """Rapport de correction, None si l'exercice n'existe pas"""
+        exercise = get_exercise(exercise_id)
+        if exercise is None:
+            return None
+        self._submissions += 1
+        cases = exercise["cases"]
+
+        cache_key = None
+        if use_cache and self.cache.enabled and is_deterministic(code, _CACHE_ALLOW):
+            limits = {**self.pool.limits, "wall_seconds": self.pool.wall_seconds}
+            cache_key = self.cache.key(run_test_case, code, limits, (exercise_id, cases))
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return {**cached, "cached": True}
+        else:
+            self.cache.bypass()
+
+        started = time.perf_counter()
+        results, stopped_early = await self._run_cases(code, cases, stop_on_failure, use_cache)
+        cases_report = [result or _skipped(case) for case, result in zip(cases, results)]
+        passed_count = sum(1 for result in cases_report if result["passed"])
+        skipped_count = sum(1 for result in cases_report if result["skipped"])
+        report = {
+            "exercise_id": exercise_id,
+            "title": exercise["title"],
+            "passed": passed_count == len(cases),
+            "total": len(cases),
+            "passed_count": passed_count,
+            "failed_count": len(cases) - passed_count - skipped_count,
+            "skipped_count": skipped_count,
+            "stopped_early": stopped_early,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "limit": next((result.get("limit") for result in cases_report if result.get("limit")), None),
+            "cases": cases_report,
+            "cached": False
+        }
+        if stopped_early:
+            self._stopped_early += 1
+        elif cache_key is not None and not any(result.get("limit") in UNCACHEABLE_LIMITS for result in cases_report):
+            self.cache.put(cache_key, report)
+        return report
+
+    async def run_free(self, code: str, use_cache: bool = True) -> Dict:
+        """Exécution sans exercice : sortie et erreur du programme"""
+        result = _case_result(_FREE_RUN_CASE, await self.pool.run(
+            run_test_case, code, _FREE_RUN_CASE, use_cache=use_cache
+        ))
+        return {"output": result["output"], "error": result["error"], "limit": result["limit"],
+                "duration_ms": result["duration_ms"]}
+
+    def metrics(self) -> Dict:
+        """Soumissions, arrêts anticipés, cache des rapports et pool d'exercices"""
+        return {
+            "submissions": self._submissions,
+            "stopped_early": self._stopped_early,
+            "max_parallel_cases": self.max_parallel_cases,
+            "report_cache": self.cache.metrics(),
+            "pool": self.pool.metrics()
+        }
+
+
+# Pool et correcteur globaux des exercices (séparés du visualiseur)
+exercise_pool = ExecutionPool(
+    workers=EXERCISE_WORKERS, queue_size=EXERCISE_QUEUE_SIZE, max_jobs_per_worker=EXERCISE_MAX_JOBS_PER_WORKER
+)
+exercise_runner = ExerciseRunner(exercise_pool)
@@ -0,0 +1,131 @@
+"""
+Exports en flux (NDJSON ou tableau JSON découpé) du catalogue PLD, de
+l'historique des réponses IA/PLD et du journal d'activité
+
+Chaque export lit la base par lots de EXPORT_BATCH_SIZE lignes (`yield_per` :
+curseur côté serveur sous PostgreSQL), charge les relations plusieurs-à-un
+dans la même requête (jointure) et écrit chaque ligne dès qu'elle est lue :
+la mémoire reste constante quelle que soit la taille de la table.
+
+Les générateurs ouvrent leur propre session : la réponse est envoyée après
+la fin de l'endpoint.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional
+
+from sqlalchemy.orm import Query, Session, contains_eager
+
+from app.database import SessionLocal
+from app.models import PLDQuestion, PLDTheme, AIQuizAnswer, AIQuizSession, UserActivity
+from app.pld_catalog import parse_technical_terms
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+FORMATS = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _question_row(question: PLDQuestion) -> Dict:
+    return {
+        "question_id": question.id,
+        "question_text": question.question_text,
+        "expected_answer": question.expected_answer,
+        "technical_terms": parse_technical_terms(question.technical_terms),
+        "explanation": question.explanation,
+        "difficulty": question.difficulty,
+        "max_score": question.max_score,
+        "category": question.theme.category.name,
+        "theme": question.theme.name
+    }
+
+
+def _ai_answer_row(answer: AIQuizAnswer) -> Dict:
+    return {
+        "answer_id": answer.id,
+        "session_id": answer.session_id,
+        "user_id": answer.session.user_id,
+        "question_id": answer.question_id,
+        "question_text": answer.question_text,
+        "user_answer": answer.user_answer,
+        "expected_answer": answer.expected_answer,
+        "score": answer.score,
+        "max_score": answer.max_score,
+        "percentage": answer.percentage,
+        "similarity": answer.similarity,
+        "technical_terms_found": parse_technical_terms(answer.technical_terms_found),
+        "technical_bonus": answer.technical_bonus,
+        "feedback": answer.feedback,
+        "answered_at": _iso(answer.answered_at)
+    }
+
+
+def _activity_row(activity: UserActivity) -> Dict:
+    return {
+        "activity_id": activity.id,
+        "user_id": activity.user_id,
+        "activity_type": activity.activity_type,
+        "activity_data": json.loads(activity.activity_data) if activity.activity_data else None,
+        "timestamp": _iso(activity.timestamp)
+    }
+
+
+def questions_query(db: Session) -> Query:
+    return db.query(PLDQuestion).join(PLDQuestion.theme).options(
+        contains_eager(PLDQuestion.theme).joinedload(PLDTheme.category, innerjoin=True)
+    ).order_by(PLDTheme.category_id, PLDQuestion.theme_id, PLDQuestion.id)
+
+
+def ai_answers_query(db: Session, user_id: int = None, since: datetime = None) -> Query:
+    query = db.query(AIQuizAnswer).join(AIQuizAnswer.session).options(contains_eager(AIQuizAnswer.session))
+    if user_id is not None:
+        query = query.filter(AIQuizSession.user_id == user_id)
+    if since is not None:
+        query = query.filter(AIQuizAnswer.answered_at >= since)
+    return query.order_by(AIQuizAnswer.id)
+
+
+def activities_query(db: Session, user_id: int = None, since: datetime = None) -> Query:
+    query = db.query(UserActivity)
+    if user_id is not None:
+        query = query.filter(UserActivity.user_id == user_id)
+    if since is not None:
+        query = query.filter(UserActivity.timestamp >= since)
+    return query.order_by(UserActivity.id)
+
+
+def stream_rows(build_query: Callable[[Session], Query], to_row: Callable, fmt: str = "ndjson",
+                batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Sérialise les lignes une à une : une par ligne (ndjson) ou en tableau JSON"""
+    db = SessionLocal()
+    try:
+        first = True
+        if fmt == "json":
+            yield "["
+        for item in build_query(db).yield_per(batch_size):
+            line = json.dumps(to_row(item), ensure_ascii=False)
+            if fmt == "json":
+                yield ("" if first else ",") + line
+            else:
+                yield line + "\n"
+            first = False
+        if fmt == "json":
+            yield "]"
+    finally:
+        db.close()
+
+
+def stream_questions(fmt: str = "ndjson") -> Iterator[str]:
+    return stream_rows(questions_query, _question_row, fmt)
+
+
+def stream_ai_answers(fmt: str = "ndjson", user_id: int = None, since: datetime = None) -> Iterator[str]:
+    return stream_rows(lambda db: ai_answers_query(db, user_id, since), _ai_answer_row, fmt)
+
+
+def stream_activities(fmt: str = "ndjson", user_id: int = None, since: datetime = None) -> Iterator[str]:
+    return stream_rows(lambda db: activities_query(db, user_id, since), _activity_row, fmt)
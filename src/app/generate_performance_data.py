@@ -103,7 +103,7 @@ def create_sample_questions():
 def generate_sample_quiz_sessions():
     """Génère des sessions de quiz avec des données réalistes"""
     db = SessionLocal()
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     
     try:
         print("🎯 Génération de sessions de quiz...")
@@ -185,12 +185,11 @@ def generate_sample_quiz_sessions():
         traceback.print_exc()
     finally:
         db.close()
-        performance_service.close()
 
 def generate_sample_ai_quiz_sessions():
     """Génère des sessions d'AI quiz avec des données réalistes"""
     db = SessionLocal()
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     
     try:
         print("🤖 Génération de sessions d'AI quiz...")
@@ -259,12 +258,11 @@ def generate_sample_ai_quiz_sessions():
         traceback.print_exc()
     finally:
         db.close()
-        performance_service.close()
 
 def generate_user_activities():
     """Génère des activités utilisateur diverses"""
     db = SessionLocal()
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     
     try:
         print("📱 Génération d'activités utilisateur...")
@@ -311,7 +309,7 @@ def generate_user_activities():
         import traceback
         traceback.print_exc()
     finally:
-        performance_service.close()
+        db.close()
 
 def main():
     """Fonction principale pour générer toutes les données de test"""
@@ -0,0 +1,312 @@
+"""
+Moteur de correction précompilé pour les réponses textuelles PLD
+
+Chaque question est compilée une seule fois en `GradingProfile` : texte attendu
+normalisé, ensemble de mots, regex unique pour les termes techniques et
+matcher difflib dont l'index de la réponse attendue est déjà construit.
+Une soumission ne coûte plus que la normalisation de la réponse utilisateur
+et un passage sur ce profil.
+
+Ce module ne dépend ni de la base ni de FastAPI : il est importé tel quel par
+les workers de `app.grading_executor`.
+"""
+import difflib
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from app.ai_feedback import ai_feedback_generator
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Au-delà de cette longueur (texte normalisé), la similarité est calculée sur
+# les mots plutôt que sur les caractères : difflib devient trop coûteux sur
+# les très longues réponses alors que le score y est déjà marginal.
+LONG_ANSWER_CHARS = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Normalise le texte pour la comparaison (minuscules, sans ponctuation)"""
+    text = _PUNCTUATION_RE.sub('', text.lower())
+    return _WHITESPACE_RE.sub(' ', text.strip())
+
+
+class GradingProfile:
+    """Données précompilées d'une question pour la correction"""
+
+    def __init__(self, expected_answer: str, technical_terms: Tuple[str, ...], max_score: int):
+        self.expected_norm = normalize_text(expected_answer)
+        self.expected_tokens = self.expected_norm.split()
+        self.expected_words = frozenset(self.expected_tokens)
+        self.technical_terms = list(technical_terms)
+        self.max_score = max_score
+
+        # Matchers réutilisables : la réponse attendue est en seq2, dont
+        # difflib met l'index en cache ; seule seq1 change à chaque appel
+        self._char_matcher = difflib.SequenceMatcher(None)
+        self._char_matcher.set_seq2(self.expected_norm)
+        self._word_matcher = difflib.SequenceMatcher(None)
+        self._word_matcher.set_seq2(self.expected_tokens)
+        self._lock = threading.Lock()
+
+        self._compile_terms()
+
+    def _compile_terms(self):
+        """Compile les termes techniques en une seule expression régulière"""
+        normalized = {}
+        self._always_found = []
+        for term in self.technical_terms:
+            term_norm = normalize_text(term)
+            if term_norm:
+                normalized.setdefault(term_norm, []).append(term)
+            else:
+                # Un terme vide après normalisation est toujours "trouvé"
+                self._always_found.append(term)
+
+        # Un lookahead à chaque position donne le terme le plus long qui y
+        # commence ; les termes qu'il contient sont déduits via `_contained`
+        alternatives = sorted(normalized, key=len, reverse=True)
+        self._terms_re = (
+            re.compile('(?=(' + '|'.join(re.escape(t) for t in alternatives) + '))')
+            if alternatives else None
+        )
+        self._contained = {
+            outer: [inner for inner in alternatives if inner in outer]
+            for outer in alternatives
+        }
+        self._terms_by_norm = normalized
+
+    def find_terms(self, user_norm: str) -> List[str]:
+        """Termes techniques présents dans la réponse normalisée (ordre d'origine)"""
+        found_norms = set()
+        if self._terms_re is not None:
+            for match in self._terms_re.finditer(user_norm):
+                matched = match.group(1)
+                if matched not in found_norms:
+                    found_norms.update(self._contained[matched])
+
+        found = set(self._always_found)
+        for term_norm in found_norms:
+            found.update(self._terms_by_norm[term_norm])
+        return [term for term in self.technical_terms if term in found]
+
+    def similarity(self, user_norm: str) -> float:
+        """Similarité pondérée (séquence 60 % + recouvrement des mots 40 %)"""
+        user_tokens = user_norm.split()
+
+        with self._lock:
+            if len(user_norm) > LONG_ANSWER_CHARS:
+                self._word_matcher.set_seq1(user_tokens)
+                ratio = self._word_matcher.ratio()
+            else:
+                self._char_matcher.set_seq1(user_norm)
+                ratio = self._char_matcher.ratio()
+
+        if self.expected_words:
+            word_overlap = len(self.expected_words.intersection(user_tokens)) / len(self.expected_words)
+        else:
+            word_overlap = 0
+
+        return ratio * 0.6 + word_overlap * 0.4
+
+
+@lru_cache(maxsize=4096)
+def _compile_profile(question_id: int, expected_answer: str, technical_terms: Tuple[str, ...], max_score: int) -> GradingProfile:
+    return GradingProfile(expected_answer, technical_terms, max_score)
+
+
+def get_grading_profile(question_data: Dict) -> GradingProfile:
+    """
+    Retourne le profil compilé d'une question (format du catalogue PLD).
+    Le contenu de la question fait partie de la clé : une question modifiée
+    par un admin est recompilée automatiquement.
+    """
+    return _compile_profile(
+        question_data.get('question_id'),
+        question_data['expected_answer'],
+        tuple(question_data['technical_terms']),
+        question_data['max_score']
+    )
+
+
+# ================================
+# CORRECTEUR AI QUIZ
+# ================================
+
+class AIQuizCorrector:
+    """Correcteur IA pour les réponses textuelles - Version API"""
+    
+    def __init__(self):
+        self.bonus_multiplier = 1.2
+        self.similarity_weight = 0.7
+        self.technical_weight = 0.3
+        
+    def normalize_text(self, text: str) -> str:
+        """Normalise le texte pour la comparaison"""
+        return normalize_text(text)
+    
+    def calculate_similarity(self, user_answer: str, expected_answer: str) -> float:
+        """Calcule la similarité entre deux textes"""
+        user_norm = self.normalize_text(user_answer)
+        expected_norm = self.normalize_text(expected_answer)
+        
+        similarity = difflib.SequenceMatcher(None, user_norm, expected_norm).ratio()
+        
+        user_words = set(user_norm.split())
+        expected_words = set(expected_norm.split())
+        word_overlap = len(user_words.intersection(expected_words)) / len(expected_words) if expected_words else 0
+        
+        return (similarity * 0.6 + word_overlap * 0.4)
+    
+    def find_technical_terms(self, user_answer: str, technical_terms: List[str]) -> List[str]:
+        """Trouve les termes techniques utilisés dans la réponse"""
+        user_norm = self.normalize_text(user_answer)
+        found_terms = []
+        
+        for term in technical_terms:
+            term_norm = self.normalize_text(term)
+            if term_norm in user_norm:
+                found_terms.append(term)
+        
+        return found_terms
+    
+    def correct_answer(self, question_data: Dict, user_answer: str) -> Dict:
+        """Corrige une réponse utilisateur et attribue un score"""
+        if not user_answer.strip():
+            return {
+                'score': 0,
+                'max_score': question_data['max_score'],
+                'percentage': 0,
+                'similarity': 0,
+                'technical_terms_found': [],
+                'technical_bonus': 0,
+                'feedback': "Aucune réponse fournie.",
+                'detailed_explanation': question_data['explanation']
+            }
+        
+        # Profil précompilé de la question (réponse attendue, termes, matcher)
+        profile = get_grading_profile(question_data)
+        user_norm = normalize_text(user_answer)
+        
+        similarity = profile.similarity(user_norm)
+        
+        technical_terms_found = profile.find_terms(user_norm)
+        technical_ratio = len(technical_terms_found) / len(question_data['technical_terms']) if question_data['technical_terms'] else 0
+        
+        base_score = (similarity * self.similarity_weight + technical_ratio * self.technical_weight) * question_data['max_score']
+        
+        technical_bonus = len(technical_terms_found) * 5
+        
+        final_score = min(base_score + technical_bonus, question_data['max_score'])
+        
+        feedback = self.generate_feedback(similarity, technical_terms_found, question_data['technical_terms'], final_score, question_data['max_score'])
+        
+        return {
+            'score': round(final_score, 1),
+            'max_score': question_data['max_score'],
+            'percentage': round((final_score / question_data['max_score']) * 100, 1),
+            'similarity': round(similarity * 100, 1),
+            'technical_terms_found': technical_terms_found,
+            'technical_bonus': technical_bonus,
+            'feedback': feedback,
+            'detailed_explanation': question_data['explanation']
+        }
+    
+    def generate_feedback(self, similarity: float, found_terms: List[str], all_terms: List[str], score: float, max_score: float) -> str:
+        """Génère un feedback personnalisé"""
+        percentage = (score / max_score) * 100
+        
+        if percentage >= 90:
+            feedback = "🏆 Excellente réponse ! "
+        elif percentage >= 75:
+            feedback = "👍 Très bonne réponse ! "
+        elif percentage >= 60:
+            feedback = "📚 Bonne réponse, mais peut être améliorée. "
+        elif percentage >= 40:
+            feedback = "💪 Réponse partiellement correcte. "
+        else:
+            feedback = "📖 La réponse nécessite des améliorations importantes. "
+        
+        if found_terms:
+            feedback += f"Termes techniques utilisés correctement : {', '.join(found_terms)}. "
+        
+        missed_terms = [term for term in all_terms if term not in found_terms]
+        if missed_terms:
+            feedback += f"Termes techniques manqués : {', '.join(missed_terms)}. "
+        
+        feedback += f"Similarité avec la réponse attendue : {similarity * 100:.1f}%."
+        
+        return feedback
+
+
+# Instance du correcteur IA
+ai_corrector = AIQuizCorrector()
+
+
+# ================================
+# CORRECTION PLD
+# ================================
+
+def calculate_answer_score(user_answer: str, question: Dict) -> float:
+    """
+    Calculer le score d'une réponse utilisateur
+    (Logique simplifiée - peut être améliorée)
+    
+    `question` est une entrée du catalogue PLD (termes techniques déjà parsés).
+    """
+    max_score = question["max_score"]
+    if not user_answer or not question["expected_answer"]:
+        return 0.0
+    
+    user_answer_lower = user_answer.lower().strip()
+    expected_answer_lower = question["expected_answer"].lower().strip()
+    
+    # Score basé sur la longueur relative et la présence de mots-clés
+    base_score = max_score * 0.3  # Score de base pour avoir essayé
+    
+    # Bonus pour la longueur (encourager les réponses détaillées)
+    if len(user_answer) >= 50:
+        base_score += max_score * 0.2
+    
+    # Bonus pour les termes techniques
+    technical_terms = question["technical_terms"]
+    terms_found = sum(1 for term in technical_terms if term.lower() in user_answer_lower)
+    if terms_found > 0:
+        base_score += (terms_found / len(technical_terms)) * max_score * 0.3
+    
+    # Bonus pour similarité avec la réponse attendue
+    common_words = set(user_answer_lower.split()) & set(expected_answer_lower.split())
+    if common_words:
+        base_score += len(common_words) / len(expected_answer_lower.split()) * max_score * 0.2
+    
+    return min(base_score, max_score)
+
+
+def grade_pld_answer(user_answer: str, question: Dict) -> Dict:
+    """Corrige une réponse et génère le feedback IA (format de réponse de l'API)"""
+    max_score = question["max_score"] or 100
+    
+    # Calculer le score (logique simplifiée pour l'instant)
+    score = calculate_answer_score(user_answer, question)
+    
+    # Générer un feedback intelligent avec l'IA
+    ai_feedback = ai_feedback_generator.generate_intelligent_feedback(
+        user_answer=user_answer,
+        question_text=question["question_text"],
+        expected_answer=question["expected_answer"],
+        technical_terms=question["technical_terms"],
+        score=score,
+        max_score=max_score
+    )
+    
+    return {
+        "score": score,
+        "max_score": max_score,
+        "percentage": (score / max_score) * 100 if max_score > 0 else 0,
+        # Feedback formaté pour l'affichage
+        "feedback": ai_feedback_generator.format_feedback_for_display(ai_feedback),
+        "ai_feedback": ai_feedback,  # Feedback structuré pour le frontend
+        "expected_answer": question["expected_answer"]  # On peut garder la réponse attendue pour référence
+    }
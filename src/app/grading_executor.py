@@ -0,0 +1,222 @@
+"""
+Exécuteur de correction : pool de processus pour la correction des réponses
+
+La correction (difflib, génération du feedback) est du calcul pur. Exécutée
+directement dans un handler `async def`, elle bloque la boucle d'événements
+de tout le worker. Les handlers envoient ici des données de question
+sérialisables (dicts du catalogue PLD) et attendent le résultat.
+
+Les processus ne sont pas des forks du worker web (qui copieraient ses
+threads et les verrous tenus à cet instant) : ils sont forkés par un serveur
+"forkserver" mono-thread qui a préchargé app.grading. Ils sont tous lancés
+à la création du pool, le script principal masqué : src/main.py
+(create_all, construction de l'application) n'est pas réimporté dans chaque
+processus, ce que multiprocessing ferait sinon. Le pool est créé au
+démarrage de l'application (`start`), pas à la première correction. Un pool cassé (processus tué, par exemple par manque
+de mémoire) est abandonné et recréé ; la correction en cours est relancée
+une fois sur le nouveau pool.
+
+Configuration (variables d'environnement) :
+- GRADING_WORKERS : nombre de processus (0 = threads de la boucle, pour le dev)
+- GRADING_METRICS_WINDOW : nombre de latences conservées pour les percentiles
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+
+from app import grading
+
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", str(min(4, os.cpu_count() or 1))))
+GRADING_METRICS_WINDOW = int(os.getenv("GRADING_METRICS_WINDOW", "1000"))
+
+# Modules chargés une fois par le forkserver, hérités par chaque processus
+_PRELOAD_MODULES = ["app.grading"]
+
+
+def grading_payload(question: Dict) -> Dict:
+    """Sous-ensemble sérialisable d'une question nécessaire à la correction"""
+    return {
+        "question_id": question["question_id"],
+        "question_text": question["question_text"],
+        "expected_answer": question["expected_answer"],
+        "technical_terms": list(question["technical_terms"]),
+        "explanation": question["explanation"],
+        "max_score": question["max_score"]
+    }
+
+
+# Fonctions exécutées dans les workers (doivent rester au niveau module)
+def _run_ai_correction(question_data: Dict, user_answer: str) -> Dict:
+    return grading.ai_corrector.correct_answer(question_data, user_answer)
+
+
+def _run_pld_correction(question_data: Dict, user_answer: str) -> Dict:
+    return grading.grade_pld_answer(user_answer, question_data)
+
+
+class GradingExecutor:
+    """Pool de correction partagé, créé au premier usage"""
+
+    def __init__(self, max_workers: int = GRADING_WORKERS, metrics_window: int = GRADING_METRICS_WINDOW):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._warm_up_futures: List = []
+
+        # Métriques
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._restarts = 0
+        self._wait_times = deque(maxlen=metrics_window)
+        self._latencies = deque(maxlen=metrics_window)
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 0:
+            return None  # Exécuteur par défaut de la boucle (threads)
+        pool = self._pool
+        if pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool, self._warm_up_futures = _create_pool(self.max_workers)
+                pool = self._pool
+        return pool
+
+    async def start(self):
+        """Crée le pool et attend que ses processus soient prêts (démarrage de l'application)"""
+        if self._get_pool() is not None:
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in self._warm_up_futures))
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Abandonne un pool cassé ; le suivant est créé au prochain usage"""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return  # Déjà remplacé par une autre correction
+            self._pool = None
+            self._restarts += 1
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, func: Callable, question: Dict, user_answer: str):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return await loop.run_in_executor(pool, _timed_call, func, grading_payload(question), user_answer)
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                if attempt:
+                    raise
+
+    async def _submit(self, func: Callable, question: Dict, user_answer: str) -> Dict:
+        submitted_at = time.time()
+
+        self._pending += 1
+        self._submitted += 1
+        try:
+            started_at, result = await self._run(func, question, user_answer)
+            # Temps passé dans la file avant qu'un worker ne prenne la tâche
+            self._wait_times.append(max(0.0, started_at - submitted_at))
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+            self._latencies.append(time.time() - submitted_at)
+
+    async def grade_ai_answer(self, question: Dict, user_answer: str) -> Dict:
+        """Correction AIQuizCorrector (endpoints /submit-answer et /ai-submit du quiz IA)"""
+        return await self._submit(_run_ai_correction, question, user_answer)
+
+    async def grade_pld_answer(self, question: Dict, user_answer: str) -> Dict:
+        """Correction PLD (score + feedback IA)"""
+        return await self._submit(_run_pld_correction, question, user_answer)
+
+    async def grade_pld_answers(self, items: List[tuple]) -> List[Dict]:
+        """Corrige un lot de (question, réponse) en parallèle sur le pool"""
+        return list(await asyncio.gather(
+            *(self.grade_pld_answer(question, user_answer) for question, user_answer in items)
+        ))
+
+    def metrics(self) -> Dict:
+        """Profondeur de file et latences (ms) sur la fenêtre glissante"""
+        return {
+            "workers": self.max_workers,
+            "mode": "process" if self.max_workers > 0 else "thread",
+            "queue_depth": max(0, self._pending - max(self.max_workers, 1)),
+            "in_flight": self._pending,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "restarts": self._restarts,
+            "wait_ms": _percentiles(self._wait_times),
+            "latency_ms": _percentiles(self._latencies)
+        }
+
+    def shutdown(self):
+        """Arrête les workers (appelé à l'arrêt de l'application)"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+@contextmanager
+def _without_main_script():
+    """Lancement de processus sans le script principal (non réimporté par les fils)"""
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+def _create_pool(max_workers: int):
+    """
+    Pool forkserver dont tous les processus sont lancés tout de suite (une
+    tâche par processus, soumises ensemble) : aucun n'est lancé plus tard,
+    hors de `_without_main_script`. Renvoie le pool et ces tâches.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(_PRELOAD_MODULES)
+    pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+    with _without_main_script():
+        warm_up = [pool.submit(_warm_up) for _ in range(max_workers)]
+    return pool, warm_up
+
+
+def _timed_call(func: Callable, question_data: Dict, user_answer: str):
+    """Exécute `func` dans le worker et renvoie l'heure de début avec le résultat"""
+    return time.time(), func(question_data, user_answer)
+
+
+def _percentiles(samples) -> Dict:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return round(ordered[index] * 1000, 2)
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+
+# Instance globale de l'exécuteur
+grading_executor = GradingExecutor()
@@ -0,0 +1,290 @@
+"""
+Classements des utilisateurs (quiz, quiz IA, combiné) par période
+
+Chaque classement est une liste triée en mémoire de clés (-score, user_id) :
+rang d'un utilisateur par recherche dichotomique (O(log n)), page par
+découpage. Les classements sont construits depuis la base (agrégats
+utilisateur pour `all`, sessions de la période pour `week` / `month`), mis à
+jour après chaque commit qui termine une session, et reconstruits
+périodiquement pour intégrer les écritures des autres workers et faire
+sortir des périodes les sessions trop anciennes.
+
+Configuration (variables d'environnement) :
+- LEADERBOARD_TTL : durée de vie des classements en secondes
+- LEADERBOARD_MIN_SESSIONS : sessions minimum pour être classé
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app.models import User, QuizSession, AIQuizSession, UserPerformanceStats
+
+LEADERBOARD_TTL = int(os.getenv("LEADERBOARD_TTL", "60"))
+LEADERBOARD_MIN_SESSIONS = int(os.getenv("LEADERBOARD_MIN_SESSIONS", "3"))
+
+MODES = ("quiz", "ai_quiz", "all")
+WINDOWS = {"week": 7, "month": 30, "all": None}
+
+
+class UserScores:
+    """Sommes et nombres de sessions d'un utilisateur sur une période"""
+
+    __slots__ = ("quiz_total", "quiz_sessions", "ai_total", "ai_sessions")
+
+    def __init__(self, quiz_total=0.0, quiz_sessions=0, ai_total=0.0, ai_sessions=0):
+        self.quiz_total = float(quiz_total or 0)
+        self.quiz_sessions = quiz_sessions or 0
+        self.ai_total = float(ai_total or 0)
+        self.ai_sessions = ai_sessions or 0
+
+    @property
+    def quiz_score(self) -> float:
+        return self.quiz_total / self.quiz_sessions if self.quiz_sessions else 0.0
+
+    @property
+    def ai_score(self) -> float:
+        return self.ai_total / self.ai_sessions if self.ai_sessions else 0.0
+
+    def score(self, mode: str) -> Optional[float]:
+        """Score de classement, None si l'utilisateur n'est pas classé"""
+        if mode == "quiz":
+            return self.quiz_score if self.quiz_sessions >= LEADERBOARD_MIN_SESSIONS else None
+        if mode == "ai_quiz":
+            return self.ai_score if self.ai_sessions >= LEADERBOARD_MIN_SESSIONS else None
+        if self.quiz_sessions + self.ai_sessions >= LEADERBOARD_MIN_SESSIONS:
+            return self.quiz_score + self.ai_score
+        return None
+
+
+class RankedBoard:
+    """Liste triée (-score, user_id) avec index par utilisateur"""
+
+    def __init__(self):
+        self._keys: List[Tuple[float, int]] = []
+        self._key_by_user: Dict[int, Tuple[float, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def set(self, user_id: int, score: Optional[float]):
+        old = self._key_by_user.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, old)]
+        if score is not None:
+            key = (-score, user_id)
+            insort(self._keys, key)
+            self._key_by_user[user_id] = key
+
+    def rank(self, user_id: int) -> Optional[int]:
+        key = self._key_by_user.get(user_id)
+        if key is None:
+            return None
+        return bisect_left(self._keys, key) + 1
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, int]]:
+        """(rang, user_id) des entrées [offset, offset + limit["""
+        return [
+            (offset + index + 1, user_id)
+            for index, (_, user_id) in enumerate(self._keys[offset:offset + limit])
+        ]
+
+
+class LeaderboardEngine:
+    """Classements par (mode, période), reconstruits après LEADERBOARD_TTL"""
+
+    def __init__(self, ttl_seconds: int = LEADERBOARD_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._scores: Dict[str, Dict[int, UserScores]] = {}
+        self._boards: Dict[Tuple[str, str], RankedBoard] = {}
+        self._usernames: Dict[int, str] = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _is_fresh(self) -> bool:
+        if self._built_at is None:
+            return False
+        return self.ttl_seconds <= 0 or time.monotonic() - self._built_at <= self.ttl_seconds
+
+    def _ensure_built(self, db: Session):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            self._build(db)
+
+    def _build(self, db: Session):
+        """Charge les scores de chaque période (5 requêtes agrégées)"""
+        scores: Dict[str, Dict[int, UserScores]] = {"all": {}}
+        usernames: Dict[int, str] = {}
+
+        rows = db.query(
+            UserPerformanceStats.user_id, User.username,
+            UserPerformanceStats.quiz_total_score, UserPerformanceStats.quiz_sessions_completed,
+            UserPerformanceStats.ai_quiz_total_score, UserPerformanceStats.ai_quiz_sessions_completed
+        ).join(User, User.id == UserPerformanceStats.user_id).all()
+        for user_id, username, quiz_total, quiz_sessions, ai_total, ai_sessions in rows:
+            usernames[user_id] = username
+            scores["all"][user_id] = UserScores(quiz_total, quiz_sessions, ai_total, ai_sessions)
+
+        now = datetime.utcnow()
+        for window, days in WINDOWS.items():
+            if days is None:
+                continue
+            start = now - timedelta(days=days)
+            window_scores: Dict[int, UserScores] = {}
+            quiz_rows = db.query(
+                QuizSession.user_id, func.sum(QuizSession.score), func.count(QuizSession.id)
+            ).filter(
+                QuizSession.completed == True,
+                QuizSession.completed_at >= start
+            ).group_by(QuizSession.user_id).all()
+            for user_id, total, count in quiz_rows:
+                window_scores[user_id] = UserScores(quiz_total=total, quiz_sessions=count)
+
+            ai_rows = db.query(
+                AIQuizSession.user_id, func.sum(AIQuizSession.total_score), func.count(AIQuizSession.id)
+            ).filter(
+                AIQuizSession.completed == True,
+                AIQuizSession.completed_at >= start
+            ).group_by(AIQuizSession.user_id).all()
+            for user_id, total, count in ai_rows:
+                entry = window_scores.setdefault(user_id, UserScores())
+                entry.ai_total, entry.ai_sessions = float(total or 0), count
+            scores[window] = window_scores
+
+        boards = {}
+        for window, window_scores in scores.items():
+            for mode in MODES:
+                board = RankedBoard()
+                for user_id, entry in window_scores.items():
+                    board.set(user_id, entry.score(mode))
+                boards[(mode, window)] = board
+
+        self._scores = scores
+        self._boards = boards
+        self._usernames = usernames
+        self._built_at = time.monotonic()
+
+    def record(self, user_id: int, quiz_score: float = None, ai_score: float = None):
+        """Ajoute une session terminée (appelé après le commit)"""
+        with self._lock:
+            if self._built_at is None:
+                return  # Sera prise en compte à la prochaine construction
+            for window, window_scores in self._scores.items():
+                entry = window_scores.setdefault(user_id, UserScores())
+                if quiz_score is not None:
+                    entry.quiz_total += quiz_score
+                    entry.quiz_sessions += 1
+                if ai_score is not None:
+                    entry.ai_total += ai_score
+                    entry.ai_sessions += 1
+                for mode in MODES:
+                    self._boards[(mode, window)].set(user_id, entry.score(mode))
+
+    def clear_quiz(self, user_id: int):
+        """Retire les sessions de quiz d'un utilisateur (progression réinitialisée)"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            for window, window_scores in self._scores.items():
+                entry = window_scores.get(user_id)
+                if entry is None:
+                    continue
+                entry.quiz_total, entry.quiz_sessions = 0.0, 0
+                for mode in MODES:
+                    self._boards[(mode, window)].set(user_id, entry.score(mode))
+
+    def _entry(self, mode: str, window: str, rank: int, user_id: int) -> Dict:
+        scores = self._scores[window][user_id]
+        entry = {"rank": rank, "user_id": user_id, "username": self._usernames.get(user_id)}
+        if mode == "quiz":
+            entry.update(avg_score=scores.quiz_score, sessions=scores.quiz_sessions)
+        elif mode == "ai_quiz":
+            entry.update(avg_score=scores.ai_score, sessions=scores.ai_sessions)
+        else:
+            entry.update(
+                quiz_score=scores.quiz_score,
+                quiz_sessions=scores.quiz_sessions,
+                ai_score=scores.ai_score,
+                ai_sessions=scores.ai_sessions,
+                total_score=scores.quiz_score + scores.ai_score,
+                total_sessions=scores.quiz_sessions + scores.ai_sessions
+            )
+        return entry
+
+    def _resolve_usernames(self, db: Session, user_ids: List[int]):
+        missing = [user_id for user_id in user_ids if user_id not in self._usernames]
+        if missing:
+            for user_id, username in db.query(User.id, User.username).filter(User.id.in_(missing)).all():
+                self._usernames[user_id] = username
+
+    def page(self, db: Session, mode: str, window: str, offset: int, limit: int) -> Dict:
+        """Page du classement et nombre total d'utilisateurs classés"""
+        self._ensure_built(db)
+        with self._lock:
+            board = self._boards[(mode, window)]
+            ranked = board.page(offset, limit)
+            self._resolve_usernames(db, [user_id for _, user_id in ranked])
+            return {
+                "total": len(board),
+                "entries": [self._entry(mode, window, rank, user_id) for rank, user_id in ranked]
+            }
+
+    def my_rank(self, db: Session, mode: str, window: str, user_id: int) -> Dict:
+        """Rang d'un utilisateur (None s'il n'est pas classé)"""
+        self._ensure_built(db)
+        with self._lock:
+            board = self._boards[(mode, window)]
+            rank = board.rank(user_id)
+            entry = None
+            if rank is not None:
+                self._resolve_usernames(db, [user_id])
+                entry = self._entry(mode, window, rank, user_id)
+            return {"rank": rank, "total": len(board), "entry": entry}
+
+
+# Instance globale des classements
+leaderboard_engine = LeaderboardEngine()
+
+
+# ================================
+# MISE À JOUR APRÈS COMMIT
+# ================================
+# Les fins de session s'enregistrent dans `session.info` ; le classement en
+# mémoire n'est modifié qu'une fois la transaction validée.
+
+_PENDING_KEY = "leaderboard_pending"
+_RESET_KEY = "leaderboard_quiz_reset"
+
+
+def queue_completion(db: Session, user_id: int, quiz_score: float = None, ai_score: float = None):
+    db.info.setdefault(_PENDING_KEY, []).append((user_id, quiz_score, ai_score))
+
+
+def queue_quiz_reset(db: Session, user_id: int):
+    db.info.setdefault(_RESET_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for user_id in session.info.pop(_RESET_KEY, ()):
+        leaderboard_engine.clear_quiz(user_id)
+    for user_id, quiz_score, ai_score in session.info.pop(_PENDING_KEY, []):
+        leaderboard_engine.record(user_id, quiz_score=quiz_score, ai_score=ai_score)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_RESET_KEY, None)
@@ -9,9 +9,19 @@ import os
 # Ajouter le répertoire src au PATH
 sys.path.insert(0, '/app/src')
 
+from alembic import command
+from alembic.config import Config
 from sqlalchemy import text
 from app.database import SessionLocal, engine
 from app.models import Base
+from app.performance_rollups import rebuild_user_rollups
+from app.system_rollups import run_rollup
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'alembic.ini')
+
+def upgrade_schema():
+    """Applique les révisions Alembic en attente"""
+    command.upgrade(Config(ALEMBIC_INI), "head")
 
 def create_performance_tables():
     """Crée les tables pour les statistiques de performance"""
@@ -39,6 +49,17 @@ def create_performance_tables():
             except Exception as e:
                 print(f"⚠️  Table {table}: {e}")
         
+        # Colonnes et index ajoutés depuis (révisions Alembic idempotentes)
+        upgrade_schema()
+        print("✅ Schéma à jour (alembic upgrade head)")
+        
+        # Backfill des agrégats depuis l'historique des sessions
+        rebuilt = rebuild_user_rollups(db)
+        print(f"✅ Agrégats utilisateur recalculés: {rebuilt} utilisateurs")
+        
+        # Agrégats quotidiens du système (journées passées + journée en cours)
+        print(f"✅ Agrégats quotidiens: {run_rollup(db)}")
+        
         print("\n🎯 Migration terminée avec succès!")
         
     except Exception as e:
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Text, ForeignKey, Float, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
@@ -38,6 +41,15 @@ class Question(Base):
 
 class QuizSession(Base):
     __tablename__ = "quiz_sessions"
+    __table_args__ = (
+        Index("ix_quiz_sessions_user_completed", "user_id", "completed"),
+        Index("ix_quiz_sessions_started_at", "started_at"),
+        # Index partiels : sessions actives / plages de sessions terminées
+        Index("ix_quiz_sessions_active_user", "user_id",
+              postgresql_where=text("completed = false"), sqlite_where=text("completed = 0")),
+        Index("ix_quiz_sessions_completed_at", "completed_at",
+              postgresql_where=text("completed = true"), sqlite_where=text("completed = 1")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -53,6 +65,10 @@ class QuizSession(Base):
 
 class QuizAnswer(Base):
     __tablename__ = "quiz_answers"
+    __table_args__ = (
+        Index("ix_quiz_answers_session_question", "session_id", "question_id"),
+        Index("ix_quiz_answers_answered_at", "answered_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("quiz_sessions.id"), nullable=False)
@@ -67,6 +83,14 @@ class QuizAnswer(Base):
 
 class AIQuizSession(Base):
     __tablename__ = "ai_quiz_sessions"
+    __table_args__ = (
+        Index("ix_ai_quiz_sessions_user_completed", "user_id", "completed"),
+        Index("ix_ai_quiz_sessions_started_at", "started_at"),
+        Index("ix_ai_quiz_sessions_active_user", "user_id",
+              postgresql_where=text("completed = false"), sqlite_where=text("completed = 0")),
+        Index("ix_ai_quiz_sessions_completed_at", "completed_at",
+              postgresql_where=text("completed = true"), sqlite_where=text("completed = 1")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -82,6 +106,10 @@ class AIQuizSession(Base):
 
 class AIQuizAnswer(Base):
     __tablename__ = "ai_quiz_answers"
+    __table_args__ = (
+        Index("ix_ai_quiz_answers_session_question", "session_id", "question_id"),
+        Index("ix_ai_quiz_answers_answered_at", "answered_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("ai_quiz_sessions.id"), nullable=False)
@@ -105,7 +133,7 @@ class UserPerformanceStats(Base):
     __tablename__ = "user_performance_stats"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True, index=True)
     date = Column(DateTime(timezone=True), server_default=func.now())
     
     # Statistiques Quiz classique
@@ -126,7 +154,9 @@ class UserPerformanceStats(Base):
     
     # Statistiques globales
     total_login_count = Column(Integer, default=0)
-    streak_days = Column(Integer, default=0)
+    streak_days = Column(Integer, default=0)  # Série en cours (jours consécutifs)
+    streak_last_day = Column(Date)  # Dernier jour (UTC) compté dans la série
+    best_streak_days = Column(Integer, default=0)
     last_activity = Column(DateTime(timezone=True))
     
     # Progression
@@ -141,7 +171,7 @@ class DailySystemStats(Base):
     __tablename__ = "daily_system_stats"
     
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime(timezone=True), server_default=func.now())
+    date = Column(DateTime(timezone=True), server_default=func.now(), unique=True, index=True)  # Minuit du jour agrégé
     
     # Utilisateurs
     total_users = Column(Integer, default=0)
@@ -160,9 +190,22 @@ class DailySystemStats(Base):
     # Engagement
     average_session_duration = Column(Float, default=0.0)
     total_time_spent_minutes = Column(Integer, default=0)
+    
+    # Sommes pour recombiner les moyennes sur plusieurs jours
+    quiz_sessions_completed = Column(Integer, default=0)
+    ai_quiz_sessions_completed = Column(Integer, default=0)
+    quiz_score_total = Column(Float, default=0.0)
+    ai_quiz_score_total = Column(Float, default=0.0)
+    
+    # Journée terminée : les chiffres ne sont plus recalculés
+    closed = Column(Boolean, default=False)
 
 class UserActivity(Base):
     __tablename__ = "user_activities"
+    __table_args__ = (
+        Index("ix_user_activities_user_timestamp", "user_id", "timestamp"),
+        Index("ix_user_activities_timestamp", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -188,6 +231,9 @@ class PLDCategory(Base):
 
 class PLDTheme(Base):
     __tablename__ = "pld_themes"
+    __table_args__ = (
+        Index("ix_pld_themes_category_id", "category_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)  # 'permission', 'io', etc.
@@ -203,6 +249,9 @@ class PLDTheme(Base):
 
 class PLDQuestion(Base):
     __tablename__ = "pld_questions"
+    __table_args__ = (
+        Index("ix_pld_questions_theme_id", "theme_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     question_text = Column(Text, nullable=False)
@@ -0,0 +1,231 @@
+"""
+Partitionnement mensuel des tables d'historique (PostgreSQL)
+
+user_activities, quiz_answers et ai_quiz_answers sont partitionnées par mois
+sur leur horodatage (révision Alembic 0003) : les requêtes filtrées par
+période (streak, utilisateurs actifs du jour, agrégats quotidiens) ne lisent
+que les partitions concernées. Une partition par défaut reçoit les lignes
+hors des mois créés pour qu'une insertion n'échoue jamais.
+
+Maintenance :
+- création des partitions des PARTITION_MONTHS_AHEAD prochains mois (tâche de
+  fond quotidienne, et à chaque exécution de la commande) ;
+- archivage : les partitions plus anciennes que PARTITION_RETENTION_MONTHS
+  sont exportées en CSV compressé (gzip) dans PARTITION_ARCHIVE_DIR, puis
+  détachées et supprimées.
+
+Exécution manuelle (cron) : python -m app.partitions [--archive]
+Sans effet sur les autres bases (SQLite en développement).
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database import engine
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "12"))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", "archives")
+PARTITION_MAINTENANCE_INTERVAL = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "86400"))
+
+# Table partitionnée -> colonne de partitionnement
+PARTITIONED_TABLES = {
+    "user_activities": "timestamp",
+    "quiz_answers": "answered_at",
+    "ai_quiz_answers": "answered_at",
+}
+
+
+def month_start(moment: date) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = :table AND pg_table_is_visible(c.oid)
+    """), {"table": table}).scalar())
+
+
+def list_partitions(conn: Connection, table: str) -> Dict[date, str]:
+    """Partitions mensuelles existantes (mois -> nom)"""
+    names = conn.execute(text("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table AND pg_table_is_visible(parent.oid)
+    """), {"table": table}).scalars().all()
+    pattern = re.compile(rf"^{re.escape(table)}_(\d{{4}})_(\d{{2}})$")
+    months = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def create_partition(conn: Connection, table: str, month: date) -> str:
+    """
+    Crée la partition d'un mois. Les lignes de ce mois déjà tombées dans la
+    partition par défaut y sont déplacées avant le rattachement.
+    """
+    column = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+
+    conn.execute(text(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {default_partition_name(table)}
+            WHERE "{column}" >= :start AND "{column}" < :end
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    conn.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+    return name
+
+
+def ensure_partitions(conn: Connection, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD,
+                      first_month: date = None) -> List[str]:
+    """Crée les partitions manquantes de `first_month` (ou ce mois) à + months_ahead"""
+    existing = list_partitions(conn, table)
+    current = month_start(datetime.utcnow().date())
+    month = month_start(first_month) if first_month else current
+    last = add_months(current, months_ahead)
+
+    created = []
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(conn, table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def archive_partitions(conn: Connection, table: str, retention_months: int = PARTITION_RETENTION_MONTHS,
+                       archive_dir: str = PARTITION_ARCHIVE_DIR) -> List[str]:
+    """
+    Exporte en CSV gzip puis détache et supprime les partitions antérieures
+    à la période de rétention. L'export est écrit avant toute suppression.
+    """
+    cutoff = add_months(month_start(datetime.utcnow().date()), -retention_months)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    archived = []
+    for month, name in sorted(list_partitions(conn, table).items()):
+        if month >= cutoff:
+            break
+        path = os.path.join(archive_dir, f"{name}.csv.gz")
+        result = conn.execute(text(f"SELECT * FROM {name}").execution_options(stream_results=True))
+        with gzip.open(path, "wt", newline="") as archive:
+            writer = csv.writer(archive)
+            writer.writerow(result.keys())
+            for rows in result.partitions(1000):
+                writer.writerows(rows)
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        conn.commit()
+        archived.append(path)
+    return archived
+
+
+def run_maintenance(months_ahead: int = PARTITION_MONTHS_AHEAD, archive: bool = False,
+                    retention_months: int = PARTITION_RETENTION_MONTHS,
+                    archive_dir: str = PARTITION_ARCHIVE_DIR) -> Dict:
+    """Partitions futures de chaque table, puis archivage si demandé"""
+    if engine.dialect.name != "postgresql":
+        return {"skipped": f"partitionnement non supporté ({engine.dialect.name})"}
+
+    report = {}
+    with engine.connect() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                report[table] = {"skipped": "table non partitionnée (alembic upgrade head)"}
+                continue
+            created = ensure_partitions(conn, table, months_ahead)
+            conn.commit()
+            archived = archive_partitions(conn, table, retention_months, archive_dir) if archive else []
+            report[table] = {"created": created, "archived": archived}
+    return report
+
+
+# ================================
+# TÂCHE DE FOND
+# ================================
+
+class PartitionMaintenanceScheduler:
+    """Crée les partitions à venir une fois par PARTITION_MAINTENANCE_INTERVAL"""
+
+    def __init__(self, interval_seconds: int = PARTITION_MAINTENANCE_INTERVAL):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval_seconds <= 0 or engine.dialect.name != "postgresql" or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, run_maintenance)
+            except Exception as e:
+                print(f"Erreur maintenance des partitions: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Instance globale de la tâche de fond
+partition_scheduler = PartitionMaintenanceScheduler()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance des partitions mensuelles")
+    parser.add_argument("--ahead", type=int, default=PARTITION_MONTHS_AHEAD,
+                        help="Mois à venir pour lesquels créer une partition")
+    parser.add_argument("--archive", action="store_true",
+                        help="Exporter puis supprimer les partitions hors rétention")
+    parser.add_argument("--retention-months", type=int, default=PARTITION_RETENTION_MONTHS)
+    parser.add_argument("--archive-dir", default=PARTITION_ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    report = run_maintenance(args.ahead, args.archive, args.retention_months, args.archive_dir)
+    if "skipped" in report:
+        print(f"⚠️  {report['skipped']}")
+    for table, result in report.items():
+        if table != "skipped":
+            print(f"✅ {table}: {result}")
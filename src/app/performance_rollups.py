@@ -0,0 +1,273 @@
+"""
+Agrégats de performance par utilisateur (table user_performance_stats)
+
+Une ligne par utilisateur, mise à jour à chaque fin de session de quiz ou de
+quiz IA/PLD dans la même transaction que la session. Les endpoints de
+statistiques lisent cette ligne au lieu d'agréger tout l'historique.
+
+Les lignes absentes des utilisateurs ayant un historique (antérieurs au
+rollup) sont créées une fois au démarrage (`backfill_missing_rollups`) ;
+les lectures n'écrivent jamais. Un utilisateur sans ligne n'a donc en
+principe aucun historique : sa ligne, calculée à la lecture, est vide et
+sera enregistrée à sa première écriture (fin de session, jour d'activité).
+
+La série de jours d'activité (activité enregistrée ou session terminée, jours
+UTC) est tenue dans la même ligne : longueur en cours, dernier jour, meilleure
+série. Chaque nouveau jour la met à jour en O(1), sans limite de durée.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import QuizSession, AIQuizSession, UserPerformanceStats, UserActivity
+from app.leaderboard import queue_completion, queue_quiz_reset
+from app.profile_stats import queue_invalidation
+from app.response_cache import queue_invalidation as queue_response_invalidation
+
+
+def session_minutes(session) -> int:
+    """Durée d'une session en minutes (0 si les horodatages manquent)"""
+    if not session.started_at or not session.completed_at:
+        return 0
+    started, completed = session.started_at, session.completed_at
+    # started_at vient du serveur (avec fuseau), completed_at de utcnow() (naïf)
+    if started.tzinfo is not None and completed.tzinfo is None:
+        completed = completed.replace(tzinfo=timezone.utc)
+    elif started.tzinfo is None and completed.tzinfo is not None:
+        started = started.replace(tzinfo=timezone.utc)
+    return max(0, int((completed - started).total_seconds() // 60))
+
+
+def _as_date(value) -> date:
+    """DATE(...) renvoie une chaîne sous SQLite, une date sous PostgreSQL"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _streak_from_days(days: Iterable[date]) -> Tuple[int, Optional[date], int]:
+    """(série en cours, dernier jour, meilleure série) d'une liste de jours"""
+    current, last, best = 0, None, 0
+    for day in sorted(set(days)):
+        current = current + 1 if last is not None and day == last + timedelta(days=1) else 1
+        best = max(best, current)
+        last = day
+    return current, last, best
+
+
+def advance_streak(rollup: UserPerformanceStats, day: date):
+    """Ajoute un jour d'activité à la série ; un jour déjà compté (ou antérieur) est ignoré"""
+    last = rollup.streak_last_day
+    if last is not None and day <= last:
+        return
+    if last is not None and day == last + timedelta(days=1):
+        rollup.streak_days = (rollup.streak_days or 0) + 1
+    else:
+        rollup.streak_days = 1
+    rollup.streak_last_day = day
+    rollup.best_streak_days = max(rollup.best_streak_days or 0, rollup.streak_days)
+
+
+def current_streak(rollup: UserPerformanceStats, today: date = None) -> int:
+    """Série en cours : encore valable si le dernier jour actif est aujourd'hui ou hier"""
+    today = today or datetime.utcnow().date()
+    if rollup.streak_last_day is None or rollup.streak_last_day < today - timedelta(days=1):
+        return 0
+    return rollup.streak_days or 0
+
+
+def _build_rollup(db: Session, user_id: int, exclude_quiz_id: int = None,
+                  exclude_ai_id: int = None) -> UserPerformanceStats:
+    """Calcule la ligne d'un utilisateur depuis l'historique des sessions terminées"""
+    quiz_filters = [QuizSession.user_id == user_id, QuizSession.completed == True]
+    if exclude_quiz_id is not None:
+        quiz_filters.append(QuizSession.id != exclude_quiz_id)
+    quiz_stats = db.query(
+        func.count(QuizSession.id),
+        func.sum(QuizSession.score),
+        func.sum(QuizSession.total_questions),
+        func.max(QuizSession.score)
+    ).filter(*quiz_filters).first()
+
+    ai_filters = [AIQuizSession.user_id == user_id, AIQuizSession.completed == True]
+    if exclude_ai_id is not None:
+        ai_filters.append(AIQuizSession.id != exclude_ai_id)
+    ai_stats = db.query(
+        func.count(AIQuizSession.id),
+        func.sum(AIQuizSession.total_score),
+        func.sum(AIQuizSession.total_questions),
+        func.max(AIQuizSession.total_score)
+    ).filter(*ai_filters).first()
+
+    quiz_count, quiz_total, quiz_questions, quiz_best = quiz_stats
+    ai_count, ai_total, ai_questions, ai_best = ai_stats
+
+    # Jours d'activité de tout l'historique (une requête, dédoublonnée)
+    activity_days = db.query(func.date(UserActivity.timestamp)).filter(UserActivity.user_id == user_id)
+    quiz_days = db.query(func.date(QuizSession.completed_at)).filter(*quiz_filters)
+    ai_days = db.query(func.date(AIQuizSession.completed_at)).filter(*ai_filters)
+    streak, streak_last_day, best_streak = _streak_from_days(
+        _as_date(row[0]) for row in activity_days.union(quiz_days, ai_days).all() if row[0] is not None
+    )
+
+    return UserPerformanceStats(
+        user_id=user_id,
+        quiz_sessions_completed=quiz_count or 0,
+        quiz_total_score=quiz_total or 0,
+        quiz_total_questions=quiz_questions or 0,
+        quiz_average_score=(quiz_total or 0) / quiz_count if quiz_count else 0.0,
+        quiz_best_score=quiz_best or 0,
+        quiz_time_spent_minutes=0,
+        ai_quiz_sessions_completed=ai_count or 0,
+        ai_quiz_total_score=float(ai_total or 0),
+        ai_quiz_total_questions=ai_questions or 0,
+        ai_quiz_average_score=float(ai_total or 0) / ai_count if ai_count else 0.0,
+        ai_quiz_best_score=float(ai_best or 0),
+        ai_quiz_time_spent_minutes=0,
+        total_login_count=0,
+        streak_days=streak,
+        streak_last_day=streak_last_day,
+        best_streak_days=best_streak,
+        level=1,
+        experience_points=0
+    )
+
+
+def _get_or_create(db: Session, user_id: int, lock: bool, exclude_quiz_id: int = None,
+                   exclude_ai_id: int = None) -> UserPerformanceStats:
+    """Ligne de l'utilisateur (verrouillée si `lock`), créée depuis l'historique si absente"""
+    query = db.query(UserPerformanceStats).filter(UserPerformanceStats.user_id == user_id)
+    if lock:
+        query = query.with_for_update()
+    rollup = query.first()
+    if rollup is not None:
+        return rollup
+
+    rollup = _build_rollup(db, user_id, exclude_quiz_id, exclude_ai_id)
+    try:
+        with db.begin_nested():
+            db.add(rollup)
+    except IntegrityError:
+        # Créée entre-temps par une requête concurrente
+        rollup = query.one()
+    return rollup
+
+
+def record_quiz_completion(db: Session, session: QuizSession):
+    """
+    Ajoute une session de quiz terminée à l'agrégat de son utilisateur.
+    À appeler après `session.completed = True`, avant le commit de l'appelant.
+    """
+    rollup = _get_or_create(db, session.user_id, lock=True, exclude_quiz_id=session.id)
+    score = session.score or 0
+
+    rollup.quiz_sessions_completed += 1
+    rollup.quiz_total_score += score
+    rollup.quiz_total_questions += session.total_questions or 0
+    rollup.quiz_average_score = rollup.quiz_total_score / rollup.quiz_sessions_completed
+    rollup.quiz_best_score = max(rollup.quiz_best_score or 0, score)
+    rollup.quiz_time_spent_minutes += session_minutes(session)
+    rollup.last_activity = session.completed_at or datetime.utcnow()
+    advance_streak(rollup, _as_date(rollup.last_activity))
+    queue_completion(db, session.user_id, quiz_score=score)
+    queue_invalidation(db, session.user_id)
+    queue_response_invalidation(db, "sessions", f"user:{session.user_id}")
+
+
+def record_ai_quiz_completion(db: Session, session: AIQuizSession):
+    """Équivalent de `record_quiz_completion` pour les sessions quiz IA / PLD"""
+    rollup = _get_or_create(db, session.user_id, lock=True, exclude_ai_id=session.id)
+    score = float(session.total_score or 0)
+
+    rollup.ai_quiz_sessions_completed += 1
+    rollup.ai_quiz_total_score += score
+    rollup.ai_quiz_total_questions += session.total_questions or 0
+    rollup.ai_quiz_average_score = rollup.ai_quiz_total_score / rollup.ai_quiz_sessions_completed
+    rollup.ai_quiz_best_score = max(rollup.ai_quiz_best_score or 0.0, score)
+    rollup.ai_quiz_time_spent_minutes += session_minutes(session)
+    rollup.last_activity = session.completed_at or datetime.utcnow()
+    advance_streak(rollup, _as_date(rollup.last_activity))
+    queue_completion(db, session.user_id, ai_score=score)
+    queue_invalidation(db, session.user_id)
+    queue_response_invalidation(db, "sessions", f"user:{session.user_id}")
+
+
+def record_activity_days(db: Session, days_by_user: Dict[int, Iterable[date]]):
+    """
+    Ajoute des jours d'activité aux séries (lot du journal d'activité).
+    Avant le commit de l'appelant ; utilisateurs verrouillés par id croissant.
+    """
+    for user_id in sorted(days_by_user):
+        rollup = _get_or_create(db, user_id, lock=True)
+        for day in sorted(set(days_by_user[user_id])):
+            advance_streak(rollup, day)
+        queue_response_invalidation(db, f"user:{user_id}")
+
+
+def reset_quiz_rollup(db: Session, user_id: int):
+    """
+    Recalcule la ligne après suppression des sessions de quiz de l'utilisateur
+    (même transaction) ; le classement est mis à jour après le commit.
+    """
+    db.query(UserPerformanceStats).filter(UserPerformanceStats.user_id == user_id).delete()
+    db.add(_build_rollup(db, user_id))
+    queue_quiz_reset(db, user_id)
+    queue_invalidation(db, user_id)
+    queue_response_invalidation(db, "sessions", f"user:{user_id}")
+
+
+def get_user_rollup(db: Session, user_id: int) -> UserPerformanceStats:
+    """
+    Ligne d'agrégats d'un utilisateur, en lecture seule : si elle est absente
+    (utilisateur sans historique, voir `backfill_missing_rollups`), calculée
+    sans être ajoutée à la session
+    """
+    rollup = db.query(UserPerformanceStats).filter(
+        UserPerformanceStats.user_id == user_id
+    ).first()
+    if rollup is None:
+        rollup = _build_rollup(db, user_id)
+    return rollup
+
+
+def _users_with_history(db: Session) -> set:
+    quiz_users = db.query(QuizSession.user_id).filter(QuizSession.completed == True)
+    ai_users = db.query(AIQuizSession.user_id).filter(AIQuizSession.completed == True)
+    activity_users = db.query(UserActivity.user_id)
+    return {row[0] for row in quiz_users.union(ai_users, activity_users).all()}
+
+
+def backfill_missing_rollups(db: Session) -> int:
+    """Crée les lignes manquantes des utilisateurs ayant un historique"""
+    existing = {row[0] for row in db.query(UserPerformanceStats.user_id).all()}
+    user_ids = sorted(_users_with_history(db) - existing)
+    for user_id in user_ids:
+        _get_or_create(db, user_id, lock=False)
+    db.commit()
+    return len(user_ids)
+
+
+def backfill_with_new_session() -> int:
+    db = SessionLocal()
+    try:
+        return backfill_missing_rollups(db)
+    finally:
+        db.close()
+
+
+def rebuild_user_rollups(db: Session, user_ids: Optional[list] = None) -> int:
+    """Recalcule les agrégats depuis l'historique (backfill ou réparation)"""
+    if user_ids is None:
+        user_ids = sorted(_users_with_history(db))
+
+    for user_id in user_ids:
+        db.query(UserPerformanceStats).filter(UserPerformanceStats.user_id == user_id).delete()
+        db.add(_build_rollup(db, user_id))
+    db.commit()
+    return len(user_ids)
@@ -0,0 +1,210 @@
+"""
+Catalogue PLD en mémoire (catégories, thèmes, questions)
+
+Le catalogue ne change que lorsqu'un administrateur le modifie : on le charge
+une fois, on pré-parse les termes techniques et on l'indexe par id, catégorie
+et thème. Les endpoints d'administration appellent `pld_catalog.invalidate()`
+après chaque écriture ; le snapshot suivant est reconstruit à la demande.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import PLDCategory, PLDTheme, PLDQuestion
+from app.response_cache import response_cache
+
+# Durée de vie maximale d'un snapshot (secondes). Couvre les écritures faites
+# hors de ce processus (autres workers, scripts). 0 = pas d'expiration.
+PLD_CATALOG_TTL = int(os.getenv("PLD_CATALOG_TTL", "300"))
+
+
+def parse_technical_terms(raw: Optional[str]) -> List[str]:
+    """Parse la colonne JSON `technical_terms` (liste vide si invalide)"""
+    try:
+        terms = json.loads(raw) if raw else []
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return terms if isinstance(terms, list) else []
+
+
+class CatalogSnapshot:
+    """Vue figée du catalogue PLD, indexée pour les lectures du quiz"""
+
+    def __init__(self, version: int, categories: List[Dict], themes: List[Dict], questions: List[Dict]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        self._categories = categories
+        self._categories_by_name = {c["name"]: c for c in categories}
+        self._themes_by_category: Dict[str, List[Dict]] = {c["name"]: [] for c in categories}
+        self._themes_by_key: Dict[tuple, Dict] = {}
+        for theme in themes:
+            self._themes_by_category.setdefault(theme["category"], []).append(theme)
+            self._themes_by_key[(theme["category"], theme["name"])] = theme
+
+        self._questions = questions
+        self._questions_by_id = {q["question_id"]: q for q in questions}
+        self._questions_by_category: Dict[str, List[Dict]] = {}
+        self._questions_by_theme: Dict[tuple, List[Dict]] = {}
+        for question in questions:
+            self._questions_by_category.setdefault(question["category"], []).append(question)
+            self._questions_by_theme.setdefault((question["category"], question["theme"]), []).append(question)
+
+    # Les dicts internes sont partagés entre requêtes : on renvoie des copies
+    @staticmethod
+    def _copy(item: Dict) -> Dict:
+        copied = dict(item)
+        if "technical_terms" in copied:
+            copied["technical_terms"] = list(copied["technical_terms"])
+        return copied
+
+    def categories(self) -> List[Dict]:
+        """Toutes les catégories avec leur nombre de questions"""
+        return [self._copy(c) for c in self._categories]
+
+    def get_category(self, name: str) -> Optional[Dict]:
+        category = self._categories_by_name.get(name)
+        return self._copy(category) if category else None
+
+    def themes(self, category: str) -> List[Dict]:
+        """Thèmes d'une catégorie avec leur nombre de questions"""
+        return [self._copy(t) for t in self._themes_by_category.get(category, [])]
+
+    def get_theme(self, category: str, theme: str) -> Optional[Dict]:
+        found = self._themes_by_key.get((category, theme))
+        return self._copy(found) if found else None
+
+    def get_question(self, question_id: int) -> Optional[Dict]:
+        # Les corps JSON non typés (dict) peuvent transmettre l'id en texte
+        try:
+            question_id = int(question_id)
+        except (TypeError, ValueError):
+            return None
+        question = self._questions_by_id.get(question_id)
+        return self._copy(question) if question else None
+
+    def questions(self, category: str = None, theme: str = None) -> List[Dict]:
+        """Questions filtrées par catégorie et/ou thème"""
+        if category and theme:
+            selected = self._questions_by_theme.get((category, theme), [])
+        elif category:
+            selected = self._questions_by_category.get(category, [])
+        elif theme:
+            selected = [q for q in self._questions if q["theme"] == theme]
+        else:
+            selected = self._questions
+        return [self._copy(q) for q in selected]
+
+    def question_count(self) -> int:
+        return len(self._questions)
+
+
+class PLDCatalog:
+    """Cache versionné du catalogue PLD avec invalidation explicite"""
+
+    def __init__(self, ttl_seconds: int = PLD_CATALOG_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._version = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self):
+        """À appeler après toute écriture sur les tables PLD"""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+        # Réponses des endpoints publics du catalogue
+        response_cache.invalidate("pld_catalog")
+
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        if snapshot is None or snapshot.version != self._version:
+            return False
+        if self.ttl_seconds > 0 and time.monotonic() - snapshot.loaded_at > self.ttl_seconds:
+            return False
+        return True
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        """Retourne le snapshot courant, rechargé depuis la DB si nécessaire"""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        with self._lock:
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            version = self._version
+            snapshot = self._load(db, version)
+            self._snapshot = snapshot
+            return snapshot
+
+    def _load(self, db: Session, version: int) -> CatalogSnapshot:
+        """Charge tout le catalogue en trois requêtes, sans lazy-loading"""
+        categories = db.query(PLDCategory).order_by(PLDCategory.id).all()
+        themes = db.query(PLDTheme).order_by(PLDTheme.id).all()
+        questions = db.query(PLDQuestion).order_by(PLDQuestion.id).all()
+
+        category_names = {c.id: c.name for c in categories}
+        themes_by_id = {t.id: t for t in themes}
+
+        questions_data = []
+        theme_counts: Dict[int, int] = {}
+        for q in questions:
+            theme = themes_by_id.get(q.theme_id)
+            if theme is None:
+                continue
+            theme_counts[theme.id] = theme_counts.get(theme.id, 0) + 1
+            questions_data.append({
+                "question_id": q.id,
+                "question_text": q.question_text,
+                "expected_answer": q.expected_answer,
+                "technical_terms": parse_technical_terms(q.technical_terms),
+                "explanation": q.explanation,
+                "difficulty": q.difficulty,
+                "category": category_names.get(theme.category_id),
+                "theme": theme.name,
+                "theme_id": theme.id,
+                "theme_display_name": theme.display_name,
+                "max_score": q.max_score
+            })
+
+        themes_data = []
+        category_counts: Dict[int, int] = {}
+        for t in themes:
+            count = theme_counts.get(t.id, 0)
+            category_counts[t.category_id] = category_counts.get(t.category_id, 0) + count
+            themes_data.append({
+                "id": t.id,
+                "name": t.name,
+                "display_name": t.display_name,
+                "description": t.description,
+                "icon": t.icon,
+                "category_id": t.category_id,
+                "category": category_names.get(t.category_id),
+                "question_count": count
+            })
+
+        categories_data = [
+            {
+                "id": c.id,
+                "name": c.name,
+                "display_name": c.display_name,
+                "description": c.description,
+                "icon": c.icon,
+                "question_count": category_counts.get(c.id, 0)
+            }
+            for c in categories
+        ]
+
+        return CatalogSnapshot(version, categories_data, themes_data, questions_data)
+
+
+# Instance globale du catalogue
+pld_catalog = PLDCatalog()
@@ -0,0 +1,113 @@
+"""
+Statistiques de la page profil
+
+Une seule requête (agrégation conditionnelle sur l'union des sessions de quiz
+et de quiz IA terminées) donne le nombre de quiz complétés, le pourcentage
+moyen et les quiz de la semaine. Le résultat est gardé par utilisateur
+PROFILE_STATS_TTL secondes et invalidé après le commit d'une fin de session,
+dans un LRU de PROFILE_STATS_MAX_ENTRIES utilisateurs au plus.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import case, event, func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models import QuizSession, AIQuizSession
+
+PROFILE_STATS_TTL = int(os.getenv("PROFILE_STATS_TTL", "300"))
+PROFILE_STATS_MAX_ENTRIES = int(os.getenv("PROFILE_STATS_MAX_ENTRIES", "10000"))
+
+
+def compute_profile_stats(db: Session, user_id: int, now: datetime = None) -> Dict:
+    """Quiz complétés, pourcentage moyen et quiz des 7 derniers jours (une requête)"""
+    week_ago = (now or datetime.utcnow()) - timedelta(days=7)
+
+    quiz = select(
+        QuizSession.score.label("score"),
+        QuizSession.total_questions.label("total_questions"),
+        QuizSession.completed_at.label("completed_at")
+    ).where(QuizSession.user_id == user_id, QuizSession.completed == True)
+    ai_quiz = select(
+        AIQuizSession.total_score.label("score"),
+        AIQuizSession.total_questions.label("total_questions"),
+        AIQuizSession.completed_at.label("completed_at")
+    ).where(AIQuizSession.user_id == user_id, AIQuizSession.completed == True)
+    sessions = union_all(quiz, ai_quiz).subquery()
+
+    percentage = sessions.c.score * literal(100.0) / sessions.c.total_questions
+    total, average, this_week = db.execute(select(
+        func.count(),
+        func.avg(case((sessions.c.total_questions > 0, percentage))),
+        func.count(case((sessions.c.completed_at >= week_ago, 1)))
+    )).one()
+
+    return {
+        "total_quiz_completed": total or 0,
+        "average_score": round(float(average)) if average is not None else 0,
+        "quizzes_this_week": this_week or 0
+    }
+
+
+class ProfileStatsProvider:
+    """Statistiques de profil par utilisateur (LRU borné), avec expiration et invalidation"""
+
+    def __init__(self, ttl_seconds: int = PROFILE_STATS_TTL, max_entries: int = PROFILE_STATS_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> Dict:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if self.ttl_seconds <= 0 or time.monotonic() - entry[0] <= self.ttl_seconds:
+                    self._entries.move_to_end(user_id)
+                    return entry[1]
+                del self._entries[user_id]
+        stats = compute_profile_stats(db, user_id)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[user_id] = (time.monotonic(), stats)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return stats
+
+    def invalidate(self, user_id: int = None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+# Instance globale des statistiques de profil
+profile_stats = ProfileStatsProvider()
+
+
+# ================================
+# INVALIDATION APRÈS COMMIT
+# ================================
+
+_PENDING_KEY = "profile_stats_pending"
+
+
+def queue_invalidation(db: Session, user_id: int):
+    db.info.setdefault(_PENDING_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        profile_stats.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,169 @@
+"""
+Tirage aléatoire des questions du quiz classique
+
+On garde en mémoire les ids des questions indexés par catégorie et par
+difficulté. Un tirage de k questions distinctes coûte O(k) (random.sample)
+puis une requête `IN` ; plus de `ORDER BY random()` sur toute la table.
+
+Le pool est invalidé après le commit de chaque écriture ORM sur `Question`
+dans ce processus et rechargé au plus tard après QUESTION_SAMPLER_TTL secondes (écritures des
+scripts d'import ou des autres workers).
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.models import Question
+from app.response_cache import queue_invalidation
+
+QUESTION_SAMPLER_TTL = int(os.getenv("QUESTION_SAMPLER_TTL", "300"))
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+class QuestionPool:
+    """Ids des questions, figés et indexés par catégorie / difficulté"""
+
+    def __init__(self, version: int, rows: Sequence[tuple]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._all: List[int] = []
+        self._by_key: Dict[tuple, List[int]] = {}
+        for question_id, category, difficulty in rows:
+            self._all.append(question_id)
+            for key in ((category, None), (None, difficulty), (category, difficulty)):
+                self._by_key.setdefault(key, []).append(question_id)
+
+    def ids(self, category: str = None, difficulty: str = None) -> List[int]:
+        if category is None and difficulty is None:
+            return self._all
+        return self._by_key.get((category, difficulty), [])
+
+    def difficulties(self, category: str = None) -> List[str]:
+        """Difficultés présentes (connues d'abord, dans l'ordre facile → difficile)"""
+        present = {key[1] for key in self._by_key if key[0] == category and key[1] is not None}
+        return [d for d in DIFFICULTIES if d in present] + sorted(present - set(DIFFICULTIES))
+
+    def sample(self, k: int, category: str = None, difficulty: str = None,
+               rng: random.Random = random) -> List[int]:
+        """k ids distincts (moins si la population est plus petite)"""
+        population = self.ids(category, difficulty)
+        return rng.sample(population, min(k, len(population)))
+
+    def sample_stratified(self, k: int, category: str = None,
+                          rng: random.Random = random) -> List[int]:
+        """
+        k ids répartis équitablement entre les difficultés ; le manque d'une
+        difficulté trop petite est reporté sur les autres
+        """
+        levels = self.difficulties(category)
+        available = {level: len(self.ids(category, level)) for level in levels}
+        quotas = {level: 0 for level in levels}
+
+        remaining = min(k, sum(available.values()))
+        while remaining > 0:
+            open_levels = [level for level in levels if quotas[level] < available[level]]
+            share, extra = divmod(remaining, len(open_levels))
+            for index, level in enumerate(open_levels):
+                wanted = share + (1 if index < extra else 0)
+                granted = min(wanted, available[level] - quotas[level])
+                quotas[level] += granted
+                remaining -= granted
+
+        drawn = []
+        for level in levels:
+            drawn.extend(self.sample(quotas[level], category, level, rng))
+        rng.shuffle(drawn)
+        return drawn
+
+
+class QuestionSampler:
+    """Pool versionné des ids de questions avec invalidation explicite"""
+
+    def __init__(self, ttl_seconds: int = QUESTION_SAMPLER_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._version = 0
+        self._pool: Optional[QuestionPool] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """À appeler après toute écriture sur la table questions"""
+        with self._lock:
+            self._version += 1
+            self._pool = None
+
+    def _is_fresh(self, pool: Optional[QuestionPool]) -> bool:
+        if pool is None or pool.version != self._version:
+            return False
+        if self.ttl_seconds > 0 and time.monotonic() - pool.loaded_at > self.ttl_seconds:
+            return False
+        return True
+
+    def pool(self, db: Session) -> QuestionPool:
+        pool = self._pool
+        if self._is_fresh(pool):
+            return pool
+
+        with self._lock:
+            if self._is_fresh(self._pool):
+                return self._pool
+            rows = db.query(Question.id, Question.category, Question.difficulty).order_by(Question.id).all()
+            self._pool = QuestionPool(self._version, rows)
+            return self._pool
+
+    def draw(self, db: Session, k: int, category: str = None, difficulty: str = None,
+             balanced: bool = False) -> List[Question]:
+        """Tire k questions distinctes et les charge en une requête `IN`"""
+        pool = self.pool(db)
+        if balanced and difficulty is None:
+            ids = pool.sample_stratified(k, category)
+        else:
+            ids = pool.sample(k, category, difficulty)
+        if not ids:
+            return []
+
+        questions = {q.id: q for q in db.query(Question).filter(Question.id.in_(ids)).all()}
+        # Ordre du tirage ; une question supprimée entre-temps est ignorée
+        return [questions[question_id] for question_id in ids if question_id in questions]
+
+
+# Instance globale du sampler
+question_sampler = QuestionSampler()
+
+
+# ================================
+# INVALIDATION APRÈS COMMIT
+# ================================
+# Une écriture ORM sur `Question` marque la session ; le pool n'est invalidé
+# qu'une fois la transaction validée (sinon une requête concurrente pourrait
+# le recharger avant le commit, sans l'écriture, jusqu'au TTL suivant).
+
+_PENDING_KEY = "question_sampler_pending"
+
+
+@event.listens_for(Question, "after_insert")
+@event.listens_for(Question, "after_update")
+@event.listens_for(Question, "after_delete")
+def _queue_on_write(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        question_sampler.invalidate()
+        return
+    session.info[_PENDING_KEY] = True
+    queue_invalidation(session, "quiz_stats")
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    if session.info.pop(_PENDING_KEY, False):
+        question_sampler.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
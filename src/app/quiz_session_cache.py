@@ -0,0 +1,351 @@
+"""
+Mode quiz haut débit : état des sessions en mémoire et tampon des réponses
+
+Activé par QUIZ_SESSION_CACHE=true. Pour chaque session de quiz active, le
+serveur garde le propriétaire, les questions servies (bonne réponse,
+explication), les questions déjà répondues et le score courant. Une réponse
+est vérifiée contre cet état puis ajoutée à un tampon, écrit en base par lots
+(executemany + une mise à jour du score par session) :
+- quand le tampon atteint QUIZ_ANSWER_FLUSH_SIZE réponses ;
+- toutes les QUIZ_ANSWER_FLUSH_INTERVAL secondes (tâche de fond) ;
+- à la fin de la session (`complete_quiz`, `start?force_new`) et à l'arrêt.
+
+Fin de session : la session est d'abord fermée (`close` : plus aucune
+réponse acceptée, plus de lot pris par la tâche de fond), puis
+`wait_flushed` attend hors de la boucle d'événements la fin du lot déjà
+parti, et `flush` écrit le reste : la session n'est relue qu'avec toutes ses
+réponses. Un lot en échec revient en tête du tampon ; après
+QUIZ_ANSWER_FLUSH_MAX_ATTEMPTS échecs de suite, les réponses de la session
+sont journalisées puis abandonnées au lieu de bloquer le tampon
+indéfiniment (les questions restent répondues : la bonne réponse a déjà été
+donnée).
+
+L'état d'une session est chargé depuis la base au premier usage dans le
+processus (session, réponses existantes) : propriété et unicité des réponses
+sont vérifiées comme dans le mode direct. Une session doit être servie par
+un seul processus (cas du serveur uvicorn à un worker) ; en cas d'arrêt
+brutal, les réponses des QUIZ_ANSWER_FLUSH_INTERVAL dernières secondes sont
+perdues.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Question, QuizSession, QuizAnswer
+from app.response_cache import queue_invalidation
+from app.site_counters import queue_delta
+
+QUIZ_SESSION_CACHE = os.getenv("QUIZ_SESSION_CACHE", "false").lower() in ("1", "true", "yes")
+QUIZ_ANSWER_FLUSH_SIZE = int(os.getenv("QUIZ_ANSWER_FLUSH_SIZE", "200"))
+QUIZ_ANSWER_FLUSH_INTERVAL = float(os.getenv("QUIZ_ANSWER_FLUSH_INTERVAL", "2"))
+QUIZ_SESSION_CACHE_TTL = int(os.getenv("QUIZ_SESSION_CACHE_TTL", "3600"))
+QUIZ_ANSWER_FLUSH_MAX_ATTEMPTS = int(os.getenv("QUIZ_ANSWER_FLUSH_MAX_ATTEMPTS", "5"))
+
+
+class QuizSessionNotFound(LookupError):
+    pass
+
+
+class QuestionNotFound(LookupError):
+    pass
+
+
+class AnswerAlreadySubmitted(ValueError):
+    pass
+
+
+class CachedQuizSession:
+    """État d'une session active : propriétaire, questions servies, réponses"""
+
+    def __init__(self, session_id: int, user_id: int, score: int, answered: Iterable[int]):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.score = score or 0
+        self.answered = set(answered)
+        self.questions: Dict[int, Tuple[str, Optional[str]]] = {}
+        self.pending: List[Dict] = []
+        self.pending_score = 0
+        self.last_used = time.monotonic()
+        # Levé quand aucun lot de la session n'est en cours d'écriture
+        self.flushed = threading.Event()
+        self.flushed.set()
+        self.failed_flushes = 0
+        self.closed = False
+
+
+class QuizSessionCache:
+    """Sessions actives en mémoire et tampon d'écriture des réponses"""
+
+    def __init__(self, flush_size: int = QUIZ_ANSWER_FLUSH_SIZE, ttl_seconds: int = QUIZ_SESSION_CACHE_TTL,
+                 max_attempts: int = QUIZ_ANSWER_FLUSH_MAX_ATTEMPTS):
+        self.flush_size = flush_size
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._sessions: Dict[int, CachedQuizSession] = {}
+        self._pending_total = 0
+        self._lock = threading.RLock()
+        self._flushes = 0
+        self._flushed_answers = 0
+        self._dropped_answers = 0
+
+    def _state(self, db: Session, session_id: int, user_id: int) -> CachedQuizSession:
+        """État de la session (chargé en base au premier usage), propriété vérifiée"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+        if state is None:
+            session = db.query(QuizSession).filter(
+                QuizSession.id == session_id,
+                QuizSession.completed == False
+            ).first()
+            if session is None:
+                raise QuizSessionNotFound(session_id)
+            answered = [row[0] for row in db.query(QuizAnswer.question_id).filter(
+                QuizAnswer.session_id == session_id
+            ).all()]
+            with self._lock:
+                state = self._sessions.setdefault(
+                    session_id, CachedQuizSession(session_id, session.user_id, session.score, answered)
+                )
+        if state.user_id != user_id:
+            raise QuizSessionNotFound(session_id)
+        state.last_used = time.monotonic()
+        return state
+
+    def remember_questions(self, db: Session, session_id: int, user_id: int, questions: List[Question]):
+        """Associe les questions servies à la session (correction sans requête)"""
+        state = self._state(db, session_id, user_id)
+        with self._lock:
+            for question in questions:
+                state.questions[question.id] = (question.correct_answer, question.explanation)
+
+    def submit(self, db: Session, session_id: int, user_id: int, question_id: int, user_answer: str) -> Dict:
+        """Corrige une réponse contre l'état en mémoire et la place dans le tampon"""
+        state = self._state(db, session_id, user_id)
+
+        if question_id not in state.questions:
+            # Question non servie par /questions?session_id= : chargée une fois
+            question = db.query(Question.correct_answer, Question.explanation).filter(
+                Question.id == question_id
+            ).first()
+            if question is None:
+                raise QuestionNotFound(question_id)
+            with self._lock:
+                state.questions[question_id] = (question.correct_answer, question.explanation)
+
+        correct_answer, explanation = state.questions[question_id]
+        is_correct = user_answer.lower() == correct_answer.lower()
+
+        with self._lock:
+            if state.closed:
+                raise QuizSessionNotFound(session_id)
+            if question_id in state.answered:
+                raise AnswerAlreadySubmitted(question_id)
+            state.answered.add(question_id)
+            state.pending.append({
+                "session_id": session_id,
+                "question_id": question_id,
+                "user_answer": user_answer,
+                "is_correct": is_correct
+            })
+            if is_correct:
+                state.score += 1
+                state.pending_score += 1
+            self._pending_total += 1
+
+        return {"is_correct": is_correct, "correct_answer": correct_answer, "explanation": explanation}
+
+    def current_score(self, session_id: int) -> Optional[int]:
+        """Score incluant les réponses encore dans le tampon (None si non suivie)"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            return state.score if state else None
+
+    def close(self, db: Session, session_id: int, user_id: int):
+        """Ferme la session aux réponses (fin de session) ; sans effet si elle n'existe pas"""
+        try:
+            state = self._state(db, session_id, user_id)
+        except QuizSessionNotFound:
+            return
+        with self._lock:
+            state.closed = True
+
+    def reopen(self, session_id: int):
+        """Rouvre une session dont la fin a échoué"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state.closed = False
+
+    async def wait_flushed(self, session_ids: Iterable[int]):
+        """Attend la fin des lots en cours d'écriture de ces sessions (dans un thread)"""
+        with self._lock:
+            in_flight = [
+                self._sessions[i].flushed for i in session_ids
+                if i in self._sessions and not self._sessions[i].flushed.is_set()
+            ]
+        loop = asyncio.get_running_loop()
+        for flushed in in_flight:
+            await loop.run_in_executor(None, flushed.wait)
+
+    def should_flush(self) -> bool:
+        return self._pending_total >= self.flush_size
+
+    def _drop_failed(self, state: CachedQuizSession, pending: List[Dict], delta: int):
+        """Abandonne les réponses d'une session après trop d'échecs (sous le verrou)"""
+        print(f"Réponses du quiz abandonnées après {state.failed_flushes} échecs d'écriture "
+              f"(session {state.session_id}): {pending}")
+        state.failed_flushes = 0
+        state.score -= delta
+        self._dropped_answers += len(pending)
+
+    def flush(self, db: Session, session_ids: Iterable[int] = None) -> int:
+        """
+        Écrit les réponses en attente : toutes sauf celles des sessions fermées,
+        ou celles des sessions données (après `close` et `wait_flushed`).
+        Une session dont un lot est en cours est laissée au prochain passage.
+        """
+        with self._lock:
+            if session_ids is None:
+                candidates = [state for state in self._sessions.values() if not state.closed]
+            else:
+                candidates = [self._sessions[i] for i in session_ids if i in self._sessions]
+            targets = [state for state in candidates if state.pending and state.flushed.is_set()]
+            batches = [(state, state.pending, state.pending_score) for state in targets]
+            for state in targets:
+                self._pending_total -= len(state.pending)
+                state.pending, state.pending_score = [], 0
+                state.flushed.clear()
+
+        if not batches:
+            return 0
+
+        rows = [row for _, pending, _ in batches for row in pending]
+        try:
+            db.execute(insert(QuizAnswer), rows)
+            for state, _, delta in batches:
+                if delta:
+                    db.execute(
+                        update(QuizSession)
+                        .where(QuizSession.id == state.session_id)
+                        .values(score=QuizSession.score + delta)
+                    )
+            queue_invalidation(db, "quiz_stats")
+            queue_delta(db, answers=len(rows), correct_answers=sum(1 for row in rows if row["is_correct"]))
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Remettre les réponses en tête du tampon pour le prochain essai
+            with self._lock:
+                for state, pending, delta in batches:
+                    state.failed_flushes += 1
+                    if state.failed_flushes >= self.max_attempts:
+                        self._drop_failed(state, pending, delta)
+                    else:
+                        state.pending = pending + state.pending
+                        state.pending_score += delta
+                        self._pending_total += len(pending)
+                    state.flushed.set()
+            raise
+
+        with self._lock:
+            for state, _, _ in batches:
+                state.failed_flushes = 0
+                state.flushed.set()
+            self._flushes += 1
+            self._flushed_answers += len(rows)
+        return len(rows)
+
+    def forget(self, session_id: int):
+        """Retire une session terminée (après `flush`)"""
+        with self._lock:
+            state = self._sessions.pop(session_id, None)
+            if state is not None:
+                self._pending_total -= len(state.pending)
+
+    def forget_user(self, user_id: int):
+        """Oublie les sessions d'un utilisateur (réinitialisation de sa progression)"""
+        with self._lock:
+            for session_id in [i for i, s in self._sessions.items() if s.user_id == user_id]:
+                self.forget(session_id)
+
+    def evict_idle(self):
+        """Retire les sessions inactives sans réponse en attente ni lot en cours"""
+        limit = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            for session_id in [
+                i for i, s in self._sessions.items()
+                if not s.pending and s.flushed.is_set() and s.last_used < limit
+            ]:
+                del self._sessions[session_id]
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": QUIZ_SESSION_CACHE,
+                "sessions": len(self._sessions),
+                "pending_answers": self._pending_total,
+                "flushes": self._flushes,
+                "flushed_answers": self._flushed_answers,
+                "dropped_answers": self._dropped_answers
+            }
+
+
+# Instance globale du cache de sessions
+quiz_session_cache = QuizSessionCache()
+
+
+# ================================
+# TÂCHE DE FOND
+# ================================
+
+def _flush_with_new_session():
+    db = SessionLocal()
+    try:
+        quiz_session_cache.flush(db)
+    finally:
+        db.close()
+    quiz_session_cache.evict_idle()
+
+
+class QuizAnswerFlusher:
+    """Vide le tampon des réponses à intervalle régulier"""
+
+    def __init__(self, interval_seconds: float = QUIZ_ANSWER_FLUSH_INTERVAL):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not QUIZ_SESSION_CACHE or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await loop.run_in_executor(None, _flush_with_new_session)
+            except Exception as e:
+                print(f"Erreur écriture des réponses du quiz: {e}")
+
+    async def stop(self):
+        """Arrête la tâche puis écrit les dernières réponses"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if QUIZ_SESSION_CACHE:
+            await asyncio.get_running_loop().run_in_executor(None, _flush_with_new_session)
+
+
+# Instance globale de la tâche de fond
+quiz_answer_flusher = QuizAnswerFlusher()
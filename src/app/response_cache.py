@@ -0,0 +1,273 @@
+"""
+Cache des réponses JSON des endpoints de lecture, avec ETag / 304
+
+Le décorateur `cached_response` (placé entre `@router.get` et `@db_endpoint`)
+garde le corps JSON d'une réponse 200, par chemin, paramètres de requête et
+utilisateur. Chaque entrée dépend d'espaces de noms versionnés
+("pld_catalog", "sessions", "user:{user_id}", ...) : une écriture incrémente
+la version de l'espace concerné, les entrées et ETag qui en dépendent ne
+sont plus jamais servis.
+
+L'entrée est retrouvée par la clé et les versions ; l'ETag est l'empreinte du
+corps, gardée avec lui. Une requête `If-None-Match` reçoit `304 Not Modified`
+sans exécuter l'endpoint si l'entrée est encore valable et a cet ETag ;
+sinon le corps est reconstruit et comparé. Des versions remises à zéro
+(redémarrage, autre worker) ne peuvent donc pas confirmer un ancien corps.
+
+Backends :
+- memory : LRU en mémoire du processus avec expiration (défaut) ;
+- redis : serveur Redis partagé entre workers (paquet `redis` optionnel) ;
+- off : pas de cache.
+
+Configuration (variables d'environnement) :
+- RESPONSE_CACHE_BACKEND : memory | redis | off
+- RESPONSE_CACHE_URL : URL Redis (backend redis)
+- RESPONSE_CACHE_TTL : durée de vie d'une entrée en secondes
+- RESPONSE_CACHE_MAX_ENTRIES : taille du LRU en mémoire
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+
+class MemoryBackend:
+    """LRU borné avec expiration, versions des espaces de noms en mémoire"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def versions(self, namespaces: List[str]) -> List[int]:
+        return [self._versions.get(namespace, 0) for namespace in namespaces]
+
+    def bump(self, namespaces: Iterable[str]):
+        with self._lock:
+            for namespace in namespaces:
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, body = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Entrées et versions dans Redis : invalidation visible de tous les workers"""
+
+    name = "redis"
+
+    def __init__(self, url: str = RESPONSE_CACHE_URL):
+        import redis  # Dépendance optionnelle
+        self._client = redis.Redis.from_url(url)
+
+    def versions(self, namespaces: List[str]) -> List[int]:
+        values = self._client.mget([f"rc:ns:{namespace}" for namespace in namespaces])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, namespaces: Iterable[str]):
+        pipeline = self._client.pipeline()
+        for namespace in namespaces:
+            pipeline.incr(f"rc:ns:{namespace}")
+        pipeline.execute()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(f"rc:entry:{key}")
+
+    def set(self, key: str, body: bytes, ttl: int):
+        self._client.setex(f"rc:entry:{key}", ttl, body)
+
+    def size(self) -> int:
+        return len(self._client.keys("rc:entry:*"))
+
+
+def _create_backend():
+    if RESPONSE_CACHE_BACKEND == "off":
+        return None
+    if RESPONSE_CACHE_BACKEND == "redis":
+        try:
+            return RedisBackend()
+        except ImportError:
+            print("⚠️  Cache des réponses: paquet redis non installé, cache en mémoire")
+    return MemoryBackend()
+
+
+class ResponseCache:
+    """Point d'entrée du cache : versions, entrées et statistiques"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def invalidate(self, *namespaces: str):
+        if self.backend is not None and namespaces:
+            self.backend.bump(namespaces)
+
+    def entry_key(self, key: str, namespaces: List[str]) -> str:
+        """Clé de l'entrée : change à chaque invalidation d'un de ses espaces de noms"""
+        versions = self.backend.versions(namespaces)
+        return hashlib.sha1(f"{key}|{namespaces}|{versions}".encode()).hexdigest()
+
+    def get(self, entry_key: str) -> Optional[tuple]:
+        """(ETag, corps) d'une entrée valable, None sinon"""
+        stored = self.backend.get(entry_key)
+        if stored is None:
+            return None
+        etag, _, body = stored.partition(b"\n")
+        return etag.decode(), body
+
+    def set(self, entry_key: str, body: bytes, ttl: int) -> str:
+        """Garde le corps avec son ETag et renvoie l'ETag"""
+        etag = body_etag(body)
+        self.backend.set(entry_key, etag.encode() + b"\n" + body, ttl)
+        return etag
+
+    def metrics(self) -> Dict:
+        return {
+            "backend": self.backend.name if self.backend else "off",
+            "entries": self.backend.size() if self.backend else 0,
+            "hits": self._hits,
+            "misses": self._misses,
+            "not_modified": self._not_modified
+        }
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()[:32]}"'
+
+
+# Instance globale du cache des réponses
+response_cache = ResponseCache(_create_backend())
+
+
+def _request_key(request: Request, user_id: Optional[int]) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return f"{request.url.path}?{query}|user={user_id if user_id is not None else '*'}"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+def cached_response(*namespaces: str, ttl: int = RESPONSE_CACHE_TTL, per_user: bool = True):
+    """
+    Met en cache la réponse JSON d'un endpoint GET.
+    `namespaces` peut contenir "{user_id}" (utilisateur courant, paramètre
+    `current_user` de l'endpoint). per_user=False : réponse commune à tous.
+    Un appel direct sans `request` n'utilise pas le cache.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        has_request = "request" in signature.parameters
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get("request") if has_request else kwargs.pop("request", None)
+            if not response_cache.enabled or request is None:
+                return await func(*args, **kwargs)
+
+            user = kwargs.get("current_user")
+            user_id = getattr(user, "id", None)
+            resolved = [namespace.format(user_id=user_id) for namespace in namespaces]
+            entry_key = response_cache.entry_key(_request_key(request, user_id if per_user else None), resolved)
+
+            cached = response_cache.get(entry_key)
+            if cached is not None:
+                etag, body = cached
+                headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+                if _etag_matches(request, etag):
+                    response_cache._not_modified += 1
+                    return Response(status_code=304, headers=headers)
+                response_cache._hits += 1
+                return Response(content=body, media_type="application/json", headers=headers)
+
+            response_cache._misses += 1
+            result = await func(*args, **kwargs)
+            if isinstance(result, Response):
+                return result  # Réponse construite par l'endpoint (204...), non mise en cache
+            body = json.dumps(jsonable_encoder(result), ensure_ascii=False).encode("utf-8")
+            etag = response_cache.set(entry_key, body, ttl)
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if _etag_matches(request, etag):
+                # Corps reconstruit identique à celui du client
+                response_cache._not_modified += 1
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        if not has_request:
+            # FastAPI injecte la requête via la signature exposée
+            parameters = list(signature.parameters.values())
+            request_parameter = inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            wrapper.__signature__ = signature.replace(parameters=parameters + [request_parameter])
+        return wrapper
+
+    return decorator
+
+
+# ================================
+# INVALIDATION APRÈS COMMIT
+# ================================
+
+_PENDING_KEY = "response_cache_pending"
+
+
+def queue_invalidation(db: Session, *namespaces: str):
+    """Invalide les espaces de noms une fois la transaction validée"""
+    db.info.setdefault(_PENDING_KEY, set()).update(namespaces)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    namespaces = session.info.pop(_PENDING_KEY, None)
+    if namespaces:
+        response_cache.invalidate(*namespaces)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,17 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 from typing import List, Dict
 from pydantic import BaseModel
-import difflib
-import re
 import json
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_request_db, run_db, db_endpoint
 from app.models import User, AIQuizSession, AIQuizAnswer, PLDCategory, PLDTheme, PLDQuestion
 from app.schemas import AIQuizSession as AIQuizSessionSchema, AIQuizAnswer as AIQuizAnswerSchema, AIQuizAnswerSubmission, AIQuizResult
-from app.auth import get_current_active_user, get_current_user_from_session
+from app.auth import get_request_user, get_request_session_user
+from app.pld_catalog import pld_catalog
+from app.grading import AIQuizCorrector, ai_corrector
+from app.grading_executor import grading_executor
+from app.performance_rollups import record_ai_quiz_completion
 
 router = APIRouter()
 
@@ -39,205 +42,96 @@ class AIAnswerResult(BaseModel):
     feedback: str
     detailed_explanation: str
 
-class AIQuizCorrector:
-    """Correcteur IA pour les réponses textuelles - Version API"""
-    
-    def __init__(self):
-        self.bonus_multiplier = 1.2
-        self.similarity_weight = 0.7
-        self.technical_weight = 0.3
-        
-    def normalize_text(self, text: str) -> str:
-        """Normalise le texte pour la comparaison"""
-        text = re.sub(r'[^\w\s]', '', text.lower())
-        text = re.sub(r'\s+', ' ', text.strip())
-        return text
-    
-    def calculate_similarity(self, user_answer: str, expected_answer: str) -> float:
-        """Calcule la similarité entre deux textes"""
-        user_norm = self.normalize_text(user_answer)
-        expected_norm = self.normalize_text(expected_answer)
-        
-        similarity = difflib.SequenceMatcher(None, user_norm, expected_norm).ratio()
-        
-        user_words = set(user_norm.split())
-        expected_words = set(expected_norm.split())
-        word_overlap = len(user_words.intersection(expected_words)) / len(expected_words) if expected_words else 0
-        
-        return (similarity * 0.6 + word_overlap * 0.4)
-    
-    def find_technical_terms(self, user_answer: str, technical_terms: List[str]) -> List[str]:
-        """Trouve les termes techniques utilisés dans la réponse"""
-        user_norm = self.normalize_text(user_answer)
-        found_terms = []
-        
-        for term in technical_terms:
-            term_norm = self.normalize_text(term)
-            if term_norm in user_norm:
-                found_terms.append(term)
-        
-        return found_terms
-    
-    def correct_answer(self, question_data: Dict, user_answer: str) -> Dict:
-        """Corrige une réponse utilisateur et attribue un score"""
-        if not user_answer.strip():
-            return {
-                'score': 0,
-                'max_score': question_data['max_score'],
-                'percentage': 0,
-                'similarity': 0,
-                'technical_terms_found': [],
-                'technical_bonus': 0,
-                'feedback': "Aucune réponse fournie.",
-                'detailed_explanation': question_data['explanation']
-            }
-        
-        similarity = self.calculate_similarity(user_answer, question_data['expected_answer'])
-        
-        technical_terms_found = self.find_technical_terms(user_answer, question_data['technical_terms'])
-        technical_ratio = len(technical_terms_found) / len(question_data['technical_terms']) if question_data['technical_terms'] else 0
-        
-        base_score = (similarity * self.similarity_weight + technical_ratio * self.technical_weight) * question_data['max_score']
-        
-        technical_bonus = len(technical_terms_found) * 5
-        
-        final_score = min(base_score + technical_bonus, question_data['max_score'])
-        
-        feedback = self.generate_feedback(similarity, technical_terms_found, question_data['technical_terms'], final_score, question_data['max_score'])
-        
-        return {
-            'score': round(final_score, 1),
-            'max_score': question_data['max_score'],
-            'percentage': round((final_score / question_data['max_score']) * 100, 1),
-            'similarity': round(similarity * 100, 1),
-            'technical_terms_found': technical_terms_found,
-            'technical_bonus': technical_bonus,
-            'feedback': feedback,
-            'detailed_explanation': question_data['explanation']
-        }
-    
-    def generate_feedback(self, similarity: float, found_terms: List[str], all_terms: List[str], score: float, max_score: float) -> str:
-        """Génère un feedback personnalisé"""
-        percentage = (score / max_score) * 100
-        
-        if percentage >= 90:
-            feedback = "🏆 Excellente réponse ! "
-        elif percentage >= 75:
-            feedback = "👍 Très bonne réponse ! "
-        elif percentage >= 60:
-            feedback = "📚 Bonne réponse, mais peut être améliorée. "
-        elif percentage >= 40:
-            feedback = "💪 Réponse partiellement correcte. "
-        else:
-            feedback = "📖 La réponse nécessite des améliorations importantes. "
-        
-        if found_terms:
-            feedback += f"Termes techniques utilisés correctement : {', '.join(found_terms)}. "
-        
-        missed_terms = [term for term in all_terms if term not in found_terms]
-        if missed_terms:
-            feedback += f"Termes techniques manqués : {', '.join(missed_terms)}. "
-        
-        feedback += f"Similarité avec la réponse attendue : {similarity * 100:.1f}%."
-        
-        return feedback
-
-# Instance du correcteur IA
-ai_corrector = AIQuizCorrector()
-
 # ================================
 # SERVICES DE BASE DE DONNÉES
 # ================================
 
 def get_questions_from_db(db: Session, category: str = None, theme: str = None):
-    """Récupérer les questions depuis la base de données"""
-    query = db.query(PLDQuestion).join(PLDTheme).join(PLDCategory)
-    
-    if category:
-        query = query.filter(PLDCategory.name == category)
-    
-    if theme:
-        query = query.filter(PLDTheme.name == theme)
-    
-    questions = query.all()
-    
-    # Convertir au format attendu par le frontend
-    result = []
-    for q in questions:
-        result.append({
-            "question_id": q.id,
-            "question_text": q.question_text,
-            "expected_answer": q.expected_answer,
-            "technical_terms": json.loads(q.technical_terms),
-            "explanation": q.explanation,
-            "difficulty": q.difficulty,
-            "category": q.theme.category.name,
-            "theme": q.theme.name,
-            "max_score": q.max_score
-        })
-    
-    return result
+    """Récupérer les questions depuis le catalogue PLD en mémoire"""
+    return pld_catalog.snapshot(db).questions(category, theme)
 
 def get_categories_from_db(db: Session):
-    """Récupérer toutes les catégories depuis la base de données"""
-    categories = db.query(PLDCategory).all()
+    """Récupérer toutes les catégories depuis le catalogue PLD en mémoire"""
     return [
         {
-            "name": cat.name,
-            "display_name": cat.display_name,
-            "description": cat.description,
-            "icon": cat.icon,
-            "question_count": sum(len(theme.questions) for theme in cat.themes)
+            "name": cat["name"],
+            "display_name": cat["display_name"],
+            "description": cat["description"],
+            "icon": cat["icon"],
+            "question_count": cat["question_count"]
         }
-        for cat in categories
+        for cat in pld_catalog.snapshot(db).categories()
     ]
 
 def get_themes_from_db(db: Session, category: str):
-    """Récupérer les thèmes d'une catégorie depuis la base de données"""
-    category_obj = db.query(PLDCategory).filter(PLDCategory.name == category).first()
-    if not category_obj:
-        return []
-    
+    """Récupérer les thèmes d'une catégorie depuis le catalogue PLD en mémoire"""
     return [
         {
-            "name": theme.name,
-            "display_name": theme.display_name,
-            "description": theme.description,
-            "icon": theme.icon,
-            "question_count": len(theme.questions)
+            "name": theme["name"],
+            "display_name": theme["display_name"],
+            "description": theme["description"],
+            "icon": theme["icon"],
+            "question_count": theme["question_count"]
         }
-        for theme in category_obj.themes
+        for theme in pld_catalog.snapshot(db).themes(category)
     ]
 
 def find_question_by_id_db(db: Session, question_id: int):
-    """Trouver une question par ID dans la base de données"""
-    question = db.query(PLDQuestion).filter(PLDQuestion.id == question_id).first()
-    if not question:
-        return None
-    
-    return {
-        "question_id": question.id,
-        "question_text": question.question_text,
-        "expected_answer": question.expected_answer,
-        "technical_terms": json.loads(question.technical_terms),
-        "explanation": question.explanation,
-        "difficulty": question.difficulty,
-        "category": question.theme.category.name,
-        "theme": question.theme.name,
-        "max_score": question.max_score
-    }
+    """Trouver une question par ID dans le catalogue PLD en mémoire"""
+    return pld_catalog.snapshot(db).get_question(question_id)
 
 def count_total_questions_db(db: Session):
-    """Compter le nombre total de questions dans la base de données"""
-    return db.query(PLDQuestion).count()
+    """Compter le nombre total de questions du catalogue"""
+    return pld_catalog.snapshot(db).question_count()
+
+def get_active_session_db(db: Session, session_id: int, user_id: int):
+    """Session AI Quiz non terminée appartenant à l'utilisateur"""
+    return db.query(AIQuizSession).filter(
+        AIQuizSession.id == session_id,
+        AIQuizSession.user_id == user_id,
+        AIQuizSession.completed == False
+    ).first()
+
+def save_ai_answer_db(db: Session, session: AIQuizSession, submission: AIQuizAnswerSubmission, question_data: Dict, result: Dict):
+    """Enregistre une réponse corrigée et met à jour le score de la session"""
+    ai_answer = AIQuizAnswer(
+        session_id=session.id,
+        question_id=submission.question_id,
+        question_text=question_data["question_text"],
+        user_answer=submission.user_answer,
+        expected_answer=question_data["expected_answer"],
+        score=result["score"],
+        max_score=result["max_score"],
+        percentage=result["percentage"],
+        similarity=result["similarity"],
+        technical_terms_found=json.dumps(result["technical_terms_found"]),
+        technical_bonus=result["technical_bonus"],
+        feedback=result["feedback"]
+    )
+    
+    db.add(ai_answer)
+    
+    # Mettre à jour le score total de la session (incrément en SQL : deux
+    # réponses simultanées sur la session ne perdent aucun point)
+    db.execute(
+        update(AIQuizSession)
+        .where(AIQuizSession.id == session.id)
+        .values(total_score=func.coalesce(AIQuizSession.total_score, 0) + result["score"])
+        .execution_options(synchronize_session=False)
+    )
+    
+    db.commit()
+    db.refresh(ai_answer)
+    return ai_answer
 
 # AI Quiz Session Management Endpoints
 
 # AI Quiz Session Management Endpoints
 @router.get("/sessions", response_model=List[AIQuizSessionSchema])
-async def get_user_ai_quiz_sessions(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+@db_endpoint
+def get_user_ai_quiz_sessions(
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupère toutes les sessions AI Quiz de l'utilisateur"""
     sessions = db.query(AIQuizSession).filter(
@@ -246,9 +140,10 @@ async def get_user_ai_quiz_sessions(
     return sessions
 
 @router.get("/sessions/active", response_model=AIQuizSessionSchema)
-async def get_active_ai_quiz_session(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+@db_endpoint
+def get_active_ai_quiz_session(
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupère la session AI Quiz active de l'utilisateur"""
     active_session = db.query(AIQuizSession).filter(
@@ -265,10 +160,11 @@ async def get_active_ai_quiz_session(
     return active_session
 
 @router.post("/start", response_model=AIQuizSessionSchema)
-async def start_ai_quiz_session(
+@db_endpoint
+def start_ai_quiz_session(
     force_new: bool = False,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Démarre une nouvelle session AI Quiz"""
     # Vérifier s'il y a une session active
@@ -283,6 +179,7 @@ async def start_ai_quiz_session(
     elif active_session and force_new:
         # Marquer l'ancienne session comme complétée
         active_session.completed = True
+        record_ai_quiz_completion(db, active_session)
         db.commit()
     
     # Créer une nouvelle session
@@ -296,12 +193,13 @@ async def start_ai_quiz_session(
     return ai_quiz_session
 
 @router.get("/ai-questions", response_model=List[AIQuestionResponse])
-async def get_ai_questions(
+@db_endpoint
+def get_ai_questions(
     category: str = None,
     theme: str = None,
     request: Request = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_session)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_session_user)
 ):
     """Récupère la liste des questions pour le quiz IA par catégorie et/ou thème depuis la DB"""
     try:
@@ -330,10 +228,11 @@ async def get_ai_questions(
         )
 
 @router.get("/ai-questions/{question_id}", response_model=AIQuestionResponse)
-async def get_ai_question(
+@db_endpoint
+def get_ai_question(
     question_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupère une question spécifique pour le quiz IA depuis la DB"""
     question_data = find_question_by_id_db(db, question_id)
@@ -348,12 +247,12 @@ async def get_ai_question(
 @router.post("/submit-answer", response_model=AIAnswerResult)
 async def submit_ai_answer(
     submission: AIQuizAnswerSubmission,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Soumet une réponse textuelle pour correction par IA et sauvegarde dans une session"""
     # Vérifier que la question existe dans la base de données
-    question_data = find_question_by_id_db(db, submission.question_id)
+    question_data = await run_db(db, find_question_by_id_db, submission.question_id)
     if not question_data:
         raise HTTPException(
             status_code=404,
@@ -361,11 +260,7 @@ async def submit_ai_answer(
         )
     
     # Vérifier que la session existe et appartient à l'utilisateur
-    session = db.query(AIQuizSession).filter(
-        AIQuizSession.id == submission.session_id,
-        AIQuizSession.user_id == current_user.id,
-        AIQuizSession.completed == False
-    ).first()
+    session = await run_db(db, get_active_session_db, submission.session_id, current_user.id)
     
     if not session:
         raise HTTPException(
@@ -373,40 +268,20 @@ async def submit_ai_answer(
             detail="Active AI quiz session not found"
         )
     
-    # Correction par IA
-    result = ai_corrector.correct_answer(question_data, submission.user_answer)
+    # Correction par IA (dans le pool de correction, hors boucle d'événements)
+    result = await grading_executor.grade_ai_answer(question_data, submission.user_answer)
     
     # Sauvegarder la réponse dans la base de données
-    ai_answer = AIQuizAnswer(
-        session_id=session.id,
-        question_id=submission.question_id,
-        question_text=question_data["question_text"],
-        user_answer=submission.user_answer,
-        expected_answer=question_data["expected_answer"],
-        score=result["score"],
-        max_score=result["max_score"],
-        percentage=result["percentage"],
-        similarity=result["similarity"],
-        technical_terms_found=json.dumps(result["technical_terms_found"]),
-        technical_bonus=result["technical_bonus"],
-        feedback=result["feedback"]
-    )
-    
-    db.add(ai_answer)
-    
-    # Mettre à jour le score total de la session
-    session.total_score += result["score"]
-    
-    db.commit()
-    db.refresh(ai_answer)
+    await run_db(db, save_ai_answer_db, session, submission, question_data, result)
     
     return AIAnswerResult(**result)
 
 @router.post("/complete", response_model=AIQuizResult)
-async def complete_ai_quiz_session(
+@db_endpoint
+def complete_ai_quiz_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Marque une session AI Quiz comme complétée et retourne les résultats"""
     session = db.query(AIQuizSession).filter(
@@ -431,6 +306,7 @@ async def complete_ai_quiz_session(
     ).count()
     
     session.total_questions = answered_questions
+    record_ai_quiz_completion(db, session)
     
     db.commit()
     
@@ -454,24 +330,25 @@ async def complete_ai_quiz_session(
 @router.post("/ai-submit", response_model=AIAnswerResult)
 async def submit_ai_answer_legacy(
     submission: AIAnswerSubmission,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Soumet une réponse textuelle pour correction par IA (legacy - sans session)"""
-    question_data = find_question_by_id_db(db, submission.question_id)
+    question_data = await run_db(db, find_question_by_id_db, submission.question_id)
     if not question_data:
         raise HTTPException(
             status_code=404,
             detail="Question not found"
         )
     
-    # Correction par IA
-    result = ai_corrector.correct_answer(question_data, submission.user_answer)
+    # Correction par IA (dans le pool de correction, hors boucle d'événements)
+    result = await grading_executor.grade_ai_answer(question_data, submission.user_answer)
     
     return AIAnswerResult(**result)
 
 @router.get("/ai-quiz/demo")
-async def get_demo_info(db: Session = Depends(get_db)):
+@db_endpoint
+def get_demo_info(db: Session = Depends(get_request_db)):
     """Informations sur le quiz IA (accessible sans authentification pour démo)"""
     return {
         "title": "Quiz IA avec Correction Automatique",
@@ -493,17 +370,17 @@ async def get_demo_info(db: Session = Depends(get_db)):
     }
 
 @router.get("/categories/{category}/themes")
-async def get_category_themes(
+@db_endpoint
+def get_category_themes(
     category: str,
     request: Request,
     response: Response,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_session)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_session_user)
 ):
     """Récupère la liste des thèmes disponibles pour une catégorie depuis la DB"""
     # Vérifier que la catégorie existe
-    category_obj = db.query(PLDCategory).filter(PLDCategory.name == category).first()
-    if not category_obj:
+    if not pld_catalog.snapshot(db).get_category(category):
         raise HTTPException(
             status_code=404,
             detail=f"Category '{category}' not found"
@@ -519,10 +396,11 @@ async def get_category_themes(
     return {"themes": themes_data}
 
 @router.get("/categories")
-async def get_categories(
+@db_endpoint
+def get_categories(
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_session)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_session_user)
 ):
     """Récupère la liste des catégories disponibles depuis la DB"""
     categories_data = get_categories_from_db(db)
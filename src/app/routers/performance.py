@@ -8,75 +8,82 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 
-from app.database import get_db
+from app.database import get_request_db, db_endpoint
 from app.models import User
-from app.auth import get_current_active_user
+from app.auth import get_request_user
 from app.performance_service import get_performance_service
+from app.leaderboard import leaderboard_engine, MODES, WINDOWS
+from app.activity_log import activity_logger
+from app.response_cache import cached_response
 from app.routers.users import is_admin
 
 router = APIRouter()
+
+# Taille maximale d'une page de classement
+LEADERBOARD_MAX_PAGE = 100
 templates = Jinja2Templates(directory="src/templates")
 
 @router.get("/stats/performance")
-async def get_user_performance_stats(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+@cached_response("user:{user_id}")
+@db_endpoint
+def get_user_performance_stats(
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
 ):
     """API pour récupérer les statistiques de performance de l'utilisateur connecté"""
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     try:
         stats = performance_service.calculate_user_performance(current_user.id)
         return {"success": True, "data": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des statistiques: {str(e)}")
-    finally:
-        performance_service.close()
 
 @router.get("/stats/timeline")
-async def get_user_performance_timeline(
+@cached_response("user:{user_id}")
+@db_endpoint
+def get_user_performance_timeline(
     days: int = 30,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
 ):
     """API pour récupérer l'évolution des performances sur une période"""
     if days > 365:
         days = 365  # Limite maximum
     
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     try:
         timeline = performance_service.get_user_progress_timeline(current_user.id, days)
         return {"success": True, "data": timeline, "period_days": days}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de la timeline: {str(e)}")
-    finally:
-        performance_service.close()
 
 @router.get("/stats/system")
-async def get_system_performance_stats(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+@cached_response("sessions")
+@db_endpoint
+def get_system_performance_stats(
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
 ):
     """API pour récupérer les statistiques de performance globales du système (admin only)"""
     if not is_admin(current_user, db):
         raise HTTPException(status_code=403, detail="Accès refusé - Droits administrateur requis")
     
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     try:
         stats = performance_service.get_system_performance_stats()
         return {"success": True, "data": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des statistiques système: {str(e)}")
-    finally:
-        performance_service.close()
 
 @router.get("/analytics", response_class=HTMLResponse)
-async def analytics_dashboard(
+@db_endpoint
+def analytics_dashboard(
     request: Request,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
 ):
     """Page d'analytics avec graphiques de performance"""
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     try:
         # Récupérer les stats utilisateur
         user_stats = performance_service.calculate_user_performance(current_user.id)
@@ -100,17 +107,16 @@ async def analytics_dashboard(
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du chargement de la page analytics: {str(e)}")
-    finally:
-        performance_service.close()
 
 @router.post("/stats/activity")
-async def log_user_activity(
+@db_endpoint
+def log_user_activity(
     activity_data: dict,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
 ):
     """API pour enregistrer une activité utilisateur"""
-    performance_service = get_performance_service()
+    performance_service = get_performance_service(db)
     try:
         activity_type = activity_data.get("type", "unknown")
         data = activity_data.get("data", {})
@@ -120,71 +126,61 @@ async def log_user_activity(
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'enregistrement de l'activité: {str(e)}")
-    finally:
-        performance_service.close()
+
+@router.get("/stats/activity/queue")
+@db_endpoint
+def get_activity_queue_stats(
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
+):
+    """État de la file du journal d'activité : attente, écrits, abandonnés (admin only)"""
+    if not is_admin(current_user, db):
+        raise HTTPException(status_code=403, detail="Accès refusé - Droits administrateur requis")
+    return {"success": True, "data": activity_logger.metrics()}
 
 @router.get("/stats/leaderboard")
-async def get_leaderboard(
+@cached_response("sessions", per_user=False)
+@db_endpoint
+def get_leaderboard(
     quiz_type: str = "all",  # "quiz", "ai_quiz", "all"
+    window: str = "all",  # "week", "month", "all"
     limit: int = 10,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    offset: int = 0,
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
 ):
-    """API pour récupérer le classement des utilisateurs"""
-    if limit > 50:
-        limit = 50  # Limite maximum
+    """API pour récupérer le classement des utilisateurs (paginé)"""
+    _check_leaderboard_params(quiz_type, window)
+    limit = max(1, min(limit, LEADERBOARD_MAX_PAGE))
+    offset = max(0, offset)
     
-    performance_service = get_performance_service()
-    try:
-        system_stats = performance_service.get_system_performance_stats()
-        leaderboard = system_stats.get("leaderboard", {})
-        
-        if quiz_type == "quiz":
-            result = leaderboard.get("top_quiz_users", [])[:limit]
-        elif quiz_type == "ai_quiz":
-            result = leaderboard.get("top_ai_users", [])[:limit]
-        else:
-            # Combiner les deux classements
-            quiz_users = leaderboard.get("top_quiz_users", [])
-            ai_users = leaderboard.get("top_ai_users", [])
-            
-            # Créer un classement combiné (simplifié)
-            combined = {}
-            for user in quiz_users:
-                combined[user["username"]] = {
-                    "username": user["username"],
-                    "quiz_score": user["avg_score"],
-                    "quiz_sessions": user["sessions"],
-                    "ai_score": 0,
-                    "ai_sessions": 0
-                }
-            
-            for user in ai_users:
-                if user["username"] in combined:
-                    combined[user["username"]]["ai_score"] = user["avg_score"]
-                    combined[user["username"]]["ai_sessions"] = user["sessions"]
-                else:
-                    combined[user["username"]] = {
-                        "username": user["username"],
-                        "quiz_score": 0,
-                        "quiz_sessions": 0,
-                        "ai_score": user["avg_score"],
-                        "ai_sessions": user["sessions"]
-                    }
-            
-            # Calculer un score global et trier
-            for username in combined:
-                user_data = combined[username]
-                total_score = user_data["quiz_score"] + user_data["ai_score"]
-                total_sessions = user_data["quiz_sessions"] + user_data["ai_sessions"]
-                user_data["total_score"] = total_score
-                user_data["total_sessions"] = total_sessions
-            
-            result = sorted(combined.values(), key=lambda x: x["total_score"], reverse=True)[:limit]
-        
-        return {"success": True, "data": result, "type": quiz_type}
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du classement: {str(e)}")
-    finally:
-        performance_service.close()
+    board = leaderboard_engine.page(db, quiz_type, window, offset, limit)
+    return {
+        "success": True,
+        "data": board["entries"],
+        "type": quiz_type,
+        "window": window,
+        "total": board["total"],
+        "offset": offset,
+        "limit": limit
+    }
+
+@router.get("/stats/leaderboard/me")
+@cached_response("sessions")
+@db_endpoint
+def get_my_leaderboard_rank(
+    quiz_type: str = "all",
+    window: str = "all",
+    current_user: User = Depends(get_request_user),
+    db: Session = Depends(get_request_db)
+):
+    """API pour récupérer le rang de l'utilisateur connecté"""
+    _check_leaderboard_params(quiz_type, window)
+    rank = leaderboard_engine.my_rank(db, quiz_type, window, current_user.id)
+    return {"success": True, "data": rank, "type": quiz_type, "window": window}
+
+def _check_leaderboard_params(quiz_type: str, window: str):
+    if quiz_type not in MODES:
+        raise HTTPException(status_code=400, detail=f"Type de classement inconnu: {quiz_type}")
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Période inconnue: {window}")
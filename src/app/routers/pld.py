@@ -3,69 +3,65 @@ Endpoints publics pour le système PLD (Peer Learning Day)
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, insert, update
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
 import json
+from datetime import datetime
 
-from app.database import get_db
+from app.database import get_request_db, run_db, db_endpoint
 from app.models import PLDCategory, PLDTheme, PLDQuestion, User, AIQuizSession, AIQuizAnswer
 from app.schemas import (
     PLDCategory as PLDCategorySchema, 
     PLDTheme as PLDThemeSchema,
-    PLDQuestion as PLDQuestionSchema
+    PLDQuestion as PLDQuestionSchema,
+    PLDAnswerBatchSubmission
 )
-from app.auth import get_current_active_user
-from app.ai_feedback import ai_feedback_generator
+from app.auth import get_request_user
+from app.pld_catalog import pld_catalog
+from app.response_cache import cached_response
+from app.grading_executor import grading_executor
+from app.performance_rollups import record_ai_quiz_completion
 
 router = APIRouter(prefix="/pld", tags=["pld"])
 
+# Nombre maximum de réponses acceptées par soumission groupée
+MAX_BATCH_ANSWERS = 100
+
 # ================================
 # ROUTES PUBLIQUES PLD
 # ================================
 
 @router.get("/categories")
-async def get_public_categories(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+@cached_response("pld_catalog", per_user=False)
+@db_endpoint
+def get_public_categories(
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupérer toutes les catégories disponibles pour l'utilisateur"""
-    categories = db.query(PLDCategory).all()
-    
-    categories_data = []
-    for category in categories:
-        # Compter le nombre de questions dans cette catégorie
-        question_count = db.query(PLDQuestion).join(PLDTheme).filter(
-            PLDTheme.category_id == category.id
-        ).count()
-        
-        categories_data.append({
-            'id': category.id,
-            'name': category.name,
-            'display_name': category.display_name,
-            'description': category.description,
-            'icon': category.icon,
-            'question_count': question_count
-        })
-    
+    categories_data = pld_catalog.snapshot(db).categories()
     return {"categories": categories_data}
 
 
 @router.get("/categories/{category_name}/themes")
-async def get_category_themes(
+@cached_response("pld_catalog", per_user=False)
+@db_endpoint
+def get_category_themes(
     category_name: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupérer tous les thèmes d'une catégorie"""
-    category = db.query(PLDCategory).filter(PLDCategory.name == category_name).first()
+    catalog = pld_catalog.snapshot(db)
     
-    if not category:
+    if not catalog.get_category(category_name):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Catégorie '{category_name}' non trouvée"
         )
     
-    themes = db.query(PLDTheme).filter(PLDTheme.category_id == category.id).all()
+    themes = catalog.themes(category_name)
     
     if not themes:
         # Retourner 204 No Content si aucun thème
@@ -74,40 +70,52 @@ async def get_category_themes(
     
     themes_data = []
     for theme in themes:
-        # Compter les questions de ce thème
-        question_count = db.query(PLDQuestion).filter(PLDQuestion.theme_id == theme.id).count()
-        
         themes_data.append({
-            'id': theme.id,
-            'name': theme.name,
-            'display_name': theme.display_name,
-            'description': theme.description,
-            'icon': theme.icon,
-            'question_count': question_count
+            'id': theme['id'],
+            'name': theme['name'],
+            'display_name': theme['display_name'],
+            'description': theme['description'],
+            'icon': theme['icon'],
+            'question_count': theme['question_count']
         })
     
     return {"themes": themes_data}
 
 
+def _format_question(question: Dict) -> Dict:
+    """Formate une question du catalogue pour les endpoints publics"""
+    return {
+        'question_id': question['question_id'],
+        'question_text': question['question_text'],
+        'expected_answer': question['expected_answer'],
+        'explanation': question['explanation'],
+        'difficulty': question['difficulty'],
+        'max_score': question['max_score'],
+        'technical_terms': question['technical_terms'],
+        'theme_name': question['theme'],
+        'theme_display_name': question['theme_display_name']
+    }
+
+
 @router.get("/questions/{category_name}")
-async def get_category_questions(
+@cached_response("pld_catalog", per_user=False)
+@db_endpoint
+def get_category_questions(
     category_name: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupérer toutes les questions d'une catégorie"""
-    category = db.query(PLDCategory).filter(PLDCategory.name == category_name).first()
+    catalog = pld_catalog.snapshot(db)
     
-    if not category:
+    if not catalog.get_category(category_name):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Catégorie '{category_name}' non trouvée"
         )
     
     # Récupérer toutes les questions de cette catégorie
-    questions = db.query(PLDQuestion).join(PLDTheme).filter(
-        PLDTheme.category_id == category.id
-    ).all()
+    questions = catalog.questions(category=category_name)
     
     if not questions:
         raise HTTPException(
@@ -115,58 +123,35 @@ async def get_category_questions(
             detail=f"Aucune question trouvée pour la catégorie '{category_name}'"
         )
     
-    questions_data = []
-    for question in questions:
-        # Parser les termes techniques depuis JSON
-        try:
-            technical_terms = json.loads(question.technical_terms) if question.technical_terms else []
-        except (json.JSONDecodeError, TypeError):
-            technical_terms = []
-        
-        questions_data.append({
-            'question_id': question.id,
-            'question_text': question.question_text,
-            'expected_answer': question.expected_answer,
-            'explanation': question.explanation,
-            'difficulty': question.difficulty,
-            'max_score': question.max_score,
-            'technical_terms': technical_terms,
-            'theme_name': question.theme.name,
-            'theme_display_name': question.theme.display_name
-        })
-    
-    return {"questions": questions_data}
+    return {"questions": [_format_question(q) for q in questions]}
 
 
 @router.get("/questions/{category_name}/{theme_name}")
-async def get_theme_questions(
+@cached_response("pld_catalog", per_user=False)
+@db_endpoint
+def get_theme_questions(
     category_name: str,
     theme_name: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupérer toutes les questions d'un thème spécifique"""
-    category = db.query(PLDCategory).filter(PLDCategory.name == category_name).first()
+    catalog = pld_catalog.snapshot(db)
     
-    if not category:
+    if not catalog.get_category(category_name):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Catégorie '{category_name}' non trouvée"
         )
     
-    theme = db.query(PLDTheme).filter(
-        PLDTheme.name == theme_name,
-        PLDTheme.category_id == category.id
-    ).first()
-    
-    if not theme:
+    if not catalog.get_theme(category_name, theme_name):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Thème '{theme_name}' non trouvé dans la catégorie '{category_name}'"
         )
     
     # Récupérer toutes les questions de ce thème
-    questions = db.query(PLDQuestion).filter(PLDQuestion.theme_id == theme.id).all()
+    questions = catalog.questions(category=category_name, theme=theme_name)
     
     if not questions:
         raise HTTPException(
@@ -174,27 +159,7 @@ async def get_theme_questions(
             detail=f"Aucune question trouvée pour le thème '{theme_name}'"
         )
     
-    questions_data = []
-    for question in questions:
-        # Parser les termes techniques depuis JSON
-        try:
-            technical_terms = json.loads(question.technical_terms) if question.technical_terms else []
-        except (json.JSONDecodeError, TypeError):
-            technical_terms = []
-        
-        questions_data.append({
-            'question_id': question.id,
-            'question_text': question.question_text,
-            'expected_answer': question.expected_answer,
-            'explanation': question.explanation,
-            'difficulty': question.difficulty,
-            'max_score': question.max_score,
-            'technical_terms': technical_terms,
-            'theme_name': theme.name,
-            'theme_display_name': theme.display_name
-        })
-    
-    return {"questions": questions_data}
+    return {"questions": [_format_question(q) for q in questions]}
 
 
 # ================================
@@ -202,9 +167,10 @@ async def get_theme_questions(
 # ================================
 
 @router.post("/start")
-async def start_pld_session(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+@db_endpoint
+def start_pld_session(
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Démarrer une nouvelle session PLD"""
     # Créer une nouvelle session AI Quiz (réutiliser le même système)
@@ -226,8 +192,8 @@ async def start_pld_session(
 @router.post("/submit-answer")
 async def submit_pld_answer(
     answer_data: dict,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Soumettre une réponse pour évaluation"""
     
@@ -242,10 +208,7 @@ async def submit_pld_answer(
         )
     
     # Vérifier que la session appartient à l'utilisateur
-    session = db.query(AIQuizSession).filter(
-        AIQuizSession.id == session_id,
-        AIQuizSession.user_id == current_user.id
-    ).first()
+    session = await run_db(db, get_user_session_db, session_id, current_user.id)
     
     if not session:
         raise HTTPException(
@@ -253,8 +216,9 @@ async def submit_pld_answer(
             detail="Session non trouvée"
         )
     
-    # Récupérer la question
-    question = db.query(PLDQuestion).filter(PLDQuestion.id == question_id).first()
+    # Récupérer la question depuis le catalogue
+    catalog = await run_db(db, pld_catalog.snapshot)
+    question = catalog.get_question(question_id)
     
     if not question:
         raise HTTPException(
@@ -262,60 +226,87 @@ async def submit_pld_answer(
             detail="Question non trouvée"
         )
     
-    # Calculer le score (logique simplifiée pour l'instant)
-    score = calculate_answer_score(user_answer, question)
-    
-    # Générer un feedback intelligent avec l'IA
-    try:
-        # Parser les termes techniques
-        technical_terms = json.loads(question.technical_terms) if question.technical_terms else []
-    except (json.JSONDecodeError, TypeError):
-        technical_terms = []
-    
-    # Générer le feedback IA
-    ai_feedback = ai_feedback_generator.generate_intelligent_feedback(
-        user_answer=user_answer,
-        question_text=question.question_text,
-        expected_answer=question.expected_answer,
-        technical_terms=technical_terms,
-        score=score,
-        max_score=question.max_score or 100
-    )
+    # Calculer le score et générer le feedback IA (dans le pool de correction)
+    result = await grading_executor.grade_pld_answer(question, user_answer)
+    
+    # Sauvegarder la réponse et mettre à jour le score de la session
+    await run_db(db, save_answers_db, session, [build_answer_row(session_id, question, user_answer, result)])
     
-    # Formater le feedback pour l'affichage
-    formatted_feedback = ai_feedback_generator.format_feedback_for_display(ai_feedback)
-    
-    # Sauvegarder la réponse
-    answer = AIQuizAnswer(
-        session_id=session_id,
-        question_id=question_id,
-        question_text=question.question_text,
-        user_answer=user_answer,
-        expected_answer=question.expected_answer,
-        score=score,
-        max_score=question.max_score or 100,
-        percentage=(score / (question.max_score or 100)) * 100,
-        similarity=0.0,  # Pour l'instant, pas de calcul de similarité
-        feedback=ai_feedback.get('feedback_principal', 'Réponse évaluée automatiquement')
+    return result
+
+
+@router.post("/sessions/{session_id}/answers:batch")
+async def submit_pld_answers_batch(
+    session_id: int,
+    batch: PLDAnswerBatchSubmission,
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
+):
+    """
+    Soumettre plusieurs réponses d'une session PLD en une seule requête.
+    Les réponses valides sont corrigées puis insérées en un seul INSERT ;
+    le résultat est renvoyé réponse par réponse, dans l'ordre reçu.
+    """
+    if len(batch.answers) > MAX_BATCH_ANSWERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {MAX_BATCH_ANSWERS} réponses par lot"
+        )
+    
+    # Vérifier que la session appartient à l'utilisateur
+    session = await run_db(db, get_user_session_db, session_id, current_user.id)
+    
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session non trouvée"
+        )
+    
+    catalog = await run_db(db, pld_catalog.snapshot)
+    results = []
+    to_grade = []
+    
+    for item in batch.answers:
+        question = catalog.get_question(item.question_id)
+        if not question:
+            results.append({"question_id": item.question_id, "error": "Question non trouvée"})
+            continue
+        if not item.user_answer or not item.user_answer.strip():
+            results.append({"question_id": item.question_id, "error": "user_answer est requis"})
+            continue
+        
+        # Emplacement réservé, rempli une fois la correction terminée
+        results.append(None)
+        to_grade.append((len(results) - 1, question, item.user_answer))
+    
+    # Correction parallèle de tout le lot dans le pool de correction
+    graded = await grading_executor.grade_pld_answers(
+        [(question, user_answer) for _, question, user_answer in to_grade]
     )
-    db.add(answer)
-    db.commit()
+    
+    rows = []
+    for (index, question, user_answer), result in zip(to_grade, graded):
+        rows.append(build_answer_row(session_id, question, user_answer, result))
+        results[index] = {"question_id": question["question_id"], **result}
+    
+    total_score = session.total_score
+    if rows:
+        total_score = await run_db(db, save_answers_db, session, rows)
     
     return {
-        "score": score,
-        "max_score": question.max_score or 100,
-        "percentage": (score / (question.max_score or 100)) * 100 if (question.max_score or 100) > 0 else 0,
-        "feedback": formatted_feedback,
-        "ai_feedback": ai_feedback,  # Feedback structuré pour le frontend
-        "expected_answer": question.expected_answer  # On peut garder la réponse attendue pour référence
+        "session_id": session_id,
+        "graded": len(rows),
+        "total_score": total_score,
+        "results": results
     }
 
 
 @router.post("/complete")
-async def complete_pld_session(
+@db_endpoint
+def complete_pld_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Marquer une session PLD comme terminée"""
     session = db.query(AIQuizSession).filter(
@@ -329,8 +320,11 @@ async def complete_pld_session(
             detail="Session non trouvée"
         )
     
-    # Marquer comme terminée
-    session.completed = True
+    # Marquer comme terminée (une seule fois dans les agrégats)
+    if not session.completed:
+        session.completed = True
+        session.completed_at = datetime.utcnow()
+        record_ai_quiz_completion(db, session)
     db.commit()
     
     return {"message": "Session PLD terminée avec succès"}
@@ -340,36 +334,43 @@ async def complete_pld_session(
 # FONCTIONS UTILITAIRES
 # ================================
 
-def calculate_answer_score(user_answer: str, question: PLDQuestion) -> float:
+def build_answer_row(session_id: int, question: Dict, user_answer: str, result: Dict) -> Dict:
+    """Colonnes `AIQuizAnswer` d'une réponse corrigée par `grade_pld_answer`"""
+    return {
+        "session_id": session_id,
+        "question_id": question["question_id"],
+        "question_text": question["question_text"],
+        "user_answer": user_answer,
+        "expected_answer": question["expected_answer"],
+        "score": result["score"],
+        "max_score": result["max_score"],
+        "percentage": result["percentage"],
+        "similarity": 0.0,  # Pour l'instant, pas de calcul de similarité
+        "feedback": result["ai_feedback"].get('feedback_principal', 'Réponse évaluée automatiquement')
+    }
+
+
+def get_user_session_db(db: Session, session_id: int, user_id: int) -> Optional[AIQuizSession]:
+    """Session PLD appartenant à l'utilisateur"""
+    return db.query(AIQuizSession).filter(
+        AIQuizSession.id == session_id,
+        AIQuizSession.user_id == user_id
+    ).first()
+
+
+def save_answers_db(db: Session, session: AIQuizSession, rows: List[Dict]) -> float:
     """
-    Calculer le score d'une réponse utilisateur
-    (Logique simplifiée - peut être améliorée)
+    Insère les réponses corrigées en un seul INSERT et ajoute leurs points au
+    score de la session ; renvoie le nouveau score
     """
-    if not user_answer or not question.expected_answer:
-        return 0.0
-    
-    user_answer_lower = user_answer.lower().strip()
-    expected_answer_lower = question.expected_answer.lower().strip()
-    
-    # Score basé sur la longueur relative et la présence de mots-clés
-    base_score = question.max_score * 0.3  # Score de base pour avoir essayé
-    
-    # Bonus pour la longueur (encourager les réponses détaillées)
-    if len(user_answer) >= 50:
-        base_score += question.max_score * 0.2
-    
-    # Bonus pour les termes techniques
-    try:
-        technical_terms = json.loads(question.technical_terms) if question.technical_terms else []
-        terms_found = sum(1 for term in technical_terms if term.lower() in user_answer_lower)
-        if terms_found > 0:
-            base_score += (terms_found / len(technical_terms)) * question.max_score * 0.3
-    except (json.JSONDecodeError, TypeError):
-        pass
-    
-    # Bonus pour similarité avec la réponse attendue
-    common_words = set(user_answer_lower.split()) & set(expected_answer_lower.split())
-    if common_words:
-        base_score += len(common_words) / len(expected_answer_lower.split()) * question.max_score * 0.2
-    
-    return min(base_score, question.max_score)
+    db.execute(insert(AIQuizAnswer), rows)
+    # Incrément en SQL : deux requêtes simultanées sur la session ne perdent aucun point
+    total_score = db.execute(
+        update(AIQuizSession)
+        .where(AIQuizSession.id == session.id)
+        .values(total_score=func.coalesce(AIQuizSession.total_score, 0) + sum(row["score"] for row in rows))
+        .returning(AIQuizSession.total_score)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+    db.commit()
+    return total_score
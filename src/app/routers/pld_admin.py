@@ -2,12 +2,14 @@
 Endpoints d'administration pour la gestion des questions PLD
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from datetime import datetime
 import json
 
-from app.database import get_db
+from app.database import get_db, pool_stats
 from app.models import PLDCategory, PLDTheme, PLDQuestion, User
 from app.schemas import (
     PLDCategoryCreate, PLDCategory as PLDCategorySchema, PLDCategoryWithThemes,
@@ -15,6 +17,11 @@ from app.schemas import (
     PLDQuestionCreate, PLDQuestion as PLDQuestionSchema
 )
 from app.auth import get_current_active_user
+from app.pld_catalog import pld_catalog
+from app.grading_executor import grading_executor
+from app.execution_pool import execution_pool
+from app.exercise_runner import exercise_runner
+from app.exports import FORMATS, stream_questions, stream_ai_answers, stream_activities
 
 router = APIRouter(prefix="/admin", tags=["pld-admin"])
 
@@ -37,7 +44,8 @@ async def get_all_categories(
     admin_user: User = Depends(admin_required)
 ):
     """Récupérer toutes les catégories avec leurs thèmes"""
-    categories = db.query(PLDCategory).all()
+    # Thèmes chargés en une requête IN, pas une par catégorie
+    categories = db.query(PLDCategory).options(selectinload(PLDCategory.themes)).all()
     return categories
 
 @router.post("/categories", response_model=PLDCategorySchema)
@@ -58,6 +66,7 @@ async def create_category(
     db_category = PLDCategory(**category.dict())
     db.add(db_category)
     db.commit()
+    pld_catalog.invalidate()
     db.refresh(db_category)
     return db_category
 
@@ -80,6 +89,7 @@ async def update_category(
         setattr(db_category, key, value)
     
     db.commit()
+    pld_catalog.invalidate()
     db.refresh(db_category)
     return db_category
 
@@ -99,6 +109,7 @@ async def delete_category(
     
     db.delete(db_category)
     db.commit()
+    pld_catalog.invalidate()
     return {"message": "Catégorie supprimée avec succès"}
 
 # ================================
@@ -111,7 +122,7 @@ async def get_all_themes(
     admin_user: User = Depends(admin_required)
 ):
     """Récupérer tous les thèmes avec leurs questions"""
-    themes = db.query(PLDTheme).all()
+    themes = db.query(PLDTheme).options(selectinload(PLDTheme.questions)).all()
     return themes
 
 @router.post("/themes", response_model=PLDThemeSchema)
@@ -132,6 +143,7 @@ async def create_theme(
     db_theme = PLDTheme(**theme.dict())
     db.add(db_theme)
     db.commit()
+    pld_catalog.invalidate()
     db.refresh(db_theme)
     return db_theme
 
@@ -154,6 +166,7 @@ async def update_theme(
         setattr(db_theme, key, value)
     
     db.commit()
+    pld_catalog.invalidate()
     db.refresh(db_theme)
     return db_theme
 
@@ -173,6 +186,7 @@ async def delete_theme(
     
     db.delete(db_theme)
     db.commit()
+    pld_catalog.invalidate()
     return {"message": "Thème supprimé avec succès"}
 
 # ================================
@@ -210,6 +224,7 @@ async def create_question(
     db_question = PLDQuestion(**question_data)
     db.add(db_question)
     db.commit()
+    pld_catalog.invalidate()
     db.refresh(db_question)
     return db_question
 
@@ -236,6 +251,7 @@ async def update_question(
         setattr(db_question, key, value)
     
     db.commit()
+    pld_catalog.invalidate()
     db.refresh(db_question)
     return db_question
 
@@ -255,6 +271,7 @@ async def delete_question(
     
     db.delete(db_question)
     db.commit()
+    pld_catalog.invalidate()
     return {"message": "Question supprimée avec succès"}
 
 # ================================
@@ -317,6 +334,7 @@ async def import_questions_from_json(
                     imported_count += 1
         
         db.commit()
+        pld_catalog.invalidate()
         return {"message": f"{imported_count} questions importées avec succès"}
         
     except Exception as e:
@@ -332,7 +350,9 @@ async def export_questions(
     admin_user: User = Depends(admin_required)
 ):
     """Exporter toutes les questions au format JSON"""
-    categories = db.query(PLDCategory).all()
+    categories = db.query(PLDCategory).options(
+        selectinload(PLDCategory.themes).selectinload(PLDTheme.questions)
+    ).all()
     export_data = {}
     
     for category in categories:
@@ -353,3 +373,76 @@ async def export_questions(
                 }
     
     return export_data
+
+# ================================
+# EXPORTS EN FLUX
+# ================================
+
+def _streaming_export(rows, fmt: str, name: str) -> StreamingResponse:
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Format inconnu: {fmt} (attendu: {', '.join(FORMATS)})"
+        )
+    extension = "ndjson" if fmt == "ndjson" else "json"
+    return StreamingResponse(
+        rows(fmt),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    )
+
+@router.get("/export/questions")
+async def export_questions_stream(
+    format: str = Query("ndjson", description="ndjson | json"),
+    admin_user: User = Depends(admin_required)
+):
+    """Exporter le catalogue PLD en flux (une question par ligne en ndjson)"""
+    return _streaming_export(stream_questions, format, "pld_questions")
+
+@router.get("/export/ai-answers")
+async def export_ai_answers_stream(
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    format: str = Query("ndjson", description="ndjson | json"),
+    admin_user: User = Depends(admin_required)
+):
+    """Exporter l'historique des réponses PLD/IA en flux"""
+    return _streaming_export(lambda fmt: stream_ai_answers(fmt, user_id, since), format, "ai_answers")
+
+@router.get("/export/activities")
+async def export_activities_stream(
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    format: str = Query("ndjson", description="ndjson | json"),
+    admin_user: User = Depends(admin_required)
+):
+    """Exporter le journal d'activité en flux"""
+    return _streaming_export(lambda fmt: stream_activities(fmt, user_id, since), format, "activities")
+
+@router.get("/grading/metrics")
+async def get_grading_metrics(
+    admin_user: User = Depends(admin_required)
+):
+    """Métriques du pool de correction (file d'attente, latences)"""
+    return grading_executor.metrics()
+
+@router.get("/execution/metrics")
+async def get_execution_metrics(
+    admin_user: User = Depends(admin_required)
+):
+    """Métriques du pool d'exécution du code utilisateur (file, limites, latences)"""
+    return execution_pool.metrics()
+
+@router.get("/exercises/metrics")
+async def get_exercise_metrics(
+    admin_user: User = Depends(admin_required)
+):
+    """Métriques de la correction des exercices du Coding Lab (pool, arrêts anticipés, cache)"""
+    return exercise_runner.metrics()
+
+@router.get("/database/pool")
+async def get_database_pool_stats(
+    admin_user: User = Depends(admin_required)
+):
+    """Statistiques du pool de connexions (taille, connexions empruntées, overflow)"""
+    return pool_stats()
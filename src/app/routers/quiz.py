@@ -1,14 +1,26 @@
 __all__ = ["router", "get_site_stats"]
-from app.auth import get_current_active_user
+from app.auth import get_request_user
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import case, func
+from typing import List, Optional
 import random
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_request_db, run_db, db_endpoint
 from app.models import User, Question, QuizSession, QuizAnswer
+from app.performance_rollups import record_quiz_completion, reset_quiz_rollup, get_user_rollup, current_streak
+from app.profile_stats import profile_stats
+from app.response_cache import cached_response, queue_invalidation, response_cache
+from app.site_counters import site_counters, queue_delta
+from app.question_sampler import question_sampler
+from app.quiz_session_cache import (
+    QUIZ_SESSION_CACHE,
+    quiz_session_cache,
+    QuizSessionNotFound,
+    QuestionNotFound,
+    AnswerAlreadySubmitted
+)
 from app.schemas import (
     Question as QuestionSchema, 
     QuestionCreate, 
@@ -21,88 +33,82 @@ from app.schemas import (
 router = APIRouter()
 
 @router.get("/stats")
-def get_site_stats(db: Session = Depends(get_db)):
-    questions_count = db.query(Question).count()
-    users_count = db.query(User).count()
-    # Satisfaction = % de bonnes réponses sur toutes les réponses
-    total_answers = db.query(QuizAnswer).count()
-    correct_answers = db.query(QuizAnswer).filter(QuizAnswer.is_correct == True).count()
-    satisfaction = round((correct_answers / total_answers) * 100, 2) if total_answers > 0 else 0.0
-    return {
-        "questions": questions_count,
-        "users": users_count,
-        "satisfaction": satisfaction
-    }
+@cached_response("quiz_stats", per_user=False)
+async def get_site_stats():
+    """Statistiques publiques du site (compteurs en mémoire, sans requête)"""
+    return site_counters.stats()
 
 @router.get("/questions", response_model=List[QuestionSchema])
-async def get_quiz_questions(
+@db_endpoint
+def get_quiz_questions(
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    category: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    balanced: bool = False,
+    session_id: Optional[int] = None,
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
-    """Récupère un ensemble aléatoire de questions pour le quiz"""
-    total_questions = db.query(Question).count()
-    if total_questions < limit:
-        limit = total_questions
-    
-    # Sélectionner des questions aléatoires
-    questions = db.query(Question).order_by(func.random()).limit(limit).all()
+    """
+    Récupère un ensemble aléatoire de questions pour le quiz
+    (balanced=true : même nombre de questions par difficulté ;
+    session_id : questions gardées avec la session en mode haut débit)
+    """
+    questions = question_sampler.draw(db, max(0, limit), category, difficulty, balanced)
+    if QUIZ_SESSION_CACHE and session_id is not None:
+        try:
+            quiz_session_cache.remember_questions(db, session_id, current_user.id, questions)
+        except QuizSessionNotFound:
+            raise HTTPException(
+                status_code=404,
+                detail="Quiz session not found or already completed"
+            )
     return questions
 
 @router.get("/user/stats")
-async def get_user_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+@db_endpoint
+def get_user_stats(
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupère les statistiques de l'utilisateur pour le dashboard"""
-    # Compter les sessions complétées
-    completed_sessions = db.query(QuizSession).filter(
+    # Sessions complétées : nombre, moyenne et meilleur des pourcentages (une requête)
+    percentage = case(
+        (QuizSession.total_questions > 0, QuizSession.score * 100.0 / QuizSession.total_questions)
+    )
+    total_quizzes, average_score, best_score = db.query(
+        func.count(QuizSession.id), func.avg(percentage), func.max(percentage)
+    ).filter(
         QuizSession.user_id == current_user.id,
         QuizSession.completed == True
-    ).all()
+    ).one()
     
-    total_quizzes = len(completed_sessions)
+    # Série de jours d'activité (agrégats utilisateur)
+    rollup = get_user_rollup(db, current_user.id)
     
     if total_quizzes == 0:
         return {
             "total_quizzes": 0,
             "average_score": 0,
             "best_score": 0,
-            "current_streak": 0
+            "current_streak": current_streak(rollup),
+            "best_streak": rollup.best_streak_days or 0
         }
     
-    # Calculer les scores
-    scores = []
-    for session in completed_sessions:
-        if session.total_questions > 0:
-            percentage = (session.score / session.total_questions) * 100
-            scores.append(percentage)
-    
-    average_score = sum(scores) / len(scores) if scores else 0
-    best_score = max(scores) if scores else 0
-    
-    # Calculer la série actuelle (simplifiée - dernières sessions consécutives avec score > 70%)
-    current_streak = 0
-    for session in reversed(completed_sessions[-10:]):  # Regarder les 10 dernières
-        if session.total_questions > 0:
-            percentage = (session.score / session.total_questions) * 100
-            if percentage >= 70:  # Considérer comme réussite si > 70%
-                current_streak += 1
-            else:
-                break
-    
     return {
         "total_quizzes": total_quizzes,
-        "average_score": round(average_score, 1),
-        "best_score": round(best_score, 1),
-        "current_streak": current_streak
+        "average_score": round(float(average_score or 0), 1),
+        "best_score": round(float(best_score or 0), 1),
+        "current_streak": current_streak(rollup),
+        "best_streak": rollup.best_streak_days or 0
     }
 
 @router.get("/user/recent")
-async def get_user_recent_sessions(
+@db_endpoint
+def get_user_recent_sessions(
     limit: int = 5,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupère les sessions récentes de l'utilisateur"""
     sessions = db.query(QuizSession).filter(
@@ -123,9 +129,10 @@ async def get_user_recent_sessions(
     return result
 
 @router.post("/user/reset")
-async def reset_user_progress(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+@db_endpoint
+def reset_user_progress(
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Réinitialise la progression de l'utilisateur"""
     # Supprimer toutes les réponses de l'utilisateur
@@ -133,19 +140,32 @@ async def reset_user_progress(
     session_ids = [session.id for session in user_sessions]
     
     if session_ids:
+        # Oublier les réponses encore en mémoire (mode haut débit)
+        quiz_session_cache.forget_user(current_user.id)
+        # Retirer les réponses supprimées des compteurs du site
+        answers, correct = db.query(
+            func.count(QuizAnswer.id),
+            func.count(QuizAnswer.id).filter(QuizAnswer.is_correct == True)
+        ).filter(QuizAnswer.session_id.in_(session_ids)).one()
+        queue_delta(db, answers=-answers, correct_answers=-correct)
         # Supprimer les réponses
         db.query(QuizAnswer).filter(QuizAnswer.session_id.in_(session_ids)).delete(synchronize_session=False)
         # Supprimer les sessions
         db.query(QuizSession).filter(QuizSession.user_id == current_user.id).delete(synchronize_session=False)
+        # Agrégats et classement sans les sessions supprimées
+        reset_quiz_rollup(db, current_user.id)
     
     db.commit()
+    profile_stats.invalidate(current_user.id)
+    response_cache.invalidate("quiz_stats", "sessions", f"user:{current_user.id}")
     
     return {"message": "Progression réinitialisée avec succès"}
 
 @router.get("/sessions/active", response_model=QuizSessionSchema)
-async def get_active_quiz_session(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+@db_endpoint
+def get_active_quiz_session(
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Récupère la session de quiz active de l'utilisateur"""
     active_session = db.query(QuizSession).filter(
@@ -159,15 +179,47 @@ async def get_active_quiz_session(
             detail="No active quiz session found"
         )
     
+    if QUIZ_SESSION_CACHE:
+        # Score incluant les réponses pas encore écrites
+        result = QuizSessionSchema.model_validate(active_session)
+        cached_score = quiz_session_cache.current_score(active_session.id)
+        if cached_score is not None:
+            result.score = cached_score
+        return result
     return active_session
 
 @router.post("/start", response_model=QuizSessionSchema)
 async def start_quiz_session(
     force_new: bool = False,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Démarre une nouvelle session de quiz"""
+    closed_id = None
+    if force_new and QUIZ_SESSION_CACHE:
+        # Session remplacée fermée aux réponses, lots en cours attendus hors de la boucle
+        closed_id = await run_db(db, _close_active_cached_session, current_user.id)
+        if closed_id is not None:
+            await quiz_session_cache.wait_flushed([closed_id])
+    try:
+        return await run_db(db, _start_quiz_session_db, force_new, current_user)
+    except BaseException:
+        if closed_id is not None:
+            quiz_session_cache.reopen(closed_id)
+        raise
+
+
+def _close_active_cached_session(db: Session, user_id: int) -> Optional[int]:
+    active_id = db.query(QuizSession.id).filter(
+        QuizSession.user_id == user_id,
+        QuizSession.completed == False
+    ).scalar()
+    if active_id is not None:
+        quiz_session_cache.close(db, active_id, user_id)
+    return active_id
+
+
+def _start_quiz_session_db(db: Session, force_new: bool, current_user: User):
     # Vérifier s'il y a une session active
     active_session = db.query(QuizSession).filter(
         QuizSession.user_id == current_user.id,
@@ -179,8 +231,13 @@ async def start_quiz_session(
         return active_session
     elif active_session and force_new:
         # Marquer l'ancienne session comme complétée
+        if QUIZ_SESSION_CACHE:
+            quiz_session_cache.flush(db, [active_session.id])
+            db.refresh(active_session)
         active_session.completed = True
+        record_quiz_completion(db, active_session)
         db.commit()
+        quiz_session_cache.forget(active_session.id)
     
     # Créer une nouvelle session
     quiz_session = QuizSession(
@@ -193,12 +250,16 @@ async def start_quiz_session(
     return quiz_session
 
 @router.post("/submit-answer")
-async def submit_answer(
+@db_endpoint
+def submit_answer(
     answer_data: QuizAnswerSubmission,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Soumet une réponse pour une question"""
+    if QUIZ_SESSION_CACHE:
+        return _submit_cached_answer(db, answer_data, current_user)
+
     # Vérifier que la session appartient à l'utilisateur
     session = db.query(QuizSession).filter(
         QuizSession.id == answer_data.session_id,
@@ -248,6 +309,7 @@ async def submit_answer(
     if is_correct:
         session.score += 1
     
+    queue_invalidation(db, "quiz_stats")
     db.commit()
     
     return {
@@ -256,13 +318,57 @@ async def submit_answer(
         "explanation": question.explanation
     }
 
+def _submit_cached_answer(db: Session, answer_data: QuizAnswerSubmission, current_user: User):
+    """Mode haut débit : correction en mémoire, écriture par lots"""
+    try:
+        result = quiz_session_cache.submit(
+            db, answer_data.session_id, current_user.id,
+            answer_data.question_id, answer_data.user_answer
+        )
+    except QuizSessionNotFound:
+        raise HTTPException(
+            status_code=404,
+            detail="Quiz session not found or already completed"
+        )
+    except QuestionNotFound:
+        raise HTTPException(
+            status_code=404,
+            detail="Question not found"
+        )
+    except AnswerAlreadySubmitted:
+        raise HTTPException(
+            status_code=400,
+            detail="Answer already submitted for this question"
+        )
+    
+    if quiz_session_cache.should_flush():
+        quiz_session_cache.flush(db)
+    return result
+
 @router.post("/complete/{session_id}", response_model=QuizResult)
 async def complete_quiz(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_request_db),
+    current_user: User = Depends(get_request_user)
 ):
     """Finalise une session de quiz"""
+    if not QUIZ_SESSION_CACHE:
+        return await run_db(db, _complete_quiz_db, session_id, current_user)
+    # Plus aucune réponse acceptée, puis attente des lots en cours hors de la boucle
+    await run_db(db, quiz_session_cache.close, session_id, current_user.id)
+    await quiz_session_cache.wait_flushed([session_id])
+    try:
+        return await run_db(db, _complete_quiz_db, session_id, current_user)
+    except BaseException:
+        quiz_session_cache.reopen(session_id)
+        raise
+
+
+def _complete_quiz_db(db: Session, session_id: int, current_user: User) -> QuizResult:
+    if QUIZ_SESSION_CACHE:
+        # Écrire les réponses en attente avant de relire la session
+        quiz_session_cache.flush(db, [session_id])
+    
     session = db.query(QuizSession).filter(
         QuizSession.id == session_id,
         QuizSession.user_id == current_user.id,
@@ -282,8 +388,10 @@ async def complete_quiz(
     # Récupérer toutes les réponses
     answers = db.query(QuizAnswer).filter(QuizAnswer.session_id == session_id).all()
     session.total_questions = len(answers)
+    record_quiz_completion(db, session)
     
     db.commit()
+    quiz_session_cache.forget(session_id)
     
     # Calculer les résultats
     correct_answers = [a.question_id for a in answers if a.is_correct]
@@ -188,6 +188,13 @@ class PLDQuestion(PLDQuestionBase):
     class Config:
         from_attributes = True
 
+class PLDAnswerBatchItem(BaseModel):
+    question_id: int
+    user_answer: str
+
+class PLDAnswerBatchSubmission(BaseModel):
+    answers: List[PLDAnswerBatchItem]
+
 class PLDCategoryWithThemes(PLDCategory):
     themes: List[PLDTheme] = []
 
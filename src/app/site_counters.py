@@ -0,0 +1,191 @@
+"""
+Compteurs publics du site (questions, utilisateurs, réponses, bonnes réponses)
+
+Les totaux sont gardés en mémoire et mis à jour par les chemins d'écriture
+une fois leur transaction validée : événements ORM sur Question, User et
+QuizAnswer, plus appels explicites pour les écritures groupées (tampon du
+mode quiz haut débit, réinitialisation de progression). `/quiz/stats` lit
+ces compteurs sans requête ; sa réponse en cache ("quiz_stats") est
+invalidée à chaque changement (commit d'un delta, réconciliation qui modifie
+une valeur).
+
+Les compteurs sont recalculés depuis les tables au démarrage puis toutes les
+SITE_COUNTERS_RECONCILE_INTERVAL secondes : écritures des autres workers ou
+des scripts, et dérive éventuelle (les valeurs sont approximatives entre
+deux réconciliations).
+"""
+import asyncio
+import os
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session
+
+from app.database import SessionLocal
+from app.models import Question, User, QuizAnswer
+from app.response_cache import queue_invalidation, response_cache
+
+SITE_COUNTERS_RECONCILE_INTERVAL = int(os.getenv("SITE_COUNTERS_RECONCILE_INTERVAL", "600"))
+
+COUNTERS = ("questions", "users", "answers", "correct_answers")
+
+
+class SiteCounters:
+    """Totaux du site en mémoire, réconciliés périodiquement avec la base"""
+
+    def __init__(self):
+        self._values: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def add(self, **deltas: int):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._values[name] += delta
+
+    def reconcile(self, db: Session) -> Dict[str, int]:
+        """Recalcule les totaux depuis les tables (une requête)"""
+        row = db.execute(select(
+            select(func.count(Question.id)).scalar_subquery(),
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.count(QuizAnswer.id)).scalar_subquery(),
+            select(func.count(QuizAnswer.id)).where(QuizAnswer.is_correct == True).scalar_subquery()
+        )).one()
+        with self._lock:
+            values = dict(zip(COUNTERS, (value or 0 for value in row)))
+            changed = values != self._values
+            self._values = values
+            self._loaded = True
+        if changed:
+            response_cache.invalidate("quiz_stats")
+        return dict(values)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        db = SessionLocal()
+        try:
+            self.reconcile(db)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        """Réponse de `/quiz/stats` : satisfaction = % de bonnes réponses"""
+        self._ensure_loaded()
+        with self._lock:
+            values = dict(self._values)
+        total, correct = values["answers"], values["correct_answers"]
+        return {
+            "questions": values["questions"],
+            "users": values["users"],
+            "satisfaction": round((correct / total) * 100, 2) if total > 0 else 0.0
+        }
+
+
+# Instance globale des compteurs
+site_counters = SiteCounters()
+
+
+# ================================
+# MISE À JOUR APRÈS COMMIT
+# ================================
+
+_PENDING_KEY = "site_counters_pending"
+
+
+def queue_delta(db: Session, **deltas: int):
+    pending = db.info.setdefault(_PENDING_KEY, {})
+    for name, delta in deltas.items():
+        pending[name] = pending.get(name, 0) + delta
+    queue_invalidation(db, "quiz_stats")
+
+
+def _queue_for(target, **deltas: int):
+    session = object_session(target)
+    if session is not None:
+        queue_delta(session, **deltas)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        site_counters.add(**deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+@event.listens_for(Question, "after_insert")
+def _question_inserted(mapper, connection, target):
+    _queue_for(target, questions=1)
+
+
+@event.listens_for(Question, "after_delete")
+def _question_deleted(mapper, connection, target):
+    _queue_for(target, questions=-1)
+
+
+@event.listens_for(User, "after_insert")
+def _user_inserted(mapper, connection, target):
+    _queue_for(target, users=1)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    _queue_for(target, users=-1)
+
+
+@event.listens_for(QuizAnswer, "after_insert")
+def _answer_inserted(mapper, connection, target):
+    _queue_for(target, answers=1, correct_answers=1 if target.is_correct else 0)
+
+
+# ================================
+# TÂCHE DE FOND
+# ================================
+
+def _reconcile_with_new_session() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return site_counters.reconcile(db)
+    finally:
+        db.close()
+
+
+class SiteCountersReconciler:
+    """Réconcilie les compteurs au démarrage puis périodiquement"""
+
+    def __init__(self, interval_seconds: int = SITE_COUNTERS_RECONCILE_INTERVAL):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, _reconcile_with_new_session)
+            except Exception as e:
+                print(f"Erreur réconciliation des compteurs du site: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Instance globale de la tâche de fond
+site_counters_reconciler = SiteCountersReconciler()
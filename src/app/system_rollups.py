@@ -0,0 +1,264 @@
+"""
+Agrégats quotidiens du système (table daily_system_stats)
+
+Chaque journée (UTC, comme les horodatages des sessions écrits avec
+utcnow()) est calculée une fois sur sa plage [minuit, minuit + 1 jour[ puis
+clôturée (`closed = True`) : elle n'est plus jamais recalculée. La
+journée en cours est recalculée périodiquement (sur la seule plage du jour)
+par une tâche de fond. Les tableaux de bord administrateur lisent au plus
+quelques dizaines de lignes au lieu de parcourir les sessions.
+
+Configuration (variables d'environnement) :
+- DAILY_STATS_INTERVAL : période de la tâche de fond en secondes (0 = désactivée)
+- DAILY_STATS_BACKFILL_DAYS : journées passées calculées au premier passage
+
+Exécution manuelle (cron) : python -m app.system_rollups
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, distinct
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import (
+    User, QuizSession, QuizAnswer, AIQuizSession, AIQuizAnswer,
+    UserActivity, UserPerformanceStats, DailySystemStats
+)
+from app.performance_rollups import session_minutes
+
+DAILY_STATS_INTERVAL = int(os.getenv("DAILY_STATS_INTERVAL", "300"))
+DAILY_STATS_BACKFILL_DAYS = int(os.getenv("DAILY_STATS_BACKFILL_DAYS", "30"))
+
+# Nombre minimum de sessions pour figurer dans le top des performances
+TOP_USERS_MIN_SESSIONS = 3
+
+
+def day_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def compute_day(db: Session, day: datetime) -> Dict:
+    """Chiffres d'une journée, filtrés par plage (utilisable avec un index)"""
+    start, end = day, day + timedelta(days=1)
+
+    quiz_completed = db.query(QuizSession.started_at, QuizSession.completed_at, QuizSession.score).filter(
+        QuizSession.completed == True,
+        QuizSession.completed_at >= start,
+        QuizSession.completed_at < end
+    ).all()
+    ai_completed = db.query(AIQuizSession.started_at, AIQuizSession.completed_at, AIQuizSession.total_score).filter(
+        AIQuizSession.completed == True,
+        AIQuizSession.completed_at >= start,
+        AIQuizSession.completed_at < end
+    ).all()
+
+    quiz_score_total = float(sum(row.score or 0 for row in quiz_completed))
+    ai_score_total = float(sum(row.total_score or 0 for row in ai_completed))
+    durations = [session_minutes(row) for row in list(quiz_completed) + list(ai_completed)]
+
+    return {
+        "total_users": db.query(func.count(User.id)).filter(User.created_at < end).scalar() or 0,
+        "active_users_today": db.query(func.count(distinct(UserActivity.user_id))).filter(
+            UserActivity.timestamp >= start, UserActivity.timestamp < end
+        ).scalar() or 0,
+        "new_users_today": db.query(func.count(User.id)).filter(
+            User.created_at >= start, User.created_at < end
+        ).scalar() or 0,
+        "quiz_sessions_today": db.query(func.count(QuizSession.id)).filter(
+            QuizSession.started_at >= start, QuizSession.started_at < end
+        ).scalar() or 0,
+        "ai_quiz_sessions_today": db.query(func.count(AIQuizSession.id)).filter(
+            AIQuizSession.started_at >= start, AIQuizSession.started_at < end
+        ).scalar() or 0,
+        "total_questions_answered": (
+            (db.query(func.count(QuizAnswer.id)).filter(
+                QuizAnswer.answered_at >= start, QuizAnswer.answered_at < end
+            ).scalar() or 0)
+            + (db.query(func.count(AIQuizAnswer.id)).filter(
+                AIQuizAnswer.answered_at >= start, AIQuizAnswer.answered_at < end
+            ).scalar() or 0)
+        ),
+        "quiz_sessions_completed": len(quiz_completed),
+        "ai_quiz_sessions_completed": len(ai_completed),
+        "quiz_score_total": quiz_score_total,
+        "ai_quiz_score_total": ai_score_total,
+        "average_quiz_score": quiz_score_total / len(quiz_completed) if quiz_completed else 0.0,
+        "average_ai_quiz_score": ai_score_total / len(ai_completed) if ai_completed else 0.0,
+        "total_time_spent_minutes": sum(durations),
+        "average_session_duration": sum(durations) / len(durations) if durations else 0.0
+    }
+
+
+def store_day(db: Session, day: datetime, close: bool) -> Optional[DailySystemStats]:
+    """Calcule et enregistre une journée (sans toucher à une journée clôturée)"""
+    row = db.query(DailySystemStats).filter(DailySystemStats.date == day).first()
+    if row is not None and row.closed:
+        return row
+
+    figures = compute_day(db, day)
+    if row is None:
+        row = DailySystemStats(date=day, closed=close, **figures)
+        try:
+            with db.begin_nested():
+                db.add(row)
+        except IntegrityError:
+            # Insérée entre-temps par un autre worker
+            return db.query(DailySystemStats).filter(DailySystemStats.date == day).first()
+    else:
+        for key, value in figures.items():
+            setattr(row, key, value)
+        row.closed = close
+    return row
+
+
+def close_finished_days(db: Session, now: datetime = None) -> int:
+    """Clôture toutes les journées terminées non encore clôturées"""
+    today = day_start(now or datetime.utcnow())
+    last_closed = db.query(DailySystemStats.date).filter(
+        DailySystemStats.closed == True
+    ).order_by(DailySystemStats.date.desc()).first()
+
+    if last_closed is not None:
+        day = day_start(last_closed[0]) + timedelta(days=1)
+    else:
+        day = today - timedelta(days=DAILY_STATS_BACKFILL_DAYS)
+
+    closed = 0
+    while day < today:
+        store_day(db, day, close=True)
+        closed += 1
+        day += timedelta(days=1)
+    db.commit()
+    return closed
+
+
+def refresh_today(db: Session, now: datetime = None) -> DailySystemStats:
+    """Recalcule la journée en cours (plage du jour uniquement)"""
+    row = store_day(db, day_start(now or datetime.utcnow()), close=False)
+    db.commit()
+    return row
+
+
+def run_rollup(db: Session) -> Dict:
+    """Passage complet : clôture des journées terminées puis journée en cours"""
+    closed = close_finished_days(db)
+    refresh_today(db)
+    return {"closed_days": closed}
+
+
+# ================================
+# LECTURE (tableaux de bord)
+# ================================
+
+def _top_users(db: Session, sessions_column, average_column) -> List[Dict]:
+    rows = db.query(User.username, average_column, sessions_column).join(
+        UserPerformanceStats, UserPerformanceStats.user_id == User.id
+    ).filter(
+        sessions_column >= TOP_USERS_MIN_SESSIONS
+    ).order_by(average_column.desc()).limit(5).all()
+    return [
+        {'username': row[0], 'avg_score': float(row[1] or 0), 'sessions': row[2]}
+        for row in rows
+    ]
+
+
+def get_system_overview(db: Session, now: datetime = None) -> Dict:
+    """Statistiques système lues depuis les agrégats quotidiens (30 lignes au plus)"""
+    today = day_start(now or datetime.utcnow())
+    month_start = today - timedelta(days=29)
+    week_start = today - timedelta(days=6)
+
+    rows = db.query(DailySystemStats).filter(
+        DailySystemStats.date >= month_start
+    ).order_by(DailySystemStats.date).all()
+
+    today_row = next((row for row in rows if day_start(row.date) == today), None)
+    if today_row is None:
+        # Pas encore de passage de la tâche aujourd'hui
+        today_row = refresh_today(db, now)
+        rows.append(today_row)
+
+    quiz_completed = sum(row.quiz_sessions_completed or 0 for row in rows)
+    ai_completed = sum(row.ai_quiz_sessions_completed or 0 for row in rows)
+    quiz_total = sum(row.quiz_score_total or 0 for row in rows)
+    ai_total = sum(row.ai_quiz_score_total or 0 for row in rows)
+
+    return {
+        'users': {
+            'total': today_row.total_users,
+            'active_today': today_row.active_users_today,
+            'new_this_week': sum(row.new_users_today or 0 for row in rows if day_start(row.date) >= week_start)
+        },
+        'activity': {
+            'quiz_sessions_today': today_row.quiz_sessions_today,
+            'ai_quiz_sessions_today': today_row.ai_quiz_sessions_today,
+            'total_sessions_today': today_row.quiz_sessions_today + today_row.ai_quiz_sessions_today
+        },
+        'performance': {
+            'avg_quiz_score': quiz_total / quiz_completed if quiz_completed else 0.0,
+            'avg_ai_score': ai_total / ai_completed if ai_completed else 0.0
+        },
+        'leaderboard': {
+            'top_quiz_users': _top_users(
+                db, UserPerformanceStats.quiz_sessions_completed, UserPerformanceStats.quiz_average_score
+            ),
+            'top_ai_users': _top_users(
+                db, UserPerformanceStats.ai_quiz_sessions_completed, UserPerformanceStats.ai_quiz_average_score
+            )
+        }
+    }
+
+
+# ================================
+# TÂCHE DE FOND
+# ================================
+
+def _run_with_new_session() -> Dict:
+    db = SessionLocal()
+    try:
+        return run_rollup(db)
+    finally:
+        db.close()
+
+
+class DailyStatsScheduler:
+    """Exécute `run_rollup` périodiquement dans un thread de la boucle"""
+
+    def __init__(self, interval_seconds: int = DAILY_STATS_INTERVAL):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, _run_with_new_session)
+            except Exception as e:
+                print(f"Erreur agrégats quotidiens: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Instance globale de la tâche de fond
+daily_stats_scheduler = DailyStatsScheduler()
+
+
+if __name__ == "__main__":
+    print(f"✅ Agrégats quotidiens: {_run_with_new_session()}")
@@ -0,0 +1,243 @@
+"""
+Format compact des traces d'exécution (visualiseur et tuteur Python)
+
+Une trace complète recopie à chaque ligne toutes les variables, la pile, le
+heap et la sortie cumulée : sa taille croît avec (nombre d'étapes × état).
+Le format "delta" ne garde, pour chaque étape, que ce qui a changé depuis
+l'étape précédente :
+
+    {
+      "format": "delta", "version": 1,
+      "strings": [...],           # chaînes internées (noms, lignes, types, fonctions)
+      "output": "...",            # sortie complète, une seule fois
+      "steps": [{
+        "n": 3,                   # numéro de ligne
+        "t": 5,                   # texte de la ligne (indice dans strings)
+        "o": 12,                  # fin de la sortie à cette étape (output[:o])
+        "v": [[[nom, valeur]...], [noms supprimés]],      # variables locales
+        "k": [[fonction, ligne]...],                      # pile, la plus externe d'abord
+        "f": [[profondeur, [[nom, valeur]...], [supprimés]]...],   # locales de la pile
+        "h": [[[id, [type, valeur, [ids]]]...], [ids supprimés]],  # heap
+        "r": [[[nom, valeur]...], [noms supprimés]]       # références
+      }]
+    }
+
+Les clés sans changement sont omises. Les noms sont des indices dans
+`strings`, les valeurs restent en JSON. `decode_steps` reconstruit les
+étapes complètes (même forme que l'ancien format) pour un intervalle.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+TRACE_FORMAT = "delta"
+TRACE_FORMAT_VERSION = 1
+
+
+def empty_trace(output: str = "") -> Dict:
+    return {"format": TRACE_FORMAT, "version": TRACE_FORMAT_VERSION, "strings": [], "output": output, "steps": []}
+
+
+class TraceEncoder:
+    """Construit une trace delta étape par étape (côté processus d'exécution)"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.steps: List[Dict] = []
+        self._string_ids: Dict[str, int] = {}
+        self._variables: Dict[str, Any] = {}
+        self._frames: List[Dict[str, Any]] = []
+        self._stack: List[List] = []
+        self._heap: Dict[str, Any] = {}
+        self._refs: Dict[str, Any] = {}
+        self._line_id: Optional[int] = None
+        self._output_offset = 0
+
+    @property
+    def step_count(self) -> int:
+        return len(self.steps)
+
+    def intern(self, text: str) -> int:
+        index = self._string_ids.get(text)
+        if index is None:
+            index = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def _delta(self, previous: Dict[str, Any], current: Dict[str, Any], encode=None) -> Optional[List]:
+        changed = [
+            [self.intern(name), encode(value) if encode else value]
+            for name, value in current.items()
+            if name not in previous or previous[name] != value
+        ]
+        removed = [self.intern(name) for name in previous if name not in current]
+        return [changed, removed] if changed or removed else None
+
+    def add_line_step(self, lineno: int, variables: Dict[str, Any]):
+        """Étape du visualiseur : ligne et variables locales (valeurs JSON)"""
+        step = {"n": lineno}
+        delta = self._delta(self._variables, variables)
+        if delta:
+            step["v"] = delta
+        self._variables = variables
+        self.steps.append(step)
+
+    def add_detailed_step(self, lineno: int, line: str, output_offset: int,
+                          stack: List[Tuple[str, int, Dict[str, Any]]],
+                          heap: Dict[str, Dict], refs: Dict[str, Any]):
+        """Étape du tuteur : pile (fonction, ligne, locales), heap et références"""
+        step = {"n": lineno}
+
+        line_id = self.intern(line)
+        if line_id != self._line_id:
+            step["t"] = line_id
+            self._line_id = line_id
+        if output_offset != self._output_offset:
+            step["o"] = output_offset
+            self._output_offset = output_offset
+
+        compact_stack = [[self.intern(function), frame_lineno] for function, frame_lineno, _ in stack]
+        if compact_stack != self._stack:
+            step["k"] = compact_stack
+            self._stack = compact_stack
+
+        frames = [frame_locals for _, _, frame_locals in stack]
+        frame_deltas = []
+        for depth, frame_locals in enumerate(frames):
+            previous = self._frames[depth] if depth < len(self._frames) else {}
+            delta = self._delta(previous, frame_locals)
+            if delta:
+                frame_deltas.append([depth] + delta)
+        if frame_deltas:
+            step["f"] = frame_deltas
+        self._frames = frames
+
+        heap_delta = self._delta(self._heap, heap, encode=lambda entry: [
+            self.intern(entry["type"]), entry["value"], [self.intern(ref) for ref in entry["refs"]]
+        ])
+        if heap_delta:
+            step["h"] = heap_delta
+        self._heap = heap
+
+        refs_delta = self._delta(self._refs, refs)
+        if refs_delta:
+            step["r"] = refs_delta
+        self._refs = refs
+
+        self.steps.append(step)
+
+    def finish(self, output: str = "") -> Dict:
+        return {
+            "format": TRACE_FORMAT,
+            "version": TRACE_FORMAT_VERSION,
+            "strings": self.strings,
+            "output": output,
+            "steps": self.steps
+        }
+
+
+# ================================
+# DÉCODAGE
+# ================================
+
+class TraceDecoder:
+    """État courant d'une trace delta, avancé étape par étape"""
+
+    def __init__(self, trace: Dict):
+        if trace.get("format") != TRACE_FORMAT:
+            raise ValueError(f"Format de trace inconnu: {trace.get('format')}")
+        self.strings = trace["strings"]
+        self.output = trace["output"]
+        self.steps = trace["steps"]
+        self.position = 0  # Prochaine étape à appliquer
+        self.lineno = None
+        self.line = ""
+        self.output_offset = 0
+        self.variables: Dict[str, Any] = {}
+        self.stack: List[List] = []
+        self.frames: List[Dict[str, Any]] = []
+        self.heap: Dict[str, Dict] = {}
+        self.refs: Dict[str, Any] = {}
+        self.detailed = False
+
+    def _apply(self, target: Dict, delta: List, decode=None):
+        changed, removed = delta
+        for name_id, value in changed:
+            target[self.strings[name_id]] = decode(value) if decode else value
+        for name_id in removed:
+            target.pop(self.strings[name_id], None)
+
+    def _decode_heap_entry(self, entry: List) -> Dict:
+        type_id, value, ref_ids = entry
+        return {"type": self.strings[type_id], "value": value, "refs": [self.strings[i] for i in ref_ids]}
+
+    def advance(self):
+        step = self.steps[self.position]
+        self.position += 1
+        self.lineno = step["n"]
+        if "v" in step:
+            self._apply(self.variables, step["v"])
+        if "t" in step:
+            self.line = self.strings[step["t"]]
+            self.detailed = True
+        if "o" in step:
+            self.output_offset = step["o"]
+        if "k" in step:
+            self.stack = step["k"]
+            self.detailed = True
+            del self.frames[len(self.stack):]
+            while len(self.frames) < len(self.stack):
+                self.frames.append({})
+        for depth, changed, removed in step.get("f", ()):
+            self._apply(self.frames[depth], [changed, removed])
+        if "h" in step:
+            self._apply(self.heap, step["h"], self._decode_heap_entry)
+        if "r" in step:
+            self._apply(self.refs, step["r"])
+
+    def save_state(self) -> Tuple:
+        """Copie de l'état courant (point de reprise pour un accès par intervalle)"""
+        return (
+            self.position, self.lineno, self.line, self.output_offset, dict(self.variables),
+            list(self.stack), [dict(frame) for frame in self.frames], dict(self.heap), dict(self.refs), self.detailed
+        )
+
+    def restore_state(self, state: Tuple):
+        (self.position, self.lineno, self.line, self.output_offset, variables,
+         stack, frames, heap, refs, self.detailed) = state
+        self.variables = dict(variables)
+        self.stack = list(stack)
+        self.frames = [dict(frame) for frame in frames]
+        self.heap = dict(heap)
+        self.refs = dict(refs)
+
+    def snapshot(self) -> Dict:
+        """Étape courante au format complet (copie indépendante)"""
+        if not self.detailed:
+            return {"lineno": self.lineno, "locals": dict(self.variables)}
+        frames = [dict(frame) for frame in self.frames]
+        return {
+            "event": "line",
+            "lineno": self.lineno,
+            "line": self.line,
+            "locals": frames[-1] if frames else {},
+            "globals": frames[0] if frames else {},
+            "stack": [
+                {"function": self.strings[function_id], "lineno": frame_lineno, "locals": frames[depth]}
+                for depth, (function_id, frame_lineno) in enumerate(self.stack)
+            ],
+            "output": self.output[:self.output_offset],
+            "heap": dict(self.heap),
+            "refs": dict(self.refs)
+        }
+
+
+def decode_steps(trace: Dict, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+    """Étapes complètes [start, stop) d'une trace delta (rejoue depuis le début)"""
+    steps = trace["steps"]
+    stop = len(steps) if stop is None else min(stop, len(steps))
+    decoder = TraceDecoder(trace)
+    decoded = []
+    while decoder.position < stop:
+        decoder.advance()
+        if decoder.position > start:
+            decoded.append(decoder.snapshot())
+    return decoded
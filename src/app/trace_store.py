@@ -0,0 +1,134 @@
+"""
+Stockage côté serveur des traces d'exécution (visualiseur et tuteur)
+
+Une exécution est gardée sous un identifiant aléatoire dans un LRU borné
+avec expiration. Le navigateur récupère ensuite les étapes par intervalle
+(`GET /api/visualize/{trace_id}/steps?from=&to=`) au lieu de recevoir toute
+la trace d'un coup.
+
+Les traces restent au format delta (app/trace_format.py). Pour qu'un
+intervalle ne rejoue pas toute la trace, l'état du décodeur est sauvegardé
+toutes les TRACE_CHECKPOINT_EVERY étapes, au fur et à mesure des lectures :
+un intervalle coûte au plus TRACE_CHECKPOINT_EVERY étapes + sa taille.
+
+Configuration (variables d'environnement) :
+- TRACE_STORE_MAX_ENTRIES : nombre de traces gardées
+- TRACE_STORE_TTL : durée de vie d'une trace (secondes)
+- TRACE_CHECKPOINT_EVERY : intervalle entre deux points de reprise
+- TRACE_WINDOW_MAX : nombre maximal d'étapes par requête
+- TRACE_FIRST_WINDOW : étapes renvoyées avec le résultat de l'exécution
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.trace_format import TRACE_FORMAT, TraceDecoder, decode_steps
+
+TRACE_STORE_MAX_ENTRIES = int(os.getenv("TRACE_STORE_MAX_ENTRIES", "200"))
+TRACE_STORE_TTL = int(os.getenv("TRACE_STORE_TTL", "900"))
+TRACE_CHECKPOINT_EVERY = max(1, int(os.getenv("TRACE_CHECKPOINT_EVERY", "100")))
+TRACE_WINDOW_MAX = int(os.getenv("TRACE_WINDOW_MAX", "200"))
+TRACE_FIRST_WINDOW = int(os.getenv("TRACE_FIRST_WINDOW", "20"))
+
+# Contenu du champ `trace` des réponses d'exécution
+TRACE_WINDOW = "window"  # Premières étapes complètes, la suite par /steps
+
+
+class StoredTrace:
+    """Trace delta et points de reprise de son décodage"""
+
+    def __init__(self, trace: Dict, ttl: int):
+        self.trace = trace
+        self.expires_at = time.monotonic() + ttl
+        self.total_steps = len(trace["steps"])
+        self._decoder = TraceDecoder(trace)
+        self._checkpoints = {0: self._decoder.save_state()}
+        self._lock = threading.Lock()
+
+    def steps(self, start: int, stop: int, checkpoint_every: int = TRACE_CHECKPOINT_EVERY) -> List[Dict]:
+        """Étapes complètes [start, stop), depuis le point de reprise le plus proche"""
+        stop = min(stop, self.total_steps)
+        with self._lock:
+            decoder = self._decoder
+            if decoder.position > start or start - decoder.position > checkpoint_every:
+                nearest = max(position for position in self._checkpoints if position <= start)
+                if not (nearest <= decoder.position <= start):
+                    decoder.restore_state(self._checkpoints[nearest])
+            decoded = []
+            while decoder.position < stop:
+                decoder.advance()
+                if decoder.position % checkpoint_every == 0 and decoder.position not in self._checkpoints:
+                    self._checkpoints[decoder.position] = decoder.save_state()
+                if decoder.position > start:
+                    decoded.append(decoder.snapshot())
+            return decoded
+
+
+class TraceStore:
+    """LRU des traces récentes, avec expiration"""
+
+    def __init__(self, max_entries: int = TRACE_STORE_MAX_ENTRIES, ttl: int = TRACE_STORE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, StoredTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, trace: Dict) -> str:
+        trace_id = secrets.token_urlsafe(16)
+        stored = StoredTrace(trace, self.ttl)
+        with self._lock:
+            self._entries[trace_id] = stored
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return trace_id
+
+    def get(self, trace_id: str) -> Optional[StoredTrace]:
+        with self._lock:
+            stored = self._entries.get(trace_id)
+            if stored is None:
+                return None
+            if stored.expires_at < time.monotonic():
+                del self._entries[trace_id]
+                return None
+            self._entries.move_to_end(trace_id)
+            return stored
+
+    def window(self, trace_id: str, start: int = 0, stop: Optional[int] = None) -> Optional[Dict]:
+        """Étapes [start, stop) d'une trace (au plus TRACE_WINDOW_MAX), None si inconnue ou expirée"""
+        stored = self.get(trace_id)
+        if stored is None:
+            return None
+        stop = start + TRACE_WINDOW_MAX if stop is None else min(stop, start + TRACE_WINDOW_MAX)
+        steps = stored.steps(start, stop)
+        return {
+            "trace_id": trace_id,
+            "from": start,
+            "to": start + len(steps),
+            "total_steps": stored.total_steps,
+            "steps": steps
+        }
+
+    def metrics(self) -> Dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl": self.ttl}
+
+
+# Instance globale du stockage des traces
+trace_store = TraceStore()
+
+
+def store_trace(trace: Dict, trace_format: str = TRACE_WINDOW) -> Dict:
+    """
+    Garde la trace et prépare les champs de la réponse d'exécution :
+    "window" (premières étapes), "delta" (trace compacte) ou "full" (toutes les étapes).
+    """
+    trace_id = trace_store.put(trace)
+    if trace_format == "full":
+        body = decode_steps(trace)
+    elif trace_format == TRACE_FORMAT:
+        body = trace
+    else:
+        body = decode_steps(trace, 0, TRACE_FIRST_WINDOW)
+    return {"trace_id": trace_id, "total_steps": len(trace["steps"]), "trace": body}
@@ -1,22 +1,34 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, status
+from fastapi import FastAPI, Request, Depends, HTTPException, Query, status
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from starlette.middleware.sessions import SessionMiddleware
 import uvicorn
+import asyncio
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-import sys
-import traceback
-import io
+from typing import Optional
 
 from app.database import engine, get_db
 from app.models import Base, PLDCategory, PLDTheme, PLDQuestion, User, QuizSession, AIQuizSession
 from app.routers import auth, quiz, users, ai_quiz, pld_admin, pld
 from app.routers import performance
 from app.auth import get_current_user
+from app.grading_executor import grading_executor
+from app.pld_catalog import pld_catalog
+from app.system_rollups import daily_stats_scheduler
+from app.quiz_session_cache import quiz_answer_flusher
+from app.activity_log import activity_logger
+from app.partitions import partition_scheduler
+from app.performance_rollups import get_user_rollup, current_streak, backfill_with_new_session
+from app.profile_stats import profile_stats
+from app.site_counters import site_counters_reconciler
+from app.execution_pool import execution_pool, ExecutionQueueFull
+from app.code_tracing import trace_lines
+from app.trace_store import trace_store, store_trace, TRACE_WINDOW
+from app.exercise_runner import exercise_pool, exercise_runner
 from sqlalchemy.orm import Session
 
 # Charger les variables d'environnement
@@ -63,6 +75,106 @@ def get_template_context(request: Request, **kwargs):
     return context
 
 
+@app.on_event("startup")
+async def start_daily_stats_scheduler():
+    """Lancer la tâche d'agrégats quotidiens du système"""
+    daily_stats_scheduler.start()
+
+
+@app.on_event("startup")
+async def backfill_performance_rollups():
+    """Créer les agrégats manquants des utilisateurs ayant un historique"""
+    try:
+        created = await asyncio.get_running_loop().run_in_executor(None, backfill_with_new_session)
+        if created:
+            print(f"✅ Agrégats utilisateur créés: {created}")
+    except Exception as e:
+        print(f"Erreur création des agrégats utilisateur: {e}")
+
+
+@app.on_event("startup")
+async def start_grading_executor():
+    """Lancer les workers de correction avant la première requête"""
+    await grading_executor.start()
+
+
+@app.on_event("shutdown")
+def shutdown_grading_executor():
+    """Arrêter proprement les workers de correction"""
+    grading_executor.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_daily_stats_scheduler():
+    await daily_stats_scheduler.stop()
+
+
+@app.on_event("startup")
+async def start_quiz_answer_flusher():
+    """Écriture périodique des réponses du mode quiz haut débit"""
+    quiz_answer_flusher.start()
+
+
+@app.on_event("shutdown")
+async def stop_quiz_answer_flusher():
+    await quiz_answer_flusher.stop()
+
+
+@app.on_event("startup")
+async def start_activity_logger():
+    """Écriture différée du journal d'activité"""
+    activity_logger.start()
+
+
+@app.on_event("shutdown")
+async def stop_activity_logger():
+    await activity_logger.stop()
+
+
+@app.on_event("startup")
+async def start_partition_scheduler():
+    """Création quotidienne des partitions mensuelles à venir (PostgreSQL)"""
+    partition_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_partition_scheduler():
+    await partition_scheduler.stop()
+
+
+@app.on_event("startup")
+async def start_site_counters_reconciler():
+    """Compteurs publics du site : chargement puis réconciliation périodique"""
+    site_counters_reconciler.start()
+
+
+@app.on_event("shutdown")
+async def stop_site_counters_reconciler():
+    await site_counters_reconciler.stop()
+
+
+@app.on_event("startup")
+async def start_execution_pool():
+    """Processus d'exécution du code utilisateur, lancés à l'avance"""
+    await execution_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_execution_pool():
+    await execution_pool.stop()
+
+
+@app.on_event("startup")
+async def start_exercise_pool():
+    """Processus de correction des exercices du Coding Lab"""
+    await exercise_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_exercise_pool():
+    await exercise_pool.stop()
+
+
 # Inclusion des routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(quiz.router, prefix="/api/quiz", tags=["quiz"])
@@ -75,8 +187,8 @@ app.include_router(performance.router, prefix="/api/performance", tags=["perform
 # Route directe pour les stats du site (pour compatibilité frontend)
 from app.routers.quiz import get_site_stats
 @app.get("/quiz/stats")
-def public_site_stats(request: Request, db=Depends(get_db)):
-    return get_site_stats(db)
+async def public_site_stats(request: Request):
+    return await get_site_stats(request=request)
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -114,29 +226,20 @@ async def dashboard_redirect(request: Request):
     return RedirectResponse(url="/profile", status_code=302)
 
 @app.get("/pld", response_class=HTMLResponse)
-async def pld_page(request: Request):
+async def pld_page(request: Request, db: Session = Depends(get_db)):
     await login_required(request)
     
-    # Récupérer les catégories PLD avec le nombre de questions par catégorie
-    db = next(get_db())
-    try:
-        categories_data = []
-        categories = db.query(PLDCategory).order_by(PLDCategory.name).all()
-        
-        for category in categories:
-            # Compter le nombre total de questions dans cette catégorie
-            question_count = db.query(PLDQuestion).join(PLDTheme).filter(
-                PLDTheme.category_id == category.id
-            ).count()
-            
-            categories_data.append({
-                'id': category.id,
-                'name': category.name,
-                'description': category.description,
-                'question_count': question_count
-            })
-    finally:
-        db.close()
+    # Catégories PLD avec leur nombre de questions (comptes précalculés par le catalogue)
+    categories = sorted(pld_catalog.snapshot(db).categories(), key=lambda c: c['name'])
+    categories_data = [
+        {
+            'id': category['id'],
+            'name': category['name'],
+            'description': category['description'],
+            'question_count': category['question_count']
+        }
+        for category in categories
+    ]
     
     context = get_template_context(request)
     context['categories'] = categories_data
@@ -159,7 +262,7 @@ async def profile_page(request: Request, db: Session = Depends(get_db)):
             return RedirectResponse(url="/login", status_code=302)
         
         # Récupérer l'utilisateur depuis la base de données
-        from app.models import User, QuizSession, AIQuizSession
+        from app.models import User
         user = db.query(User).filter(User.id == user_id).first()
         
         if not user:
@@ -167,66 +270,18 @@ async def profile_page(request: Request, db: Session = Depends(get_db)):
             request.session.clear()
             return RedirectResponse(url="/login", status_code=302)
         
-        # Calculer les statistiques réelles
-        # Quiz complétés
-        completed_quiz_sessions = db.query(QuizSession).filter(
-            QuizSession.user_id == user_id,
-            QuizSession.completed == True
-        ).count()
-        
-        completed_ai_quiz_sessions = db.query(AIQuizSession).filter(
-            AIQuizSession.user_id == user_id,
-            AIQuizSession.completed == True
-        ).count()
-        
-        total_quiz_completed = completed_quiz_sessions + completed_ai_quiz_sessions
+        # Quiz complétés, score moyen et quiz de la semaine (une requête, en cache)
+        stats = profile_stats.get(db, user_id)
         
-        # Score moyen
-        all_sessions = db.query(QuizSession).filter(
-            QuizSession.user_id == user_id,
-            QuizSession.completed == True,
-            QuizSession.total_questions > 0
-        ).all()
-        
-        ai_sessions = db.query(AIQuizSession).filter(
-            AIQuizSession.user_id == user_id,
-            AIQuizSession.completed == True,
-            AIQuizSession.total_questions > 0
-        ).all()
-        
-        all_scores = []
-        for session in all_sessions:
-            score_percentage = (session.score / session.total_questions) * 100
-            all_scores.append(score_percentage)
-            
-        for session in ai_sessions:
-            score_percentage = (session.total_score / session.total_questions) * 100
-            all_scores.append(score_percentage)
-        
-        average_score = round(sum(all_scores) / len(all_scores)) if all_scores else 0
-        
-        # Série actuelle (nombre de quiz complétés cette semaine)
-        from datetime import datetime, timedelta
-        week_ago = datetime.now() - timedelta(days=7)
-        
-        current_streak = db.query(QuizSession).filter(
-            QuizSession.user_id == user_id,
-            QuizSession.completed == True,
-            QuizSession.completed_at >= week_ago
-        ).count()
-        
-        current_streak += db.query(AIQuizSession).filter(
-            AIQuizSession.user_id == user_id,
-            AIQuizSession.completed == True,
-            AIQuizSession.completed_at >= week_ago
-        ).count()
+        # Série de jours d'activité (agrégats utilisateur)
+        rollup = get_user_rollup(db, user_id)
         
         # Ajouter les statistiques au contexte
         context = get_template_context(request, user=user)
         context.update({
-            'total_quiz_completed': total_quiz_completed,
-            'average_score': average_score,
-            'current_streak': current_streak
+            **stats,
+            'current_streak': current_streak(rollup),
+            'best_streak': rollup.best_streak_days or 0
         })
         
         return templates.TemplateResponse("profile.html", context)
@@ -271,29 +326,33 @@ async def admin_redirect(request: Request):
 
 @app.post("/api/visualize")
 async def visualize_code(request: Request):
+    """
+    Trace ligne à ligne du code, exécuté dans le pool d'exécution isolé.
+    La trace est gardée côté serveur (trace_id) ; "trace" contient les
+    premières étapes, la suite s'obtient par /api/visualize/{trace_id}/steps.
+    "trace_format": "delta" ou "full" renvoie toute la trace ; "cache": false
+    force une nouvelle exécution (code non déterministe).
+    """
     data = await request.json()
     code = data.get("code", "")
-    trace = []
-    output = io.StringIO()
-    def tracer(frame, event, arg):
-        if event == "line":
-            trace.append({
-                "lineno": frame.f_lineno,
-                "locals": frame.f_locals.copy(),
-            })
-        return tracer
     try:
-        compiled = compile(code, "<user_code>", "exec")
-        sys.settrace(tracer)
-        exec(compiled, {})
-        sys.settrace(None)
-        error = None
-    except Exception as e:
-        sys.settrace(None)
-        error = traceback.format_exc()
-    finally:
-        sys.settrace(None)
-    return JSONResponse({"trace": trace, "error": error, "output": output.getvalue()})
+        result = await execution_pool.run(trace_lines, code, use_cache=data.get("cache", True) is not False)
+    except ExecutionQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    stored = store_trace(result["trace"], data.get("trace_format", TRACE_WINDOW))
+    return JSONResponse({**stored, "error": result["error"], "output": result["output"] or "", "limit": result["limit"]})
+
+@app.get("/api/visualize/{trace_id}/steps")
+async def get_trace_steps(
+    trace_id: str,
+    from_: int = Query(0, alias="from", ge=0),
+    to: Optional[int] = Query(None, ge=0)
+):
+    """Étapes [from, to) d'une trace gardée côté serveur"""
+    window = trace_store.window(trace_id, from_, to)
+    if window is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trace introuvable ou expirée")
+    return window
 
 @app.post("/api/coding-lab/save-progress")
 async def save_coding_lab_progress(request: Request, db: Session = Depends(get_db)):
@@ -347,40 +406,49 @@ async def get_coding_lab_progress(request: Request, db: Session = Depends(get_db
 
 @app.post("/api/coding-lab/run-code")
 async def run_coding_lab_code(request: Request):
-    """Exécuter du code dans le Coding Lab"""
-    try:
-        data = await request.json()
-        code = data.get("code", "")
-        language = data.get("language", "python")
-        
-        # Simulation d'exécution de code
-        if language == "python":
-            # Ici vous pourriez utiliser un vrai interpréteur Python sécurisé
-            if "print" in code and "Hello" in code:
-                return {
-                    "success": True,
-                    "output": "Hello, World!\n",
-                    "error": None
-                }
-            else:
-                return {
-                    "success": True,
-                    "output": "Code exécuté avec succès\n",
-                    "error": None
-                }
-        
+    """
+    Exécuter du code dans le Coding Lab (pool d'exercices isolé).
+    Avec "exercise_id", la soumission est corrigée sur les cas de test de
+    l'exercice (résultat et durée par cas dans "tests") ; "stop_on_failure":
+    true arrête la correction au premier échec. "cache": false force une
+    nouvelle exécution.
+    """
+    data = await request.json()
+    code = data.get("code", "")
+    language = data.get("language", "python")
+    use_cache = data.get("cache", True) is not False
+
+    if language != "python":
         return {
             "success": False,
             "output": "",
             "error": f"Langage {language} non supporté"
         }
-        
-    except Exception as e:
-        return {
-            "success": False,
-            "output": "",
-            "error": str(e)
-        }
+
+    try:
+        if data.get("exercise_id") is None:
+            result = await exercise_runner.run_free(code, use_cache=use_cache)
+            return {"success": result["error"] is None, **result}
+
+        try:
+            exercise_id = int(data["exercise_id"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="exercise_id invalide")
+        report = await exercise_runner.run(
+            exercise_id, code, stop_on_failure=bool(data.get("stop_on_failure", False)), use_cache=use_cache
+        )
+    except ExecutionQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exercice introuvable")
+
+    first_failure = next((case for case in report["cases"] if not case["passed"] and not case["skipped"]), None)
+    return {
+        "success": report["passed"],
+        "output": report["cases"][0].get("output", "") if report["cases"] else "",
+        "error": first_failure["error"] if first_failure else None,
+        "tests": report
+    }
 
 @app.post("/api/sync-session")
 async def sync_session(request: Request, db: Session = Depends(get_db)):
@@ -0,0 +1,44 @@
+"""
+Environnement Alembic : base de DATABASE_URL, métadonnées de app.models
+
+Les tables sont créées par `Base.metadata.create_all` (démarrage de
+l'application, init_db). Les révisions ajoutent ce que create_all ne sait
+pas faire sur une base existante (colonnes, index) et restent idempotentes.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import DATABASE_URL, engine
+from app.models import Base
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Génère le SQL sans connexion (alembic upgrade --sql)"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,40 @@
+"""Agrégats de performance : une ligne par utilisateur, journées clôturables
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+DAILY_COLUMNS = [
+    sa.Column("quiz_sessions_completed", sa.Integer, server_default="0"),
+    sa.Column("ai_quiz_sessions_completed", sa.Integer, server_default="0"),
+    sa.Column("quiz_score_total", sa.Float, server_default="0"),
+    sa.Column("ai_quiz_score_total", sa.Float, server_default="0"),
+    sa.Column("closed", sa.Boolean, server_default=sa.false()),
+]
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("daily_system_stats")}
+    for column in DAILY_COLUMNS:
+        if column.name not in existing:
+            op.add_column("daily_system_stats", column.copy())
+
+    op.create_index("ix_user_performance_stats_user_id", "user_performance_stats", ["user_id"],
+                    unique=True, if_not_exists=True)
+    op.create_index("ix_daily_system_stats_date", "daily_system_stats", ["date"],
+                    unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_daily_system_stats_date", "daily_system_stats", if_exists=True)
+    op.drop_index("ix_user_performance_stats_user_id", "user_performance_stats", if_exists=True)
+    for column in DAILY_COLUMNS:
+        op.drop_column("daily_system_stats", column.name)
@@ -0,0 +1,47 @@
+"""Index composites et partiels sur les colonnes filtrées par les requêtes chaudes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ACTIVE = {"postgresql_where": sa.text("completed = false"), "sqlite_where": sa.text("completed = 0")}
+COMPLETED = {"postgresql_where": sa.text("completed = true"), "sqlite_where": sa.text("completed = 1")}
+
+# (nom, table, colonnes, options) — mêmes définitions que app/models.py
+INDEXES = [
+    ("ix_users_created_at", "users", ["created_at"], {}),
+    ("ix_quiz_sessions_user_completed", "quiz_sessions", ["user_id", "completed"], {}),
+    ("ix_quiz_sessions_started_at", "quiz_sessions", ["started_at"], {}),
+    ("ix_quiz_sessions_active_user", "quiz_sessions", ["user_id"], ACTIVE),
+    ("ix_quiz_sessions_completed_at", "quiz_sessions", ["completed_at"], COMPLETED),
+    ("ix_quiz_answers_session_question", "quiz_answers", ["session_id", "question_id"], {}),
+    ("ix_quiz_answers_answered_at", "quiz_answers", ["answered_at"], {}),
+    ("ix_ai_quiz_sessions_user_completed", "ai_quiz_sessions", ["user_id", "completed"], {}),
+    ("ix_ai_quiz_sessions_started_at", "ai_quiz_sessions", ["started_at"], {}),
+    ("ix_ai_quiz_sessions_active_user", "ai_quiz_sessions", ["user_id"], ACTIVE),
+    ("ix_ai_quiz_sessions_completed_at", "ai_quiz_sessions", ["completed_at"], COMPLETED),
+    ("ix_ai_quiz_answers_session_question", "ai_quiz_answers", ["session_id", "question_id"], {}),
+    ("ix_ai_quiz_answers_answered_at", "ai_quiz_answers", ["answered_at"], {}),
+    ("ix_user_activities_user_timestamp", "user_activities", ["user_id", "timestamp"], {}),
+    ("ix_user_activities_timestamp", "user_activities", ["timestamp"], {}),
+    ("ix_pld_themes_category_id", "pld_themes", ["category_id"], {}),
+    ("ix_pld_questions_theme_id", "pld_questions", ["theme_id"], {}),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns, options in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table, if_exists=True)
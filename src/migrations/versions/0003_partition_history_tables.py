@@ -0,0 +1,111 @@
+"""Partitionnement mensuel de user_activities, quiz_answers et ai_quiz_answers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+PostgreSQL uniquement (sans effet ailleurs). Chaque table est recréée
+partitionnée par plage sur son horodatage, les lignes existantes sont
+copiées : la table est verrouillée pendant la copie, à planifier sur une
+fenêtre de maintenance. La clé primaire devient (id, horodatage), contrainte
+de PostgreSQL pour une table partitionnée ; les identifiants restent uniques
+(séquence d'origine conservée).
+"""
+import re
+
+from alembic import op
+from sqlalchemy import text
+
+from app.partitions import PARTITIONED_TABLES, default_partition_name, ensure_partitions, is_partitioned
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Clés étrangères à recréer (LIKE ne les copie pas)
+FOREIGN_KEYS = {
+    "user_activities": [("user_id", "users")],
+    "quiz_answers": [("session_id", "quiz_sessions"), ("question_id", "questions")],
+    "ai_quiz_answers": [("session_id", "ai_quiz_sessions")],
+}
+
+
+def _swap_table(conn, table: str, create_sql: str, primary_key: str):
+    """
+    Renomme `table` en `<table>_legacy`, crée la nouvelle table, copie les
+    lignes puis recrée séquence, index et clés étrangères
+    """
+    legacy = f"{table}_legacy"
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+
+    # Index et clé primaire de l'ancienne table, libérés pour la nouvelle
+    indexes = conn.execute(text("""
+        SELECT i.indexname, i.indexdef FROM pg_indexes i
+        WHERE i.tablename = :legacy AND i.schemaname = current_schema()
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)
+    """), {"legacy": legacy}).all()
+    for name, _ in indexes:
+        conn.execute(text(f"DROP INDEX {name}"))
+    pkey = conn.execute(text("""
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = CAST(:legacy AS regclass) AND contype = 'p'
+    """), {"legacy": legacy}).scalar()
+    if pkey:
+        conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {pkey} TO {legacy}_pkey"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:legacy, 'id')"), {"legacy": legacy}).scalar()
+
+    conn.execute(text(create_sql.format(table=table, legacy=legacy)))
+    conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})"))
+    for column, referenced in FOREIGN_KEYS[table]:
+        conn.execute(text(f"ALTER TABLE {table} ADD FOREIGN KEY ({column}) REFERENCES {referenced} (id)"))
+    return legacy, indexes, sequence
+
+
+def _finish_swap(conn, table: str, legacy: str, indexes, sequence: str):
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    conn.execute(text(f"DROP TABLE {legacy} CASCADE"))
+    pattern = re.compile(rf" ON (ONLY )?(\w+\.)?{legacy} ")
+    for _, definition in indexes:
+        conn.execute(text(pattern.sub(f" ON {table} ", definition, count=1)))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+
+    for table, column in PARTITIONED_TABLES.items():
+        if is_partitioned(conn, table):
+            continue
+        legacy, indexes, sequence = _swap_table(
+            conn, table,
+            f'CREATE TABLE {{table}} (LIKE {{legacy}} INCLUDING DEFAULTS) PARTITION BY RANGE ("{column}")',
+            f'id, "{column}"'
+        )
+
+        # La colonne de partitionnement fait partie de la clé primaire
+        conn.execute(text(f'UPDATE {legacy} SET "{column}" = now() WHERE "{column}" IS NULL'))
+        conn.execute(text(f'ALTER TABLE {table} ALTER COLUMN "{column}" SET NOT NULL'))
+
+        conn.execute(text(f"CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT"))
+        first = conn.execute(text(f'SELECT MIN("{column}") FROM {legacy}')).scalar()
+        ensure_partitions(conn, table, first_month=first.date() if first else None)
+
+        _finish_swap(conn, table, legacy, indexes, sequence)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        legacy, indexes, sequence = _swap_table(
+            conn, table, "CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS)", "id"
+        )
+        _finish_swap(conn, table, legacy, indexes, sequence)
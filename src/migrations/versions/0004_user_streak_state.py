@@ -0,0 +1,33 @@
+"""Série de jours d'activité dans user_performance_stats
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Les colonnes sont remplies par `rebuild_user_rollups` (migrate_performance)
+ou à la reconstruction d'une ligne absente.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+STREAK_COLUMNS = [
+    sa.Column("streak_last_day", sa.Date),
+    sa.Column("best_streak_days", sa.Integer, server_default="0"),
+]
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("user_performance_stats")}
+    for column in STREAK_COLUMNS:
+        if column.name not in existing:
+            op.add_column("user_performance_stats", column.copy())
+
+
+def downgrade() -> None:
+    for column in STREAK_COLUMNS:
+        op.drop_column("user_performance_stats", column.name)
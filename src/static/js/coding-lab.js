@@ -523,71 +523,18 @@ for i in range(1, 21):
     }
 
     async runPython(code) {
-        // Simulateur Python simplifié
+        // Exécution côté serveur, corrigée sur les cas de test de l'exercice (processus isolés)
         try {
-            // Remplacer les input() par des valeurs par défaut pour la démo
-            let processedCode = code.replace(/input\([^)]*\)/g, '"25"'); // Âge par défaut
-            
-            // Variables pour capturer les print()
-            let output = '';
-            const originalLog = console.log;
-            
-            // Fonction print simulée
-            const print = (text) => {
-                output += text + '\n';
-            };
-
-            // Fonctions Python simulées
-            const pythonFunctions = {
-                print,
-                int: (x) => parseInt(x),
-                str: (x) => String(x),
-                len: (x) => x.length,
-                range: function(start, stop, step = 1) {
-                    const result = [];
-                    if (arguments.length === 1) {
-                        stop = start;
-                        start = 0;
-                    }
-                    for (let i = start; i < stop; i += step) {
-                        result.push(i);
-                    }
-                    return result;
-                }
-            };
-
-            // Évaluer le code dans un contexte sécurisé
-            const safeEval = new Function(
-                'print', 'int', 'str', 'len', 'range',
-                `
-                try {
-                    ${processedCode}
-                    return { success: true, output: arguments[5] };
-                } catch (error) {
-                    return { success: false, error: error.message };
-                }
-                `
-            );
-
-            // Capture de l'output
-            let capturedOutput = '';
-            const captureOutput = (text) => capturedOutput += text + '\n';
-
-            const result = safeEval(
-                captureOutput,
-                pythonFunctions.int,
-                pythonFunctions.str,
-                pythonFunctions.len,
-                pythonFunctions.range,
-                capturedOutput
-            );
-
-            return {
-                success: result.success !== false,
-                output: capturedOutput || output || 'Code exécuté avec succès',
-                error: result.error || null
-            };
-
+            const response = await fetch('/api/coding-lab/run-code', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ code, language: 'python', exercise_id: this.currentExercise })
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                return { success: false, output: '', error: data.detail || `Erreur ${response.status}` };
+            }
+            return data;
         } catch (error) {
             return {
                 success: false,
@@ -649,8 +596,8 @@ for i in range(1, 21):
             }
         }
 
-        // Afficher les résultats des tests
-        this.runTests();
+        // Afficher les résultats des tests (ceux du serveur quand il a corrigé le code)
+        this.runTests(result.tests);
         
         // Switch to output tab
         this.switchTab('output');
@@ -668,12 +615,31 @@ for i in range(1, 21):
         this.switchTab('output');
     }
 
-    runTests() {
+    /**
+     * Affiche les résultats des tests
+     * @param {Object} report - Rapport de correction du serveur (sinon vérifications locales)
+     */
+    runTests(report = null) {
+        const testsElement = document.getElementById('test-results');
+        if (report && testsElement) {
+            testsElement.innerHTML = report.cases.map(result => `
+                <div class="test-case ${result.passed ? 'passed' : 'failed'}">
+                    <span>${result.name}${result.duration_ms != null ? ` (${result.duration_ms.toFixed(1)} ms)` : ''}</span>
+                    <span class="test-status ${result.passed ? 'passed' : 'failed'}">
+                        ${result.skipped ? '⏭️ Non exécuté' : result.passed ? '✅ Réussi' : '❌ Échoué'}
+                    </span>
+                </div>
+            `).join('');
+            if (report.passed) {
+                this.completeExercise();
+            }
+            return;
+        }
+
         const exercise = this.exercises.find(ex => ex.id === this.currentExercise);
         if (!exercise || !exercise.tests) return;
 
         const code = this.codeEditor?.value || '';
-        const testsElement = document.getElementById('test-results');
         
         if (!testsElement) return;
 
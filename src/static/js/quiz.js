@@ -90,7 +90,7 @@ class QuizManager {
             this.currentSession = sessionResponse;
 
             // Get questions
-            const questionsResponse = await window.holbiesApp.apiRequest('/api/quiz/questions?limit=10');
+            const questionsResponse = await window.holbiesApp.apiRequest(`/api/quiz/questions?limit=10&session_id=${this.currentSession.id}`);
             this.questions = questionsResponse;
 
             if (this.questions.length === 0) {
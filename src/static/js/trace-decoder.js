@@ -0,0 +1,113 @@
+/**
+ * Décodeur des traces delta du visualiseur et du tuteur Python
+ * Même algorithme que app/trace_format.py : chaque étape n'applique que les
+ * changements par rapport à l'étape précédente.
+ */
+
+class TraceDecoder {
+    constructor(trace) {
+        if (trace.format !== 'delta') {
+            throw new Error(`Format de trace inconnu: ${trace.format}`);
+        }
+        this.strings = trace.strings;
+        this.output = trace.output;
+        this.steps = trace.steps;
+        this.position = 0;
+        this.lineno = null;
+        this.line = '';
+        this.outputOffset = 0;
+        this.variables = {};
+        this.stack = [];
+        this.frames = [];
+        this.heap = {};
+        this.refs = {};
+        this.detailed = false;
+    }
+
+    get length() {
+        return this.steps.length;
+    }
+
+    apply(target, [changed, removed], decode = null) {
+        for (const [nameId, value] of changed) {
+            target[this.strings[nameId]] = decode ? decode(value) : value;
+        }
+        for (const nameId of removed) {
+            delete target[this.strings[nameId]];
+        }
+    }
+
+    decodeHeapEntry([typeId, value, refIds]) {
+        return { type: this.strings[typeId], value, refs: refIds.map(id => this.strings[id]) };
+    }
+
+    advance() {
+        const step = this.steps[this.position++];
+        this.lineno = step.n;
+        if (step.v) this.apply(this.variables, step.v);
+        if (step.t !== undefined) {
+            this.line = this.strings[step.t];
+            this.detailed = true;
+        }
+        if (step.o !== undefined) this.outputOffset = step.o;
+        if (step.k) {
+            this.stack = step.k;
+            this.detailed = true;
+            this.frames.length = Math.min(this.frames.length, this.stack.length);
+            while (this.frames.length < this.stack.length) this.frames.push({});
+        }
+        for (const [depth, changed, removed] of step.f || []) {
+            this.apply(this.frames[depth], [changed, removed]);
+        }
+        if (step.h) this.apply(this.heap, step.h, entry => this.decodeHeapEntry(entry));
+        if (step.r) this.apply(this.refs, step.r);
+    }
+
+    snapshot() {
+        if (!this.detailed) {
+            return { lineno: this.lineno, locals: { ...this.variables } };
+        }
+        const frames = this.frames.map(frame => ({ ...frame }));
+        return {
+            event: 'line',
+            lineno: this.lineno,
+            line: this.line,
+            locals: frames.length ? frames[frames.length - 1] : {},
+            globals: frames.length ? frames[0] : {},
+            stack: this.stack.map(([functionId, lineno], depth) => ({
+                function: this.strings[functionId],
+                lineno,
+                locals: frames[depth]
+            })),
+            output: this.output.slice(0, this.outputOffset),
+            heap: { ...this.heap },
+            refs: { ...this.refs }
+        };
+    }
+
+    /**
+     * Étapes complètes [start, stop)
+     * @param {number} start - Première étape
+     * @param {number} stop - Étape de fin (exclue), toute la trace par défaut
+     */
+    decodeSteps(start = 0, stop = this.steps.length) {
+        if (this.position > start) {
+            this.reset();
+        }
+        const decoded = [];
+        stop = Math.min(stop, this.steps.length);
+        while (this.position < stop) {
+            this.advance();
+            if (this.position > start) decoded.push(this.snapshot());
+        }
+        return decoded;
+    }
+
+    reset() {
+        Object.assign(this, new TraceDecoder({
+            format: 'delta', strings: this.strings, output: this.output, steps: this.steps
+        }));
+    }
+}
+
+window.TraceDecoder = TraceDecoder;